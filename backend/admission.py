@@ -0,0 +1,153 @@
+import logging
+import threading
+from config import config_manager
+
+logger = logging.getLogger(__name__)
+
+# Límites por defecto (se sobrescriben en config.json)
+DEFAULT_LIMITS = {
+    'max_queued_audio_seconds': 4 * 3600,      # Audio total pendiente en el servidor
+    'max_queued_bytes': 2 * 1024 ** 3,         # Bytes totales de subidas pendientes
+    'max_client_audio_seconds': 3600,          # Audio pendiente por cliente
+    'max_client_bytes': 512 * 1024 ** 2,       # Bytes pendientes por cliente
+    'max_client_jobs': 20,                     # Trabajos pendientes por cliente
+    'unknown_duration_kbps': 64                # Tasa supuesta si ffprobe no da la duración
+}
+
+
+def charged_seconds(duration, size, kbps=None):
+    """
+    Segundos de audio que se le cuentan a un archivo en las cuotas.
+    Sin duración (ffprobe falló) se estima con una tasa de bits baja, que
+    sobrestima la duración: así un archivo ilegible no se cuela por la cuota de audio.
+    """
+    if duration is not None:
+        return duration
+    kbps = kbps or config_manager.get('unknown_duration_kbps', DEFAULT_LIMITS['unknown_duration_kbps'])
+    return size * 8 / (float(kbps) * 1000)
+
+
+class AdmissionRejected(Exception):
+    """
+    La subida supera algún límite de admisión.
+    'excess_seconds' y 'excess_bytes' indican cuánto trabajo pendiente debe terminar
+    antes de que quepa; 'client' es None si el límite superado es el global.
+    """
+
+    def __init__(self, message, excess_seconds=0.0, excess_bytes=0, client=None):
+        super().__init__(message)
+        self.excess_seconds = excess_seconds
+        self.excess_bytes = excess_bytes
+        self.client = client
+
+
+class RequestTooLarge(AdmissionRejected):
+    """
+    La subida no cabe en los límites ni con la cola vacía: esperar no sirve (413, sin Retry-After)
+    """
+
+
+class AdmissionController:
+    """
+    Control de admisión delante de la cola: lleva la cuenta del audio (segundos)
+    y de los bytes pendientes, en total y por cliente, y rechaza lo que no cabe
+    en vez de dejar que la cola crezca sin límite.
+    """
+
+    def __init__(self, limits=None):
+        self._lock = threading.Lock()
+        self._limits = limits
+        self._admitted = {}  # task_id -> (cliente, segundos, bytes)
+
+    def limit(self, key):
+        if self._limits and key in self._limits:
+            return self._limits[key]
+        return config_manager.get(key, DEFAULT_LIMITS[key])
+
+    def _usage(self, client=None):
+        """(segundos, bytes, trabajos) pendientes, en total o de un cliente"""
+        seconds = size = jobs = 0
+        for owner, job_seconds, job_bytes in self._admitted.values():
+            if client is None or owner == client:
+                seconds += job_seconds
+                size += job_bytes
+                jobs += 1
+        return seconds, size, jobs
+
+    def check_request_size(self, client, content_length):
+        """
+        Comprobación previa con Content-Length, antes de leer el cuerpo de la petición
+
+        Raises:
+            RequestTooLarge: Si los bytes no caben ni con la cola vacía
+            AdmissionRejected: Si los bytes no caben con lo que hay en cola
+        """
+        if not content_length:
+            return
+        with self._lock:
+            self._check(client, 0.0, content_length, jobs=0)
+
+    def _check(self, client, seconds, size, jobs):
+        # Por sí sola: ni con la cola vacía cabría
+        if size > min(self.limit('max_client_bytes'), self.limit('max_queued_bytes')):
+            raise RequestTooLarge("La subida supera el tamaño máximo admitido", client=client)
+        if seconds > min(self.limit('max_client_audio_seconds'), self.limit('max_queued_audio_seconds')):
+            raise RequestTooLarge("La subida supera la duración máxima de audio admitida", client=client)
+        if jobs > self.limit('max_client_jobs'):
+            raise RequestTooLarge("La subida supera el número máximo de archivos admitido", client=client)
+
+        # Con lo que ya hay en cola: cabrá cuando termine parte del trabajo pendiente (429)
+        total_seconds, total_bytes, _ = self._usage()
+        client_seconds, client_bytes, client_jobs = self._usage(client)
+
+        excess = total_bytes + size - self.limit('max_queued_bytes')
+        if excess > 0:
+            raise AdmissionRejected("Servidor ocupado: demasiados datos en cola", excess_bytes=excess)
+        excess = total_seconds + seconds - self.limit('max_queued_audio_seconds')
+        if excess > 0:
+            raise AdmissionRejected("Servidor ocupado: demasiado audio en cola", excess_seconds=excess)
+
+        excess = client_bytes + size - self.limit('max_client_bytes')
+        if excess > 0:
+            raise AdmissionRejected("Cuota de datos en cola superada", excess_bytes=excess, client=client)
+        excess = client_seconds + seconds - self.limit('max_client_audio_seconds')
+        if excess > 0:
+            raise AdmissionRejected("Cuota de audio en cola superada", excess_seconds=excess, client=client)
+        if jobs and client_jobs + jobs > self.limit('max_client_jobs'):
+            raise AdmissionRejected("Cuota de archivos en cola superada", client=client)
+
+    def admit(self, client, entries):
+        """
+        Reserva cupo para los archivos de una subida (todos o ninguno)
+
+        Args:
+            client: Identificador del cliente
+            entries: Lista de (task_id, segundos de audio o None, bytes)
+
+        Raises:
+            RequestTooLarge: Si el conjunto no cabe ni con la cola vacía
+            AdmissionRejected: Si el conjunto no cabe con lo que hay en cola
+        """
+        charged = [(task_id, charged_seconds(duration, job_bytes), job_bytes) for task_id, duration, job_bytes in entries]
+        seconds = sum(job_seconds for _, job_seconds, _ in charged)
+        size = sum(job_bytes for _, _, job_bytes in charged)
+        with self._lock:
+            self._check(client, seconds, size, jobs=len(entries))
+            for task_id, job_seconds, job_bytes in charged:
+                self._admitted[task_id] = (client, job_seconds, job_bytes)
+
+    def release(self, task_id):
+        """Libera el cupo de un trabajo terminado (completado o con error)"""
+        with self._lock:
+            self._admitted.pop(task_id, None)
+
+    def snapshot(self):
+        with self._lock:
+            seconds, size, jobs = self._usage()
+        return {
+            'queued_audio_seconds': round(seconds, 1),
+            'queued_bytes': size,
+            'queued_jobs': jobs,
+            'max_queued_audio_seconds': self.limit('max_queued_audio_seconds'),
+            'max_queued_bytes': self.limit('max_queued_bytes')
+        }
@@ -1,4 +1,3 @@
-
 # VERSIÓN DEL BACKEND: v2.1-clean-logs
 # VERSION LIMPIA SIN EMOJIS PARA EVITAR ERRORES DE ENCODING EN WINDOWS
 """
@@ -6,13 +5,15 @@ Flask backend for Audio to Text transcription
 VERSION: 2.1-clean-logs
 """
 import os
+import math
 import uuid
+import time
 import logging
 import threading
 from pathlib import Path
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_from_directory, Response, stream_with_context
 from flask_cors import CORS
-from werkzeug.utils import secure_filename
+from werkzeug.utils import secure_filename, safe_join
 from logging.handlers import RotatingFileHandler
 
 # Configuración de logging ROBUSTA
@@ -40,18 +41,30 @@ logger = logging.getLogger(__name__)
 
 # Importar servicios
 try:
-    from whisper_service import whisper_service
-    from audio_processor import AudioProcessor
+    from whisper_service import whisper_service, WhisperService
+    from audio_processor import AudioProcessor, AUDIO_EXTENSIONS, partial_transcript_name
     from diarization_service import diarization_service
     from config import config_manager
+    import download_service
+    from job_queue import JobQueue
+    from scheduler import RuntimeEstimator, JobScheduler, EtaCache
+    from admission import AdmissionController, AdmissionRejected, RequestTooLarge, charged_seconds
+    from dedup import InflightRegistry, content_hash, job_key
+    from inference_worker import LocalWorker, ProcessWorkerPool, SharedStoreDispatcher, LiveInference, LiveInferenceProcess
+    from job_store import SQLiteJobStore
+    from search_index import SearchIndex
+    from speaker_store import speaker_store
+    from live_service import LiveSessionManager, SAMPLE_RATE as LIVE_SAMPLE_RATE
+    from search_index import format_offset
 except ImportError as e:
     logger.error(f"Error importando servicios: {e}")
     raise
 
-# Configuración
-UPLOAD_DIR = 'uploads'
-TRANSCRIPTION_DIR = 'transcriptions'
-ALLOWED_EXTENSIONS = {'.mp3', '.wav', '.m4a', '.flac', '.ogg', '.wma', '.aac', '.mpeg'}
+# Configuración (con nodos en otras máquinas, estas rutas deben estar en el volumen compartido)
+UPLOAD_DIR = config_manager.get('upload_dir', 'uploads')
+TRANSCRIPTION_DIR = config_manager.get('transcription_dir', 'transcriptions')
+SEARCH_INDEX_DB = config_manager.get('search_index_db', 'search_index.db')
+ALLOWED_EXTENSIONS = AUDIO_EXTENSIONS
 
 # Crear directorios si no existen
 os.makedirs(UPLOAD_DIR, exist_ok=True)
@@ -61,12 +74,75 @@ os.makedirs(TRANSCRIPTION_DIR, exist_ok=True)
 app = Flask(__name__)
 CORS(app)
 
+# Índice de búsqueda sobre las transcripciones
+search_index = SearchIndex(SEARCH_INDEX_DB, root=TRANSCRIPTION_DIR)
+
 # Inicializar procesador de audio
-audio_processor = AudioProcessor(whisper_service)
+audio_processor = AudioProcessor(whisper_service, search_index=search_index)
 
 # Almacenar tareas en memoria
 tasks = {}
 
+# Planificador: predice la duración de cada trabajo (real-time factor medido) y ordena la cola
+rtf_estimator = RuntimeEstimator()
+job_scheduler = JobScheduler(rtf_estimator)
+
+# ETAs de la cola: se recalculan al encolar, despachar o cambiar de estado un trabajo
+eta_cache = EtaCache(lambda now: compute_etas(now))
+
+# Cola de trabajos pendientes y consumidor de inferencia (hilo local o pool de procesos)
+job_queue = JobQueue(scheduler=job_scheduler, on_change=eta_cache.invalidate)
+inference_backend = None
+
+# Control de admisión: límites de audio y bytes pendientes (globales y por cliente)
+admission = AdmissionController()
+
+# Trabajos en curso por contenido y parámetros (subidas idénticas comparten la inferencia)
+inflight = InflightRegistry()
+
+# Campos de una tarea que se copian a las subidas idénticas enganchadas a ella
+SHARED_FIELDS = ('status', 'progress', 'result', 'output_files', 'error', 'started_at',
+                 'partial_file', 'partial_segments', 'no_speech', 'profile_files')
+
+def update_task(task_id, **fields):
+    """Actualiza el registro de una tarea (lo usan los workers para informar del progreso)"""
+    task = tasks.get(task_id)
+    if task is None:
+        return
+    task.update(fields)
+    if 'status' in fields:
+        eta_cache.invalidate()
+    
+    # Las subidas idénticas comparten progreso y salidas con el trabajo que hace la inferencia
+    shared = {key: value for key, value in fields.items() if key in SHARED_FIELDS}
+    for follower_id in task.get('followers', []):
+        follower = tasks.get(follower_id)
+        if follower is not None and shared:
+            follower.update(shared)
+    
+    if fields.get('status') in ('completed', 'error'):
+        admission.release(task_id)
+        inflight.release(task_id)
+    
+    # Los trabajos en lote no son representativos del real-time factor de un archivo suelto
+    if fields.get('status') == 'completed' and fields.get('processing_seconds') is not None \
+            and not fields.get('result', {}).get('batched'):
+        rtf_estimator.record(task['model'], task['diarization'], task.get('duration'), fields['processing_seconds'])
+
+def client_id():
+    """Identificador del cliente para el reparto justo de la cola y las cuotas (sin leer el cuerpo)"""
+    return request.headers.get('X-Client-Id') or request.remote_addr or 'anonymous'
+
+# Carril de inferencia en directo: modelo propio ('live_model'), fuera de la cola de trabajos
+live_inference = None
+
+def transcribe_live_window(audio):
+    """Decodifica una ventana de audio en directo en el carril en directo"""
+    return live_inference.transcribe(audio, language=whisper_service.current_language)
+
+# Sesiones de transcripción en directo (micrófono)
+live_sessions = LiveSessionManager(transcribe_live_window)
+
 def allowed_file(filename):
     """Verifica si el archivo tiene una extensión permitida"""
     return Path(filename).suffix.lower() in ALLOWED_EXTENSIONS
@@ -74,64 +150,100 @@ def allowed_file(filename):
 # Global Lock for processing (Sequencing)
 processing_lock = threading.Lock()
 
-def process_audio_task(task_id, audio_path, filename, model='small', timestamps=False, diarization=False, num_speakers=None):
-    """Función que se ejecuta en un hilo separado para procesar el audio SECUENCIALMENTE"""
+# Estado del precalentamiento (carga de librerías de ML y modelo en segundo plano)
+warmup_state = {'status': 'idle', 'seconds': None, 'error': None}
+
+def warm_up_models():
+    """
+    Precarga whisper/torch y el modelo por defecto en segundo plano.
+    El servidor HTTP ya está escuchando: /health y /config responden mientras tanto.
+    """
+    warmup_state['status'] = 'running'
+    start = time.perf_counter()
     try:
-        # Actualizar estado inicial (En cola, pero 'processing' para la UI)
-        tasks[task_id]['status'] = 'processing'
-        tasks[task_id]['progress'] = 5
-        
-        logger.info(f"THREAD START: {filename} esperando turno... (Lock)")
-        
-        # --- AQUÍ ESTÁ LA MAGIA: Esperar turno (Semáforo) ---
+        # Con el lock para que un trabajo que llegue ahora espere al modelo en vez de cargarlo dos veces
         with processing_lock:
-            logger.info(f"LOCK ACQUIRED: Iniciando procesamiento real de {filename}")
-            tasks[task_id]['progress'] = 10
-            
-            # Cambiar modelo de Whisper si es necesario
-            old_model = whisper_service.model_name
-            if old_model != model:
-                whisper_service.model_name = model
-                whisper_service.model = None  # Forzar recarga del modelo
-                logger.info(f"MODEL CHANGE: {old_model} -> {model}")
-            
-            # Cargar modelo de Whisper si no está cargado
-            tasks[task_id]['progress'] = 20
             whisper_service.load_model()
-            logger.info(f"MODEL READY: {whisper_service.model_name}")
-            
-            # Procesar audio (dividir y transcribir)
-            tasks[task_id]['progress'] = 30
-            logger.info(f"PROCESSING START: Timestamps={timestamps}, Diarization={diarization}")
-            
-            result = audio_processor.process_audio(audio_path, TRANSCRIPTION_DIR, original_filename=filename, include_timestamps=timestamps, perform_diarization=diarization, num_speakers=num_speakers)
-            
-            # Actualizar tarea con resultados
-            tasks[task_id]['status'] = 'completed'
-            tasks[task_id]['progress'] = 100
-            tasks[task_id]['result'] = result
-            tasks[task_id]['output_files'] = [os.path.basename(f) for f in result['output_files']]
-            tasks[task_id]['original_file'] = filename
-            
-            logger.info(f"TASK COMPLETED: {filename}")
-            logger.info(f"LOCK RELEASED: Fin de {filename}")
-            
+        if config_manager.get('warmup_diarization', False) and config_manager.get_hf_token():
+            diarization_service.load_pipeline()
+        warmup_state['status'] = 'done'
     except Exception as e:
-        logger.error(f"TASK ERROR in {filename}: {e}", exc_info=True)
-        tasks[task_id]['status'] = 'error'
-        tasks[task_id]['error'] = str(e)
+        logger.error(f"WARMUP ERROR: {e}", exc_info=True)
+        warmup_state['status'] = 'error'
+        warmup_state['error'] = str(e)
     finally:
-        # Limpiar archivo de audio temporal
-        try:
-            if os.path.exists(audio_path):
-                os.remove(audio_path)
-        except:
-            pass
+        warmup_state['seconds'] = round(time.perf_counter() - start, 2)
+        logger.info(f"WARMUP {warmup_state['status'].upper()}: {warmup_state['seconds']}s")
+
+_background_lock = threading.Lock()
+
+def ensure_background_tasks():
+    """
+    Arranca las tareas de fondo (modo desarrollo) si nadie lo ha hecho aún: con la app
+    importada desde otro servidor (flask run --no-reload, otro host WSGI) no se ejecuta
+    el bloque __main__ y los trabajos se quedarían en la cola
+    """
+    if inference_backend is not None:
+        return
+    with _background_lock:
+        if inference_backend is None:
+            logger.info("Consumidor de inferencia no arrancado: se arranca con la primera petición")
+            start_background_tasks()
+
+def start_background_tasks(num_workers=0, store_path=None):
+    """
+    Arranca el consumidor de inferencia y las tareas de fondo
+    
+    Args:
+        num_workers: 0 = hilo local (desarrollo); N > 0 = N procesos de inferencia (producción)
+        store_path: Almacén SQLite compartido: la inferencia la hacen nodos externos (worker_node.py)
+    """
+    global inference_backend, live_inference
+    
+    # Las ventanas en directo no pasan por la cola ni por el lock de los trabajos: en desarrollo
+    # usan una instancia de Whisper propia; en producción, un proceso propio (nunca el proceso web)
+    live_model = config_manager.get('live_model', whisper_service.model_name)
+    if store_path or num_workers > 0:
+        live_inference = LiveInferenceProcess(live_model)
+    else:
+        live_inference = LiveInference(WhisperService(model_name=live_model))
+    
+    if store_path:
+        inference_backend = SharedStoreDispatcher(job_queue, SQLiteJobStore(store_path), update_task)
+    elif num_workers > 0:
+        settings = {
+            'transcription_dir': os.path.abspath(TRANSCRIPTION_DIR),
+            'search_index_db': os.path.abspath(SEARCH_INDEX_DB),
+            'warmup': config_manager.get('warmup_on_start', True)
+        }
+        inference_backend = ProcessWorkerPool(job_queue, num_workers, settings, update_task)
+    else:
+        inference_backend = LocalWorker(job_queue, whisper_service, audio_processor, TRANSCRIPTION_DIR, update_task, processing_lock)
+    inference_backend.start()
+    
+    # Indexar en segundo plano las transcripciones que aún no estén en el índice
+    threading.Thread(
+        target=search_index.sync_directory,
+        args=(TRANSCRIPTION_DIR, audio_processor.max_duration_seconds),
+        daemon=True
+    ).start()
+    
+    # En producción cada proceso (o nodo) de inferencia precalienta su propio modelo
+    if num_workers == 0 and not store_path and config_manager.get('warmup_on_start', True):
+        threading.Thread(target=warm_up_models, daemon=True).start()
 
 @app.route('/upload', methods=['POST'])
 def upload_file():
     """Endpoint para subir archivos de audio"""
+    ensure_background_tasks()
     try:
+        # Rechazar antes de recibir el cuerpo si ya no caben los bytes anunciados
+        client = client_id()
+        try:
+            admission.check_request_size(client, request.content_length)
+        except AdmissionRejected as e:
+            return reject_upload(e)
+        
         if 'files' not in request.files:
             return jsonify({'error': 'No se enviaron archivos'}), 400
         
@@ -164,12 +276,23 @@ def upload_file():
         else:
             num_speakers = None
         
+        # Perfil de este trabajo: 'cprofile', 'sample' o true (= cprofile)
+        profile_value = str(request.form.get('profile', '')).lower()
+        if profile_value in ('cprofile', 'sample'):
+            profile = profile_value
+        elif profile_value in ['true', '1', 'yes']:
+            profile = 'cprofile'
+        else:
+            profile = None
+        
         # LOG CRITICO
         logger.info(f"UPLOAD REQUEST: Files={len(files)}, Model={model}, Timestamps={timestamps}, Diarization={diarization}, Speakers={num_speakers}")
         
-        task_ids = []
+        # Todas las tareas de esta petición forman un lote (descarga ZIP conjunta)
+        batch_id = str(uuid.uuid4())
         
-        # Procesar cada archivo
+        # Guardar cada archivo y medir su duración (ffprobe) antes de admitirlo
+        staged = []
         for file in files:
             if file and allowed_file(file.filename):
                 # Generar ID único para la tarea
@@ -178,43 +301,158 @@ def upload_file():
                 # Guardar archivo temporalmente
                 filename = file.filename
                 safe_filename = f"{task_id}_{filename}"
-                filepath = os.path.join(UPLOAD_DIR, safe_filename)
+                filepath = os.path.abspath(os.path.join(UPLOAD_DIR, safe_filename))
                 file.save(filepath)
                 
+                # Si ffprobe falla, el trabajo sigue sin ETA
+                try:
+                    duration = audio_processor.get_audio_duration(filepath)
+                except Exception:
+                    duration = None
+                
+                key = job_key(content_hash(filepath), model, timestamps, diarization, num_speakers, whisper_service.current_language)
+                staged.append((task_id, filename, filepath, duration, os.path.getsize(filepath), key))
+            else:
+                logger.warning(f"IGNORED: Archivo no permitido {file.filename}")
+        
+        if not staged:
+            return jsonify({'error': 'No se procesaron archivos válidos'}), 400
+        
+        # Clasificar, admitir y crear las tareas sin que otra subida se cuele entre medias
+        with inflight.lock:
+            # Un archivo idéntico (contenido y parámetros) a un trabajo en curso se engancha a él
+            primaries = []
+            followers = []
+            keys_in_request = {}
+            for entry in staged:
+                task_id, key = entry[0], entry[5]
+                primary_id = inflight.find(key) or keys_in_request.get(key)
+                if primary_id:
+                    followers.append((entry, primary_id))
+                else:
+                    keys_in_request[key] = task_id
+                    primaries.append(entry)
+            
+            # Admisión de la subida completa (todos los archivos o ninguno); los duplicados no cuestan
+            try:
+                admission.admit(client, [(task_id, duration, size) for task_id, _, _, duration, size, _ in primaries])
+            except AdmissionRejected as e:
+                for _, _, filepath, _, _, _ in staged:
+                    try:
+                        os.remove(filepath)
+                    except OSError:
+                        pass
+                return reject_upload(e)
+            
+            for task_id, filename, filepath, duration, size, key in primaries:
                 # Crear tarea
                 tasks[task_id] = {
                     'id': task_id,
                     'filename': filename,
+                    'batch_id': batch_id,
                     'status': 'queued',
                     'progress': 0,
-                    'output_files': []
+                    'output_files': [],
+                    'model': model,
+                    'diarization': diarization,
+                    'duration': duration,
+                    'size': size,
+                    'client': client,
+                    'followers': []
                 }
+                inflight.register(key, task_id)
                 
-                # Iniciar procesamiento en hilo separado
-                thread = threading.Thread(
-                    target=process_audio_task,
-                    args=(task_id, filepath, filename, model, timestamps, diarization, num_speakers)
-                )
-                thread.start()
+                # Encolar para el consumidor de inferencia
+                job_queue.put({
+                    'task_id': task_id,
+                    'audio_path': filepath,
+                    'filename': filename,
+                    'model': model,
+                    'timestamps': timestamps,
+                    'diarization': diarization,
+                    'num_speakers': num_speakers,
+                    'language': whisper_service.current_language,
+                    'duration': duration,
+                    'client': client,
+                    'profile': profile,
+                    'enqueued_at': time.time()
+                })
                 
-                task_ids.append(task_id)
                 logger.info(f"QUEUED: {filename} -> TaskID: {task_id}")
+            
+            for (task_id, filename, filepath, duration, size, key), primary_id in followers:
+                primary = tasks[primary_id]
+                tasks[task_id] = {
+                    'id': task_id,
+                    'filename': filename,
+                    'batch_id': batch_id,
+                    'status': primary['status'],
+                    'progress': primary['progress'],
+                    'output_files': list(primary['output_files']),
+                    'model': model,
+                    'diarization': diarization,
+                    'duration': duration,
+                    'client': client,
+                    'duplicate_of': primary_id
+                }
+                for field in SHARED_FIELDS:
+                    if field in primary:
+                        tasks[task_id][field] = primary[field]
+                primary['followers'].append(task_id)
                 
-            else:
-                logger.warning(f"IGNORED: Archivo no permitido {file.filename}")
-        
-        if not task_ids:
-            return jsonify({'error': 'No se procesaron archivos válidos'}), 400
+                # El audio ya lo tiene el trabajo principal
+                try:
+                    os.remove(filepath)
+                except OSError:
+                    pass
+                logger.info(f"DUPLICATE: {filename} -> TaskID: {task_id} (comparte el trabajo {primary_id})")
+            
+            task_ids = [entry[0] for entry in staged]
         
         return jsonify({
             'message': f'{len(task_ids)} archivo(s) en cola',
-            'task_ids': task_ids
+            'task_ids': task_ids,
+            'batch_id': batch_id
         }), 200
         
     except Exception as e:
         logger.error(f"UPLOAD ERROR: {e}", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
+def retry_after_seconds(rejection):
+    """
+    Segundos hasta que termine suficiente trabajo pendiente para que quepa la subida
+    rechazada, según las ETA del planificador.
+    """
+    etas = eta_cache.all()
+    pending = sorted(
+        (etas[task['id']]['eta_seconds'], charged_seconds(task.get('duration'), task.get('size', 0)), task.get('size', 0))
+        for task in list(tasks.values())
+        if task['id'] in etas and (rejection.client is None or task.get('client') == rejection.client)
+    )
+    need_seconds, need_bytes = rejection.excess_seconds, rejection.excess_bytes
+    for eta, duration, size in pending:
+        need_seconds -= duration
+        need_bytes -= size
+        if need_seconds <= 0 and need_bytes <= 0:
+            return eta
+    return pending[-1][0] if pending else float(config_manager.get('retry_after_default', 30))
+
+def reject_upload(rejection):
+    """
+    Respuesta para una subida que no supera la admisión: 429 con Retry-After si cabrá
+    cuando avance la cola, 413 sin Retry-After si no cabe ni con la cola vacía
+    """
+    if isinstance(rejection, RequestTooLarge):
+        logger.warning(f"UPLOAD REJECTED: {rejection} (cliente {rejection.client}, 413)")
+        return jsonify({'error': str(rejection)}), 413
+    retry_after = min(max(int(math.ceil(retry_after_seconds(rejection))), 1), 3600)
+    logger.warning(f"UPLOAD REJECTED: {rejection} (cliente {rejection.client or 'global'}, Retry-After {retry_after}s)")
+    response = jsonify({'error': str(rejection), 'retry_after': retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
 @app.route('/status/<task_id>', methods=['GET'])
 def get_status(task_id):
     """Endpoint para obtener el estado de una tarea"""
@@ -227,28 +465,316 @@ def get_status(task_id):
         'id': task['id'],
         'filename': task['filename'],
         'status': task['status'],
-        'progress': task['progress']
+        'progress': task['progress'],
+        'batch_id': task.get('batch_id'),
+        'duration': task.get('duration')
     }
     
+    # Transcripción parcial en curso (el texto se obtiene con /partial/<task_id>)
+    if task['status'] == 'processing' and task.get('partial_file'):
+        response['partial_segments'] = task.get('partial_segments', 0)
+    
+    if task.get('duplicate_of'):
+        response['duplicate_of'] = task['duplicate_of']
+    
+    # La criba de voz no encontró habla: 'silence' o 'no_speech' (música o ruido)
+    if task.get('no_speech'):
+        response['no_speech'] = task['no_speech']
+    
+    if task['status'] in ('queued', 'processing'):
+        # Sin duración (ffprobe falló) no hay estimación fiable
+        eta = eta_cache.get(task.get('duplicate_of', task_id)) if task.get('duration') else None
+        if eta:
+            response['eta_seconds'] = round(eta['eta_seconds'], 1)
+            response['predicted_seconds'] = round(eta['predicted_seconds'], 1)
+            response['queue_position'] = eta['queue_position']
+            # Progreso interpolado con el tiempo transcurrido (las etapas fijas llegan al 30 %)
+            if task['status'] == 'processing' and task.get('started_at'):
+                elapsed = time.time() - task['started_at']
+                fraction = min(elapsed / max(eta['predicted_seconds'], 1.0), 1.0)
+                response['progress'] = max(task['progress'], int(30 + 65 * fraction))
+    
     if task['status'] == 'completed':
         response['output_files'] = task['output_files']
         response['original_file'] = task.get('original_file', task['filename'])
         if 'result' in task:
             response['num_segments'] = task['result'].get('num_segments', 1)
+            if task.get('profile_files'):
+                response['profile_files'] = task['profile_files']
+            if 'memory' in task['result']:
+                response['peak_rss_mb'] = task['result']['peak_rss_mb']
+                response['memory'] = task['result']['memory']
+            response['speakers'] = [
+                {'part': spk['part'], 'label': spk['label']}
+                for spk in task['result'].get('speakers', [])
+            ]
     
     if task['status'] == 'error':
         response['error'] = task.get('error', 'Error desconocido')
     
     return jsonify(response)
 
+@app.route('/partial/<task_id>', methods=['GET'])
+def get_partial(task_id):
+    """
+    Endpoint para leer la transcripción parcial de una tarea en proceso.
+    'offset' (bytes ya leídos) permite pedir solo el texto nuevo.
+    """
+    task = tasks.get(task_id)
+    if task is None:
+        return jsonify({'error': 'Tarea no encontrada'}), 404
+    
+    try:
+        offset = max(int(request.args.get('offset', 0)), 0)
+    except ValueError:
+        offset = 0
+    
+    # El archivo parcial es el del trabajo que hace la inferencia (el propio o, si es un duplicado, su original)
+    primary = tasks.get(task.get('duplicate_of', task_id), task)
+    text = ''
+    file_path = None
+    if task.get('partial_file'):
+        file_path = safe_join(TRANSCRIPTION_DIR, partial_transcript_name(primary['filename'], primary['id']))
+    if file_path and task['status'] == 'processing':
+        try:
+            with open(file_path, 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+            # Solo líneas completas (el worker puede estar escribiendo la última)
+            data = data[:data.rfind(b'\n') + 1]
+            text = data.decode('utf-8', errors='replace')
+            offset += len(data)
+        except FileNotFoundError:
+            pass
+    
+    return jsonify({'status': task['status'], 'text': text, 'offset': offset})
+
+def compute_etas(now):
+    """ETA de todas las tareas pendientes y en proceso según el planificador (la cachea eta_cache)"""
+    running = [
+        (task, task['started_at'])
+        for task in list(tasks.values())
+        if task['status'] == 'processing' and task.get('started_at')
+    ]
+    num_workers = len(inference_backend.status()) if inference_backend else 1
+    return job_scheduler.estimate_etas(
+        job_queue.snapshot(),
+        [({'task_id': task['id'], 'model': task['model'], 'diarization': task['diarization'],
+           'duration': task.get('duration')}, started_at) for task, started_at in running],
+        num_workers,
+        now=now
+    )
+
 @app.route('/download/<filename>', methods=['GET'])
 def download_file(filename):
-    """Endpoint para descargar archivos transcriptados"""
+    """
+    Endpoint para descargar archivos transcriptados.
+    Comprime con gzip/brotli si el cliente lo acepta y soporta peticiones Range.
+    """
+    file_path = safe_join(TRANSCRIPTION_DIR, filename)
+    if file_path is None or not os.path.isfile(file_path):
+        return jsonify({'error': 'Archivo no encontrado'}), 404
+    
+    # La compresión y los rangos no se combinan: un Range se sirve sin comprimir
+    encoding = download_service.negotiate_encoding(request.headers.get('Accept-Encoding', ''))
+    if encoding and request.range is None and download_service.is_compressible(filename):
+        return Response(
+            stream_with_context(download_service.iter_compressed(file_path, encoding)),
+            mimetype='text/plain' if filename.endswith('.txt') else 'application/octet-stream',
+            headers={
+                'Content-Encoding': encoding,
+                'Content-Disposition': download_service.content_disposition(filename),
+                'Vary': 'Accept-Encoding'
+            }
+        )
+    
     try:
-        return send_from_directory(TRANSCRIPTION_DIR, filename, as_attachment=True)
+        response = send_from_directory(TRANSCRIPTION_DIR, filename, as_attachment=True, conditional=True)
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
     except FileNotFoundError:
         return jsonify({'error': 'Archivo no encontrado'}), 404
 
+@app.route('/download/batch/<batch_id>', methods=['GET'])
+def download_batch(batch_id):
+    """Endpoint para descargar en un ZIP (generado al vuelo) todas las salidas de un lote"""
+    batch_tasks = [t for t in list(tasks.values()) if t.get('batch_id') == batch_id]
+    if not batch_tasks:
+        return jsonify({'error': 'Lote no encontrado'}), 404
+    
+    paths = []
+    for task in batch_tasks:
+        if task['status'] != 'completed':
+            continue
+        for name in task.get('output_files', []):
+            file_path = safe_join(TRANSCRIPTION_DIR, name)
+            if file_path and os.path.isfile(file_path):
+                paths.append(file_path)
+    
+    if not paths:
+        return jsonify({'error': 'El lote no tiene archivos completados'}), 404
+    
+    logger.info(f"BATCH DOWNLOAD: {batch_id} -> {len(paths)} archivo(s)")
+    entries = download_service.unique_arcnames(paths)
+    return Response(
+        stream_with_context(download_service.iter_zip_stream(entries)),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename="transcripciones_{batch_id[:8]}.zip"'}
+    )
+
+@app.route('/search', methods=['GET'])
+def search_transcriptions():
+    """Endpoint de búsqueda de texto completo sobre las transcripciones"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Parámetro q requerido'}), 400
+    
+    if not search_index.enabled:
+        return jsonify({'error': 'Índice de búsqueda no disponible'}), 503
+    
+    try:
+        limit = min(int(request.args.get('limit', 50)), 500)
+    except ValueError:
+        limit = 50
+    speaker = request.args.get('speaker') or None
+    
+    start = time.perf_counter()
+    try:
+        results = search_index.search(query, limit=limit, speaker=speaker)
+    except Exception as e:
+        logger.error(f"SEARCH ERROR: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    
+    return jsonify({
+        'query': query,
+        'results': results,
+        'count': len(results),
+        'elapsed_ms': round(elapsed_ms, 2)
+    })
+
+@app.route('/speakers', methods=['GET'])
+def list_speakers():
+    """Endpoint para listar los hablantes inscritos"""
+    return jsonify({
+        'speakers': [{'name': name, 'samples': speaker_store.count(name)} for name in speaker_store.names()]
+    })
+
+@app.route('/speakers', methods=['POST'])
+def enroll_speaker():
+    """
+    Endpoint para inscribir un hablante a partir de una tarea completada.
+    Body JSON: {task_id, label, name, part (opcional, por defecto 1)}
+    """
+    try:
+        data = request.get_json() or {}
+        task_id = data.get('task_id')
+        label = data.get('label')
+        name = (data.get('name') or '').strip()
+        part = int(data.get('part', 1))
+        
+        if not task_id or not label or not name:
+            return jsonify({'error': 'Se requieren task_id, label y name'}), 400
+        
+        task = tasks.get(task_id)
+        if not task or task['status'] != 'completed':
+            return jsonify({'error': 'Tarea no encontrada o no completada'}), 404
+        
+        match = next((spk for spk in task.get('result', {}).get('speakers', [])
+                      if spk['label'] == label and spk['part'] == part), None)
+        if match is None:
+            return jsonify({'error': f'Hablante {label} no encontrado en la parte {part}'}), 404
+        
+        speaker_store.enroll(name, match['embedding'])
+        logger.info(f"SPEAKER ENROLLED: {label} (parte {part}) de {task['filename']} -> {name}")
+        return jsonify({'message': f'Hablante inscrito: {name}', 'samples': speaker_store.count(name)}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"ENROLL ERROR: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/speakers/<name>', methods=['DELETE'])
+def delete_speaker(name):
+    """Endpoint para eliminar un hablante inscrito"""
+    if not speaker_store.remove(name):
+        return jsonify({'error': 'Hablante no encontrado'}), 404
+    return jsonify({'message': f'Hablante eliminado: {name}'}), 200
+
+@app.route('/live/start', methods=['POST'])
+def live_start():
+    """Endpoint para abrir una sesión de transcripción en directo"""
+    session = live_sessions.start()
+    if session is None:
+        response = jsonify({'error': 'Demasiadas sesiones en directo'})
+        response.status_code = 429
+        response.headers['Retry-After'] = '30'
+        return response
+    # Carga el modelo en directo mientras llega el primer audio
+    ensure_background_tasks()
+    live_inference.start()
+    return jsonify({
+        'session_id': session.id,
+        'sample_rate': LIVE_SAMPLE_RATE,
+        'format': 's16le',
+        'channels': 1,
+        'language': whisper_service.current_language
+    }), 200
+
+@app.route('/live/<session_id>/audio', methods=['POST'])
+def live_audio(session_id):
+    """
+    Endpoint para enviar un trozo de audio de una sesión en directo.
+    Cuerpo: PCM s16le mono a 16 kHz. Devuelve los segmentos definitivos nuevos y el texto provisional.
+    """
+    session = live_sessions.get(session_id)
+    if session is None:
+        return jsonify({'error': 'Sesión no encontrada'}), 404
+    
+    start = time.perf_counter()
+    try:
+        with session.lock:
+            result = session.feed(request.get_data())
+    except Exception as e:
+        logger.error(f"LIVE ERROR: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+    
+    return jsonify({
+        'final': result['final'],
+        'partial': result['partial'],
+        'received_seconds': round(session.received_seconds, 2),
+        'latency_ms': round((time.perf_counter() - start) * 1000, 1)
+    })
+
+@app.route('/live/<session_id>/stop', methods=['POST'])
+def live_stop(session_id):
+    """Endpoint para cerrar una sesión en directo: confirma el audio restante y guarda la transcripción"""
+    session = live_sessions.stop(session_id)
+    if session is None:
+        return jsonify({'error': 'Sesión no encontrada'}), 404
+    
+    try:
+        with session.lock:
+            final = session.finish()
+    except Exception as e:
+        logger.error(f"LIVE ERROR: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+    
+    output_file = None
+    if session.final_segments:
+        txt_name = f"directo_{time.strftime('%Y%m%d_%H%M%S')}_{session.id[:8]}_Transcrito.txt"
+        transcription = "\n".join(f"[{format_offset(s['start'])}] {s['text']}" for s in session.final_segments)
+        output_file = os.path.basename(audio_processor._save_transcription(TRANSCRIPTION_DIR, txt_name, transcription))
+    
+    logger.info(f"LIVE STOP: {session.id} ({session.received_seconds:.1f}s de audio, {session.stats['decodes']} decodificaciones)")
+    return jsonify({
+        'final': final,
+        'transcript': session.transcript(),
+        'output_file': output_file,
+        'received_seconds': round(session.received_seconds, 2),
+        'stats': session.stats
+    })
+
 @app.route('/language', methods=['POST'])
 def set_language():
     """Endpoint para cambiar el idioma de transcripción"""
@@ -267,7 +793,15 @@ def health():
         'status': 'ok',
         'version': '2.1-clean-logs',
         'model': whisper_service.model_name,
-        'model_loaded': whisper_service.model is not None
+        'model_loaded': whisper_service.model is not None,
+        'warmup': warmup_state,
+        'queued_jobs': len(job_queue),
+        'workers': inference_backend.status() if inference_backend else [],
+        'scheduling_policy': job_scheduler.policy,
+        'admission': admission.snapshot(),
+        'live_sessions': len(live_sessions),
+        'live_inference': live_inference.status() if live_inference else None,
+        'rtf': rtf_estimator.snapshot()
     })
 
 @app.route('/config', methods=['POST'])
@@ -292,7 +826,38 @@ def get_config():
         'token_masked': f"{token[:4]}...{token[-4:]}" if token else None
     })
 
+def serve_production(host, port, threads, num_workers, store_path=None):
+    """
+    Modo producción: servidor WSGI multihilo (waitress) que solo atiende HTTP,
+    con la inferencia en procesos separados de larga duración
+    (o en nodos de otras máquinas si se indica un almacén compartido).
+    """
+    try:
+        from waitress import serve
+    except ImportError:
+        logger.error("Modo producción requiere 'waitress': pip install waitress")
+        raise SystemExit(1)
+    
+    start_background_tasks(num_workers=max(1, num_workers), store_path=store_path)
+    backend = f"nodos de inferencia vía {store_path}" if store_path else f"{num_workers} worker(s) de inferencia"
+    logger.info(f"PRODUCTION MODE: waitress en {host}:{port} ({threads} hilos HTTP, {backend})")
+    try:
+        serve(app, host=host, port=port, threads=threads)
+    finally:
+        inference_backend.stop()
+        live_inference.stop()
+
 if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Backend de Audio a Texto")
+    parser.add_argument('--production', action='store_true', help="Servidor WSGI multihilo con workers de inferencia separados")
+    parser.add_argument('--workers', type=int, default=int(config_manager.get('inference_workers', 1)), help="Procesos de inferencia (modo producción)")
+    parser.add_argument('--store', default=config_manager.get('job_store_db'), help="Almacén SQLite compartido con nodos worker_node.py (modo producción)")
+    parser.add_argument('--threads', type=int, default=8, help="Hilos HTTP (modo producción)")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    args = parser.parse_args()
+    
     logger.info("=" * 70)
     logger.info("SERVER STARTING - VERSION 2.2-diarization")
     logger.info("=" * 70)
@@ -300,4 +865,14 @@ if __name__ == '__main__':
     logger.info(f"Transcriptions Dir: {os.path.abspath(TRANSCRIPTION_DIR)}")
     logger.info(f"Whisper Model: {whisper_service.model_name}")
     logger.info("=" * 70)
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    
+    if args.production:
+        serve_production(args.host, args.port, args.threads, args.workers, store_path=args.store)
+    else:
+        # Con debug=True el reloader ejecuta este bloque dos veces: las tareas de fondo
+        # solo se lanzan en el proceso hijo que sirve las peticiones
+        # (sin reloader, ensure_background_tasks las arranca con la primera subida)
+        if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+            start_background_tasks()
+        
+        app.run(debug=True, host=args.host, port=args.port)
@@ -1,25 +1,80 @@
 import os
+import math
+import shutil
+import tempfile
 import subprocess
 import json
 import logging
+import numpy as np
 from pathlib import Path
+from config import config_manager
+from search_index import format_offset
+from memory_monitor import MemoryMonitor, current_rss_mb
+from output_writer import OutputWriter, PublishCancelled, atomic_write, concatenate_parts
+from speech_screen import SpeechScreen
+from job_profiler import run_command
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+SAMPLE_RATE = 16000
+# Memoria transitoria de whisper.transcribe por segundo de audio de una ventana, estimada
+# de log_mel_spectrogram (a 16 kHz, 100 tramas/s, n_fft 400 -> 201 bins):
+#   audio float32 y su copia rellenada en torch   2 × 64 KB
+#   STFT complex64 (201 × 100 × 8 B)                  157 KB
+#   abs() y ** 2 en float32 (201 × 100 × 4 B)     2 × 79 KB
+#   mel y log-mel (80 × 100 × 4 B)                2 × 31 KB
+# ~0.49 MB/s si todo coincide; en el pico conviven la STFT, sus magnitudes y el audio
+# (~0.4 MB/s). Los pesos del modelo ya están en el RSS medido. Se puede ajustar con
+# 'whisper_mb_per_audio_second' a partir del pico de la etapa 'transcribe' en /status.
+WHISPER_MB_PER_AUDIO_SECOND = 0.4
+# La diarización recibe la parte entera en float32 (16000 × 4 B por segundo): los hablantes
+# tienen que ser coherentes en toda la parte, así que memory_budget_mb no la divide en ventanas
+DIARIZATION_MB_PER_AUDIO_SECOND = SAMPLE_RATE * 4 / (1024 * 1024)
+MIN_WINDOW_SECONDS = 60
+# Formatos de audio aceptados (subidas y procesamiento masivo)
+AUDIO_EXTENSIONS = {'.mp3', '.wav', '.m4a', '.flac', '.ogg', '.wma', '.aac', '.mpeg'}
+# Texto de las partes descartadas por la criba de voz (speech_screen.py)
+NO_SPEECH_TEXT = {
+    'silence': '[Sin voz detectada: silencio]',
+    'no_speech': '[Sin voz detectada: música o ruido]'
+}
+
+
+def partial_transcript_name(original_filename, task_id=None):
+    """
+    Nombre de la transcripción parcial de un trabajo. Lleva el task_id: dos subidas
+    con el mismo nombre (y distinto contenido) no deben escribir en el mismo archivo.
+    """
+    stem = Path(original_filename).stem
+    if task_id:
+        return f"{stem}_{task_id}_Transcrito_parcial.txt"
+    return f"{stem}_Transcrito_parcial.txt"
+
+
+def pcm_to_float(samples):
+    """PCM int16 (p. ej. un trozo del memmap) -> float32 en [-1, 1]"""
+    audio = np.asarray(samples, dtype=np.float32)
+    audio /= 32768.0
+    return audio
+
 class AudioProcessor:
     """Procesador de audio con división automática y transcripción"""
     
-    def __init__(self, whisper_service, max_duration_minutes=20):
+    def __init__(self, whisper_service, max_duration_minutes=20, search_index=None):
         """
         Inicializa el procesador de audio
         
         Args:
             whisper_service: Instancia del servicio de Whisper
             max_duration_minutes: Duración máxima por segmento (minutos)
+            search_index: (Opcional) Índice de búsqueda donde registrar cada salida
         """
         self.whisper_service = whisper_service
         self.max_duration_seconds = max_duration_minutes * 60
+        self.search_index = search_index
+        self.writer = OutputWriter()
+        self.speech_screen = SpeechScreen(whisper_service)
     
     def get_audio_duration(self, audio_path):
         """
@@ -40,7 +95,7 @@ class AudioProcessor:
                 audio_path
             ]
             
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            result = run_command(cmd, capture_output=True, text=True, check=True)
             duration_info = json.loads(result.stdout)
             duration = float(duration_info['format']['duration'])
             
@@ -54,76 +109,57 @@ class AudioProcessor:
             logger.error(f"Error al parsear duración: {e}")
             raise
     
-    def split_audio(self, audio_path, output_dir):
+    def decode_to_pcm(self, audio_path, output_dir):
         """
-        Divide un archivo de audio en segmentos usando ffmpeg
+        Decodifica el audio completo una sola vez a PCM s16le mono 16 kHz en disco.
+        Las partes y ventanas se leen después con np.memmap sin cargar el archivo en RAM.
         
         Args:
             audio_path: Ruta al archivo de audio original
-            output_dir: Directorio donde guardar los segmentos
+            output_dir: Directorio donde dejar el .pcm temporal
             
         Returns:
-            list: Lista de rutas a los archivos de audio segmentados
+            str: Ruta del archivo PCM
         """
-        duration = self.get_audio_duration(audio_path)
-        
-        # Si el audio es menor a la duración máxima, no dividir
-        if duration <= self.max_duration_seconds:
-            logger.info("El audio no necesita ser dividido")
-            return [audio_path]
-        
-        # Calcular número de segmentos necesarios
-        num_segments = int(duration / self.max_duration_seconds) + 1
-        segment_duration = self.max_duration_seconds
-        
-        logger.info(f"Dividiendo audio en {num_segments} segmentos de {segment_duration/60:.2f} minutos")
-        
-        # Preparar nombres de archivo
-        audio_filename = Path(audio_path).stem
-        audio_extension = Path(audio_path).suffix
-        
-        segment_paths = []
-        
-        for i in range(num_segments):
-            start_time = i * segment_duration
-            segment_name = f"{audio_filename}_parte{i+1}{audio_extension}"
-            segment_path = os.path.join(output_dir, segment_name)
-            
-            # Comando ffmpeg para extraer el segmento
-            cmd = [
-                'ffmpeg',
-                '-i', audio_path,
-                '-ss', str(start_time),
-                '-t', str(segment_duration),
-                '-c', 'copy',  # Copiar sin recodificar (más rápido)
-                '-y',  # Sobrescribir si existe
-                segment_path
-            ]
-            
-            try:
-                subprocess.run(cmd, capture_output=True, check=True)
-                segment_paths.append(segment_path)
-                logger.info(f"Segmento creado: {segment_name}")
-            except subprocess.CalledProcessError as e:
-                logger.error(f"Error al crear segmento {i+1}: {e}")
-                # Si falla la copia sin recodificar, intentar recodificando
-                cmd = [
-                    'ffmpeg',
-                    '-i', audio_path,
-                    '-ss', str(start_time),
-                    '-t', str(segment_duration),
-                    '-y',
-                    segment_path
-                ]
-                subprocess.run(cmd, capture_output=True, check=True)
-                segment_paths.append(segment_path)
-                logger.info(f"Segmento creado (recodificado): {segment_name}")
-        
-        return segment_paths
+        # Nombre único: dos audios con el mismo nombre (otra carpeta u otra extensión) no chocan
+        fd, pcm_path = tempfile.mkstemp(prefix=f"{Path(audio_path).stem}-", suffix='.pcm', dir=output_dir)
+        os.close(fd)
+        cmd = [
+            'ffmpeg',
+            '-nostdin',
+            '-i', audio_path,
+            '-ac', '1',
+            '-ar', str(SAMPLE_RATE),
+            '-f', 's16le',
+            '-acodec', 'pcm_s16le',
+            '-y',
+            pcm_path
+        ]
+        try:
+            run_command(cmd, capture_output=True, check=True)
+        except subprocess.CalledProcessError as e:
+            logger.error(f"Error al decodificar el audio: {e.stderr.decode(errors='replace')[-500:] if e.stderr else e}")
+            raise
+        return pcm_path
     
-    def process_audio(self, audio_path, output_dir, original_filename=None, include_timestamps=False, perform_diarization=False, num_speakers=None):
+    def window_seconds(self, part_seconds):
+        """
+        Duración de cada ventana de transcripción según memory_budget_mb (0 = sin límite).
+        Lo que queda del presupuesto tras el modelo ya cargado se reparte por segundo de audio.
         """
-        Procesa un archivo de audio: divide si es necesario y transcribe
+        budget_mb = float(config_manager.get('memory_budget_mb', 0))
+        if budget_mb <= 0:
+            return part_seconds
+        available_mb = budget_mb - current_rss_mb()
+        mb_per_second = float(config_manager.get('whisper_mb_per_audio_second', WHISPER_MB_PER_AUDIO_SECOND))
+        window = max(available_mb / mb_per_second, MIN_WINDOW_SECONDS)
+        return min(window, part_seconds)
+    
+    def process_audio(self, audio_path, output_dir, original_filename=None, include_timestamps=False, perform_diarization=False, num_speakers=None, duration=None, on_progress=None, language=None, task_id=None, can_publish=None):
+        """
+        Procesa un archivo de audio: divide si es necesario y transcribe.
+        El audio se decodifica una vez a PCM en disco y cada parte se lee por ventanas
+        (memmap), de modo que la memoria no crece con la duración de la grabación.
         
         Args:
             audio_path: Ruta al archivo de audio
@@ -131,9 +167,15 @@ class AudioProcessor:
             original_filename: Nombre original del archivo (opcional)
             include_timestamps: Si se deben incluir timestamps en la transcripción
             num_speakers: Número esperado de hablantes (opcional, para diarización)
+            duration: Duración del audio en segundos, si ya se conoce (para el progreso)
+            on_progress: (Opcional) callback(**campos) con el progreso y la transcripción parcial
+            language: (Opcional) Idioma del trabajo; por defecto el configurado en whisper_service
+            task_id: (Opcional) Tarea del trabajo, para el nombre de la transcripción parcial
+            can_publish: (Opcional) Función sin argumentos que se consulta antes de publicar
+                cada salida; si devuelve False se aborta con PublishCancelled
             
         Returns:
-            dict: Información sobre los archivos generados
+            dict: Información sobre los archivos generados (incluye el pico de RSS por etapa)
         """
         # IMPORT LOGIC
         from diarization_service import diarization_service
@@ -144,103 +186,313 @@ class AudioProcessor:
         else:
             audio_filename = Path(audio_path).stem
         
-        # Crear directorio temporal para segmentos si no existe
-        temp_dir = os.path.join(output_dir, "temp")
-        os.makedirs(temp_dir, exist_ok=True)
+        # Directorio temporal propio de este trabajo (se borra al terminar, también si falla)
+        temp_root = os.path.join(output_dir, "temp")
+        os.makedirs(temp_root, exist_ok=True)
+        temp_dir = tempfile.mkdtemp(prefix=f"{audio_filename}-", dir=temp_root)
+        
+        budget_mb = float(config_manager.get('memory_budget_mb', 0)) or None
+        monitor = MemoryMonitor(budget_mb)
         
-        # Dividir el audio si es necesario
-        segment_paths = self.split_audio(audio_path, temp_dir)
+        def check_publish():
+            if can_publish is not None and not can_publish():
+                raise PublishCancelled(f"Salidas de {audio_filename} descartadas: el trabajo ya no es de este worker")
         
-        transcriptions = []
-        output_files = []
+        def publish(*args, **kwargs):
+            check_publish()
+            return self._save_transcription(*args, **kwargs)
         
-        # Transcribir cada segmento
-        for i, segment_path in enumerate(segment_paths):
-            logger.info(f"Transcribiendo segmento {i+1}/{len(segment_paths)}")
+        pcm = None
+        partial_file = None
+        writes = []  # Futures de la etapa de escritura (una por parte)
+        try:
+            with monitor.stage('decode'):
+                pcm_path = self.decode_to_pcm(audio_path, temp_dir)
             
-            try:
-                # Transcribir
-                # SIEMPRE pedir timestamps si hay diarización, para poder alinear
-                force_timestamps = include_timestamps or perform_diarization
+            pcm = np.memmap(pcm_path, dtype='<i2', mode='r') if os.path.getsize(pcm_path) else np.zeros(0, dtype='<i2')
+            total_samples = len(pcm)
+            duration = total_samples / SAMPLE_RATE
+            
+            # Partes de max_duration_seconds (cada una con su archivo de salida)
+            part_samples = int(self.max_duration_seconds * SAMPLE_RATE)
+            num_parts = max(1, math.ceil(total_samples / part_samples))
+            if num_parts > 1:
+                logger.info(f"Dividiendo audio en {num_parts} partes de {self.max_duration_seconds/60:.2f} minutos")
+            
+            speakers = []  # Embeddings por hablante y parte (para inscribir hablantes conocidos)
+            
+            # Criba de voz antes de transcribir: las partes con silencio, música o ruido
+            # no pasan por Whisper ni por la diarización
+            with monitor.stage('screen'):
+                screens = [
+                    self.speech_screen.screen(pcm, i * part_samples, min(total_samples, (i + 1) * part_samples), language=language)
+                    for i in range(num_parts)
+                ]
+            no_speech = None
+            if all(not screen['speech'] for screen in screens):
+                no_speech = 'silence' if all(screen['reason'] == 'silence' for screen in screens) else 'no_speech'
+                logger.info(f"SCREEN: {audio_filename} sin voz ({no_speech}), no se transcribe")
+                if on_progress:
+                    on_progress(no_speech=no_speech, progress=90)
+            
+            # Transcripción parcial: cada segmento de Whisper se añade en cuanto se decodifica
+            partial_txt_name = partial_transcript_name(original_filename or os.path.basename(audio_path), task_id)
+            partial_file = open(os.path.join(output_dir, partial_txt_name), 'w', encoding='utf-8')
+            partial_count = 0
+            
+            # Transcribir cada parte
+            for i in range(num_parts):
+                logger.info(f"Transcribiendo segmento {i+1}/{num_parts}")
+                part_start = i * part_samples
+                part_end = min(total_samples, part_start + part_samples)
+                part_offset = i * self.max_duration_seconds
                 
-                logger.info(f"Transcribing segment {i+1} with timestamps={force_timestamps}")
-                transcription_result = self.whisper_service.transcribe(segment_path, include_timestamps=force_timestamps)
+                def on_segment(start, end, text, part_offset=part_offset):
+                    nonlocal partial_count
+                    text = text.strip()
+                    if not text:
+                        return
+                    partial_file.write(f"[{format_offset(part_offset + start)}] {text}\n")
+                    partial_file.flush()
+                    partial_count += 1
+                    if on_progress:
+                        fields = {'partial_file': partial_txt_name, 'partial_segments': partial_count}
+                        if duration:
+                            fields['progress'] = int(30 + 65 * min((part_offset + end) / duration, 1.0))
+                        on_progress(**fields)
                 
-                # Diarización (Identificación de hablantes)
-                speaker_segments = []
-                if perform_diarization:
-                    try:
-                        logger.info(f"Iniciando diarización para segmento {i+1}...")
-                        speaker_segments = diarization_service.diarize(segment_path, num_speakers=num_speakers)
-                    except Exception as e:
-                        logger.error(f"Fallo en diarización: {e}. Se continuará sin speaker ID.")
-                        perform_diarization = False # Desactivar para este segmento si falla
+                if not screens[i]['speech']:
+                    logger.info(f"SCREEN: parte {i+1} sin voz ({screens[i]['reason']}, voz {screens[i]['speech_ratio']}, "
+                                f"no_speech {screens[i]['no_speech_probs']})")
+                    segment_txt_name = f"{audio_filename}_Transcrito_parte{i+1}.txt" if num_parts > 1 else f"{audio_filename}_Transcrito.txt"
+                    writes.append(self.writer.submit(publish, output_dir, segment_txt_name,
+                                                     NO_SPEECH_TEXT[screens[i]['reason']], part_offset=part_offset))
+                    continue
+                
+                try:
+                    # Transcribir
+                    # SIEMPRE pedir timestamps si hay diarización, para poder alinear.
+                    # Los tiempos por palabra solo hacen falta para alinear hablantes:
+                    # _format_with_timestamps usa el inicio de cada segmento
+                    force_timestamps = include_timestamps or perform_diarization
+                    word_timestamps = perform_diarization
+                    
+                    logger.info(f"Transcribing segment {i+1} with timestamps={force_timestamps}, words={word_timestamps}")
+                    with monitor.stage(f'transcribe parte {i+1}'):
+                        transcription_result = self._transcribe_windows(pcm, part_start, part_end, force_timestamps, on_segment,
+                                                                        word_timestamps=word_timestamps, language=language)
+                    
+                    # Diarización (Identificación de hablantes)
+                    speaker_segments = []
+                    if perform_diarization:
+                        try:
+                            logger.info(f"Iniciando diarización para segmento {i+1}...")
+                            # Excepción al presupuesto: la parte entera pasa a float32 (~77 MB por
+                            # 20 min, más lo que use pyannote); se acota con la duración de parte
+                            part_mb = (part_end - part_start) / SAMPLE_RATE * DIARIZATION_MB_PER_AUDIO_SECOND
+                            if budget_mb and current_rss_mb() + part_mb > budget_mb:
+                                logger.warning(f"MEMORY: la diarización de la parte {i+1} necesita ~{part_mb:.0f} MB y supera "
+                                               f"memory_budget_mb ({budget_mb:.0f} MB); reduce la duración de parte")
+                            with monitor.stage(f'diarize parte {i+1}'):
+                                samples = pcm_to_float(pcm[part_start:part_end])
+                                speaker_segments, label_embeddings = diarization_service.diarize_with_embeddings(samples, num_speakers=num_speakers)
+                                del samples
+                            for label, embedding in label_embeddings.items():
+                                speakers.append({
+                                    'part': i + 1,
+                                    'label': label,
+                                    'embedding': [float(x) for x in embedding]
+                                })
+                        except Exception as e:
+                            logger.error(f"Fallo en diarización: {e}. Se continuará sin speaker ID.")
+                            perform_diarization = False # Desactivar para este segmento si falla
 
-                # Format transcription
-                if force_timestamps and isinstance(transcription_result, dict):
-                    num_segments = len(transcription_result.get('segments', []))
-                    logger.info(f"Formatting {num_segments} segments. Diarization enabled: {perform_diarization}")
+                    # Format transcription
+                    if force_timestamps and isinstance(transcription_result, dict):
+                        num_segments = len(transcription_result.get('segments', []))
+                        logger.info(f"Formatting {num_segments} segments. Diarization enabled: {perform_diarization}")
+                        
+                        if perform_diarization and speaker_segments:
+                             transcription = self._format_with_speakers(transcription_result, speaker_segments)
+                        elif include_timestamps:
+                             transcription = self._format_with_timestamps(transcription_result)
+                        else:
+                             # Si forzamos timestamps solo por diarización pero falló, devolvemos texto plano
+                             transcription = transcription_result.get('text', '').strip()
+                    else:
+                        transcription = transcription_result if isinstance(transcription_result, str) else transcription_result.get('text', '')
                     
-                    if perform_diarization and speaker_segments:
-                         transcription = self._format_with_speakers(transcription_result, speaker_segments)
-                    elif include_timestamps:
-                         transcription = self._format_with_timestamps(transcription_result)
+                    # Guardar transcripción del segmento
+                    if num_parts > 1:
+                        segment_txt_name = f"{audio_filename}_Transcrito_parte{i+1}.txt"
                     else:
-                         # Si forzamos timestamps solo por diarización pero falló, devolvemos texto plano
-                         transcription = transcription_result.get('text', '').strip()
-                else:
-                    transcription = transcription_result if isinstance(transcription_result, str) else transcription_result.get('text', '')
-                
-                transcriptions.append(transcription)
-                
-                # Guardar transcripción del segmento
-                if len(segment_paths) > 1:
-                    segment_txt_name = f"{audio_filename}_Transcrito_parte{i+1}.txt"
-                else:
-                    segment_txt_name = f"{audio_filename}_Transcrito.txt"
-                
-                segment_txt_path = os.path.join(output_dir, segment_txt_name)
-                
-                with open(segment_txt_path, 'w', encoding='utf-8') as f:
-                    f.write(transcription)
-                
-                output_files.append(segment_txt_path)
-                logger.info(f"Transcripción guardada: {segment_txt_name}")
-                
-            except Exception as e:
-                logger.error(f"Error transcribiendo segmento {i+1}: {e}")
-                raise
-        
-        # Si hubo múltiples segmentos, crear archivo consolidado
-        if len(segment_paths) > 1:
-            consolidated_txt_name = f"{audio_filename}_Transcrito_completo.txt"
-            consolidated_txt_path = os.path.join(output_dir, consolidated_txt_name)
-            
-            with open(consolidated_txt_path, 'w', encoding='utf-8') as f:
-                for i, transcription in enumerate(transcriptions):
-                    if i > 0:
-                        f.write("\n\n")  # Separador entre segmentos
-                    f.write(f"--- Parte {i+1} ---\n\n")
-                    f.write(transcription)
+                        segment_txt_name = f"{audio_filename}_Transcrito.txt"
+                    
+                    # Escritura e indexado en la etapa de salida: la inferencia sigue con la siguiente parte
+                    writes.append(self.writer.submit(publish, output_dir, segment_txt_name, transcription, part_offset=part_offset))
+                    
+                    # La etapa de escritura tiene su copia: aquí ya no hace falta
+                    del transcription_result, speaker_segments, transcription
+                    
+                except Exception as e:
+                    logger.error(f"Error transcribiendo segmento {i+1}: {e}")
+                    raise
             
-            output_files.append(consolidated_txt_path)
-            logger.info(f"Transcripción consolidada guardada: {consolidated_txt_name}")
+            # Esperar a que estén publicadas todas las partes (propaga errores de escritura)
+            with monitor.stage('write'):
+                output_files = [future.result() for future in writes]
+                
+                # Consolidado a partir de los archivos de cada parte (sin el texto en memoria)
+                if num_parts > 1:
+                    check_publish()
+                    consolidated_txt_name = f"{audio_filename}_Transcrito_completo.txt"
+                    consolidated_txt_path = concatenate_parts(output_files, os.path.join(output_dir, consolidated_txt_name))
+                    output_files.append(consolidated_txt_path)
+                    logger.info(f"Transcripción consolidada guardada: {consolidated_txt_name}")
+        finally:
+            # Si la inferencia falló, no dejar escrituras a medias al salir
+            for future in writes:
+                future.exception()
+            if partial_file:
+                partial_file.close()
+            # Cerrar el memmap antes de borrar el archivo (Windows no borra archivos mapeados)
+            del pcm
+            shutil.rmtree(temp_dir, ignore_errors=True)
         
-        # Limpiar archivos temporales de segmentos (solo si fueron divididos)
-        if len(segment_paths) > 1:
-            for segment_path in segment_paths:
-                try:
-                    os.remove(segment_path)
-                except:
-                    pass
+        # La transcripción parcial ya no hace falta: están los archivos finales
+        try:
+            os.remove(os.path.join(output_dir, partial_txt_name))
+        except OSError:
+            pass
         
         return {
             'original_file': original_filename if original_filename else audio_filename,
-            'num_segments': len(segment_paths),
+            'num_segments': num_parts,
+            'duration': duration,
             'output_files': output_files,
+            'speakers': speakers,
+            'no_speech': no_speech,
+            'screen': screens,
+            'memory': monitor.stages,
+            'peak_rss_mb': monitor.peak_mb(),
             'success': True
         }
     
+    def _transcribe_windows(self, pcm, start, end, include_timestamps, on_segment=None, word_timestamps=False, language=None):
+        """
+        Transcribe una parte del memmap por ventanas que caben en memory_budget_mb.
+        Cada ventana usa el final del texto anterior como prompt para no perder el contexto,
+        y sus timestamps se desplazan al inicio de la parte. Con on_segment, cada segmento
+        se entrega (ya desplazado) en cuanto termina su ventana.
+        
+        Returns:
+            str o dict: Como whisper_service.transcribe para la parte completa
+        """
+        part_seconds = (end - start) / SAMPLE_RATE
+        window_samples = max(int(self.window_seconds(part_seconds) * SAMPLE_RATE), 1)
+        num_windows = max(1, math.ceil((end - start) / window_samples))
+        if num_windows > 1:
+            logger.info(f"Parte de {part_seconds:.0f}s en {num_windows} ventanas de {window_samples / SAMPLE_RATE:.0f}s (memory_budget_mb)")
+        
+        texts = []
+        segments = []
+        for w in range(num_windows):
+            window_start = start + w * window_samples
+            window_end = min(end, window_start + window_samples)
+            offset = (window_start - start) / SAMPLE_RATE
+            
+            # Solo esta ventana pasa a float32 en memoria.
+            # Con on_segment hacen falta los segmentos aunque no se pidan timestamps
+            audio = pcm_to_float(pcm[window_start:window_end])
+            prompt = texts[-1][-200:] if texts else None
+            result = self.whisper_service.transcribe(audio, include_timestamps=include_timestamps or on_segment is not None,
+                                                     initial_prompt=prompt, word_timestamps=word_timestamps, language=language)
+            del audio
+            
+            if isinstance(result, dict):
+                texts.append(result.get('text', '').strip())
+                for segment in result.get('segments', []):
+                    segment['start'] += offset
+                    segment['end'] += offset
+                    if on_segment:
+                        try:
+                            on_segment(segment['start'], segment['end'], segment.get('text', ''))
+                        except Exception as e:
+                            logger.error(f"Error en callback de segmento: {e}")
+                    if not include_timestamps:
+                        continue
+                    segment['id'] = len(segments)
+                    for word in segment.get('words', []) or []:
+                        word['start'] += offset
+                        word['end'] += offset
+                    segments.append(segment)
+            else:
+                texts.append(result.strip())
+        
+        text = ' '.join(t for t in texts if t)
+        if include_timestamps:
+            return {'text': text, 'segments': segments}
+        return text
+    
+    def process_short_batch(self, items, output_dir, include_timestamps=False, language=None):
+        """
+        Transcribe en lote varios audios cortos ya decodificados (notas de voz).
+        Evita por archivo el ffprobe, el directorio temporal y la llamada a transcribe.
+        
+        Args:
+            items: Lista de tuplas (audio float32 16 kHz, nombre original)
+            output_dir: Directorio donde guardar las transcripciones
+            include_timestamps: Si se deben incluir timestamps en la transcripción
+            language: (Opcional) Idioma del lote
+            
+        Returns:
+            list: Un dict de resultado por audio (mismo formato que process_audio)
+        """
+        results = self.whisper_service.transcribe_batch([audio for audio, _ in items], include_timestamps=include_timestamps,
+                                                       language=language)
+        
+        outputs = []
+        for (_, original_filename), transcription_result in zip(items, results):
+            if include_timestamps and isinstance(transcription_result, dict):
+                transcription = self._format_with_timestamps(transcription_result)
+            else:
+                transcription = transcription_result if isinstance(transcription_result, str) else transcription_result.get('text', '').strip()
+            
+            audio_filename = Path(original_filename).stem
+            txt_path = self._save_transcription(output_dir, f"{audio_filename}_Transcrito.txt", transcription)
+            outputs.append({
+                'original_file': original_filename,
+                'num_segments': 1,
+                'output_files': [txt_path],
+                'speakers': [],
+                'batched': True,
+                'success': True
+            })
+        return outputs
+    
+    def _save_transcription(self, output_dir, txt_name, transcription, part_offset=0.0):
+        """
+        Guarda una transcripción y la registra en el índice de búsqueda
+        
+        Returns:
+            str: Ruta del archivo escrito
+        """
+        txt_path = os.path.join(output_dir, txt_name)
+        
+        # Temporal + renombrado: nunca se publica (ni se descarga) un archivo a medias
+        atomic_write(txt_path, transcription)
+        
+        logger.info(f"Transcripción guardada: {txt_name}")
+        
+        # Indexar para búsqueda (un fallo aquí no debe romper la transcripción)
+        if self.search_index:
+            try:
+                self.search_index.index_file(txt_path, part_offset=part_offset)
+            except Exception as e:
+                logger.error(f"Error indexando {txt_name}: {e}")
+        
+        return txt_path
+    
     def _format_with_timestamps(self, result):
         """
         Formatea la transcripción con timestamps en formato [HH:MM:SS]
@@ -321,120 +573,291 @@ class AudioProcessor:
 
     def _format_with_word_alignment(self, result, speaker_segments):
         """
-        Alineación híbrida v2: 
+        Alineación híbrida v3 (columnar):
         1. Asigna hablantes a palabras (con tolerancia para palabras en los bordes).
         2. Suaviza asignaciones incorrectas (palabras sueltas).
         3. Mantiene la estructura de frases original de Whisper.
-        """
-        lines = []
-        
-        # Optimizacion: Ordenar segmentos de hablantes por tiempo
-        speaker_segments.sort(key=lambda x: x['start'])
         
+        Las palabras se guardan en arrays NumPy (inicio, fin, segmento, hablante)
+        y todas las pasadas son vectorizadas o por tramos (run-length).
+        """
         def secs_to_str(seconds_float):
             hours = int(seconds_float // 3600)
             minutes = int((seconds_float % 3600) // 60)
             seconds = int(seconds_float % 60)
             return f"[{hours:02d}:{minutes:02d}:{seconds:02d}]"
+        
+        words = WordTable.from_whisper_result(result)
+        if len(words) == 0:
+            return ""
+        
+        # 1. Asignar hablante a cada palabra
+        labels, codes = assign_word_speakers(words.starts, words.ends, speaker_segments)
+        
+        # 2. Suavizado de hablantes (Voting / Smoothing)
+        codes = smooth_word_speakers(codes, words.segment_ids)
+        
+        # 2b. Suavizado global (ignora los límites de segmento): filtro de mayoría
+        #     y absorción de turnos más cortos que el mínimo configurado
+        window = int(config_manager.get('speaker_smoothing_window', 1))
+        min_turn = float(config_manager.get('min_speaker_turn', 0.0))
+        if window > 1:
+            codes = majority_filter_speakers(codes, window)
+        if min_turn > 0:
+            codes = merge_short_turns(codes, words.starts, words.ends, min_turn)
+        
+        # 3. Agrupar palabras consecutivas del MISMO hablante DENTRO del segmento
+        lines = []
+        for run_start, run_end, code in speaker_runs(codes, words.segment_ids):
+            text = "".join(words.texts[run_start:run_end]).strip()
+            text = text.replace(" ,", ",").replace(" .", ".").replace(" ?", "?").replace(" !", "!")
+            if text:
+                speaker = labels[code] if code >= 0 else "Unknown"
+                lines.append(f"{secs_to_str(words.starts[run_start])} [{speaker}]: {text}")
+        
+        return "\n".join(lines)
 
-        for segment in result.get('segments', []):
-            words = segment.get('words', [])
-            if not words:
-                continue
-                
-            # 1. Asignar hablante a cada palabra del segmento
-            words_with_speaker = []
-            for word in words:
-                w_start = word['start']
-                w_end = word['end']
-                w_center = (w_start + w_end) / 2
-                
-                best_speaker = None
-                
-                # A) Búsqueda exacta (centro de la palabra dentro del segmento)
-                for spk in speaker_segments:
-                    if spk['start'] <= w_center <= spk['end']:
-                        best_speaker = spk['speaker']
-                        break 
-                
-                # B) Búsqueda por proximidad (si no hay exacto)
-                # Muchas veces la palabra empieza milisegundos antes que la diarización
-                if not best_speaker:
-                    closest_dist = float('inf')
-                    for spk in speaker_segments:
-                        # Distancia al segmento (0 si está dentro)
-                        dist = 0
-                        if w_center < spk['start']:
-                            dist = spk['start'] - w_center
-                        elif w_center > spk['end']:
-                            dist = w_center - spk['end']
-                        
-                        # Si está muy cerca (< 0.5s), es candidato
-                        if dist < 0.5 and dist < closest_dist:
-                            closest_dist = dist
-                            best_speaker = spk['speaker']
-                
-                words_with_speaker.append({
-                    'word': word['word'],
-                    'start': w_start,
-                    'end': w_end,
-                    'speaker': best_speaker if best_speaker else "Unknown"
-                })
-            
-            # 2. Suavizado de hablantes (Voting / Smoothing)
-            # Evita que una palabra suelta rompa la frase: A A B A A -> A A A A A
-            for i in range(1, len(words_with_speaker) - 1):
-                prev_spk = words_with_speaker[i-1]['speaker']
-                curr_spk = words_with_speaker[i]['speaker']
-                next_spk = words_with_speaker[i+1]['speaker']
-                
-                # Si la palabra actual es diferente a las de los lados, corregirla
-                if prev_spk == next_spk and curr_spk != prev_spk:
-                    words_with_speaker[i]['speaker'] = prev_spk
-                
-                # Si la actual es Unknown, heredar del anterior (flujo continuo)
-                if curr_spk == "Unknown" and prev_spk != "Unknown":
-                    words_with_speaker[i]['speaker'] = prev_spk
 
-            # Corrección de inicio si es Unknown (heredar del siguiente)
-            if words_with_speaker[0]['speaker'] == "Unknown" and len(words_with_speaker) > 1:
-                if words_with_speaker[1]['speaker'] != "Unknown":
-                    words_with_speaker[0]['speaker'] = words_with_speaker[1]['speaker']
+class WordTable:
+    """Palabras de Whisper en formato columnar (arrays en vez de un dict por palabra)"""
+    
+    def __init__(self, starts, ends, segment_ids, texts):
+        self.starts = starts
+        self.ends = ends
+        self.segment_ids = segment_ids
+        self.texts = texts
+    
+    @classmethod
+    def from_whisper_result(cls, result):
+        """Extrae las palabras de todos los segmentos de un resultado de Whisper"""
+        starts = []
+        ends = []
+        segment_ids = []
+        texts = []
+        for segment_idx, segment in enumerate(result.get('segments', [])):
+            for word in segment.get('words') or []:
+                starts.append(word['start'])
+                ends.append(word['end'])
+                segment_ids.append(segment_idx)
+                texts.append(word['word'])
+        return cls(
+            np.asarray(starts, dtype=np.float64),
+            np.asarray(ends, dtype=np.float64),
+            np.asarray(segment_ids, dtype=np.int64),
+            texts
+        )
+    
+    def __len__(self):
+        return len(self.texts)
 
-            # 3. Agrupar palabras consecutivas del MISMO hablante DENTRO del segmento
-            if not words_with_speaker:
-                continue
 
-            current_speaker = words_with_speaker[0]['speaker']
-            current_group_words = []
-            current_group_start = words_with_speaker[0]['start']
-            
-            for w in words_with_speaker:
-                # Cambio de hablante solo si no es Unknown (para evitar fragmentación por silencios)
-                if w['speaker'] != "Unknown" and w['speaker'] != current_speaker:
-                    
-                    # Guardar grupo anterior
-                    if current_group_words:
-                        text = "".join([w['word'] for w in current_group_words]).strip()
-                        text = text.replace(" ,", ",").replace(" .", ".").replace(" ?", "?").replace(" !", "!")
-                        if text:
-                            lines.append(f"{secs_to_str(current_group_start)} [{current_speaker}]: {text}")
-                    
-                    # Iniciar nuevo grupo
-                    current_speaker = w['speaker']
-                    current_group_words = [w]
-                    current_group_start = w['start']
-                else:
-                    current_group_words.append(w)
-                    # Si veníamos de Unknown y ahora tenemos hablante, actualizar el label del grupo actual
-                    if current_speaker == "Unknown" and w['speaker'] != "Unknown":
-                        current_speaker = w['speaker']
-            
-            # Guardar el último grupo del segmento
-            if current_group_words:
-                text = "".join([w['word'] for w in current_group_words]).strip()
-                text = text.replace(" ,", ",").replace(" .", ".").replace(" ?", "?").replace(" !", "!")
-                if text:
-                    lines.append(f"{secs_to_str(current_group_start)} [{current_speaker}]: {text}")
-            
-        return "\n".join(lines)
+def assign_word_speakers(word_starts, word_ends, speaker_segments, tolerance=0.5):
+    """
+    Asigna a cada palabra el hablante cuyo turno contiene su centro.
+    Si ninguno lo contiene, el turno más cercano a menos de 'tolerance' segundos
+    (muchas veces la palabra empieza milisegundos antes que la diarización).
+    
+    Returns:
+        tuple: (lista de etiquetas, array de códigos por palabra; -1 = Unknown)
+    """
+    num_words = len(word_starts)
+    codes = np.full(num_words, -1, dtype=np.int64)
+    if not speaker_segments or num_words == 0:
+        return [], codes
+    
+    # Optimizacion: Ordenar segmentos de hablantes por tiempo (orden estable)
+    ordered = sorted(speaker_segments, key=lambda x: x['start'])
+    labels = sorted({spk['speaker'] for spk in ordered})
+    label_codes = {label: idx for idx, label in enumerate(labels)}
+    
+    spk_starts = np.array([spk['start'] for spk in ordered], dtype=np.float64)
+    spk_ends = np.array([spk['end'] for spk in ordered], dtype=np.float64)
+    spk_codes = np.array([label_codes[spk['speaker']] for spk in ordered], dtype=np.int64)
+    
+    # Máximo acumulado de los finales y el primer índice que lo alcanza
+    max_end = np.maximum.accumulate(spk_ends)
+    is_new_max = np.empty(len(spk_ends), dtype=bool)
+    is_new_max[0] = True
+    is_new_max[1:] = spk_ends[1:] > max_end[:-1]
+    max_end_idx = np.maximum.accumulate(np.where(is_new_max, np.arange(len(spk_ends)), 0))
+    
+    centers = (word_starts + word_ends) / 2
+    
+    # Turnos que empiezan antes del centro: índices [0, num_before)
+    num_before = np.searchsorted(spk_starts, centers, side='right')
+    
+    # A) Búsqueda exacta: el primer turno (por orden de inicio) que contiene el centro
+    first_covering = np.searchsorted(max_end, centers, side='left')
+    exact = first_covering < num_before
+    codes[exact] = spk_codes[first_covering[exact]]
+    
+    # B) Búsqueda por proximidad para el resto:
+    #    - anterior: el turno con el final más tardío de los que empiezan antes
+    #    - siguiente: el primer turno que empieza después del centro
+    pending = ~exact
+    has_prev = pending & (num_before > 0)
+    has_next = pending & (num_before < len(spk_starts))
+    
+    prev_idx = max_end_idx[np.maximum(num_before - 1, 0)]
+    next_idx = np.minimum(num_before, len(spk_starts) - 1)
+    dist_prev = np.where(has_prev, centers - spk_ends[prev_idx], np.inf)
+    dist_next = np.where(has_next, spk_starts[next_idx] - centers, np.inf)
+    
+    # En empate gana el anterior (aparece antes en el orden)
+    use_prev = dist_prev <= dist_next
+    best_dist = np.where(use_prev, dist_prev, dist_next)
+    best_code = np.where(use_prev, spk_codes[prev_idx], spk_codes[next_idx])
+    
+    near = pending & (best_dist < tolerance)
+    codes[near] = best_code[near]
+    
+    return labels, codes
+
+
+def smooth_word_speakers(codes, segment_ids):
+    """
+    Suavizado de hablantes dentro de cada segmento de Whisper:
+    1. Las palabras Unknown heredan del hablante anterior (o del siguiente al inicio).
+    2. Una palabra suelta entre dos del mismo hablante se corrige: A A B A A -> A A A A A
+       (en cadenas alternas A B A B A se corrige de izquierda a derecha, como antes).
+    """
+    num_words = len(codes)
+    if num_words == 0:
+        return codes
+    
+    positions = np.arange(num_words)
+    new_segment = np.empty(num_words, dtype=bool)
+    new_segment[0] = True
+    new_segment[1:] = segment_ids[1:] != segment_ids[:-1]
+    segment_first = np.maximum.accumulate(np.where(new_segment, positions, 0))
+    end_segment = np.empty(num_words, dtype=bool)
+    end_segment[-1] = True
+    end_segment[:-1] = new_segment[1:]
+    segment_last = np.minimum.accumulate(np.where(end_segment, positions, num_words)[::-1])[::-1]
+    
+    # 1. Rellenar Unknown (-1) hacia delante y, al inicio del segmento, hacia atrás
+    known = codes >= 0
+    last_known = np.maximum.accumulate(np.where(known, positions, -1))
+    next_known = np.minimum.accumulate(np.where(known, positions, num_words)[::-1])[::-1]
+    
+    filled = codes.copy()
+    use_last = ~known & (last_known >= segment_first)
+    filled[use_last] = codes[last_known[use_last]]
+    use_next = ~known & ~use_last & (next_known <= segment_last)
+    filled[use_next] = codes[next_known[use_next]]
+    
+    # 2. Palabras sueltas: vecinos del mismo segmento con el mismo hablante
+    if num_words < 3:
+        return filled
+    
+    island = np.zeros(num_words, dtype=bool)
+    inner = (~new_segment[1:-1]) & (~end_segment[1:-1])
+    island[1:-1] = inner & (filled[:-2] == filled[2:]) & (filled[1:-1] != filled[:-2])
+    
+    # En cadenas de islas consecutivas solo se corrigen las posiciones pares de la cadena:
+    # tras corregir una, la siguiente ya coincide con su vecina izquierda
+    chain_start = np.empty(num_words, dtype=bool)
+    chain_start[0] = island[0]
+    chain_start[1:] = island[1:] & ~island[:-1]
+    chain_first = np.maximum.accumulate(np.where(chain_start, positions, 0))
+    flip = island & ((positions - chain_first) % 2 == 0)
+    
+    smoothed = filled.copy()
+    smoothed[1:][flip[1:]] = filled[:-1][flip[1:]]
+    return smoothed
+
+
+def majority_filter_speakers(codes, window):
+    """
+    Filtro de mediana (mayoría, al ser etiquetas) sobre toda la línea temporal.
+    Cada palabra toma el hablante más frecuente en una ventana de 'window' palabras
+    centrada en ella. O(palabras x hablantes) usando sumas acumuladas.
+    
+    Args:
+        codes: Códigos de hablante por palabra (-1 = Unknown, no vota ni se modifica)
+        window: Tamaño de la ventana en palabras (se fuerza a impar)
+    """
+    num_words = len(codes)
+    num_speakers = int(codes.max()) + 1 if num_words else 0
+    if num_words == 0 or num_speakers <= 1 or window <= 1:
+        return codes
+    
+    half = window // 2
+    known = codes >= 0
+    
+    # Conteo acumulado por hablante: cumulative[i, s] = palabras de s en [0, i)
+    one_hot = np.zeros((num_words + 1, num_speakers), dtype=np.int32)
+    one_hot[np.flatnonzero(known) + 1, codes[known]] = 1
+    cumulative = np.cumsum(one_hot, axis=0)
+    
+    positions = np.arange(num_words)
+    lo = np.maximum(positions - half, 0)
+    hi = np.minimum(positions + half + 1, num_words)
+    counts = cumulative[hi] - cumulative[lo]
+    
+    best = counts.argmax(axis=1)
+    best_count = counts[positions, best]
+    # En empate se conserva el hablante actual
+    own_count = counts[positions, np.maximum(codes, 0)]
+    
+    filtered = np.where(own_count >= best_count, codes, best)
+    return np.where(known, filtered, codes)
+
+
+def merge_short_turns(codes, word_starts, word_ends, min_duration):
+    """
+    Absorbe los turnos de hablante más cortos que 'min_duration' segundos
+    (parpadeos de la diarización) en el turno largo vecino, en toda la línea temporal.
+    Si los turnos largos a ambos lados son del mismo hablante se une a ellos;
+    si no, al más largo de los dos. Tiempo lineal (por tramos).
+    """
+    num_words = len(codes)
+    if num_words == 0:
+        return codes
+    
+    boundaries = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+    run_starts = np.concatenate(([0], boundaries))
+    run_ends = np.concatenate((boundaries, [num_words]))
+    run_codes = codes[run_starts]
+    durations = word_ends[run_ends - 1] - word_starts[run_starts]
+    num_runs = len(run_starts)
+    
+    # Los tramos Unknown ni se absorben ni absorben
+    short = (durations < min_duration) & (run_codes >= 0)
+    anchor = ~short & (run_codes >= 0)
+    if not short.any() or not anchor.any():
+        return codes
+    
+    run_positions = np.arange(num_runs)
+    prev_anchor = np.maximum.accumulate(np.where(anchor, run_positions, -1))
+    next_anchor = np.minimum.accumulate(np.where(anchor, run_positions, num_runs)[::-1])[::-1]
+    has_prev = prev_anchor >= 0
+    has_next = next_anchor < num_runs
+    prev_safe = np.maximum(prev_anchor, 0)
+    next_safe = np.minimum(next_anchor, num_runs - 1)
+    
+    prev_duration = np.where(has_prev, durations[prev_safe], -1.0)
+    next_duration = np.where(has_next, durations[next_safe], -1.0)
+    same_label = has_prev & has_next & (run_codes[prev_safe] == run_codes[next_safe])
+    use_prev = same_label | (prev_duration >= next_duration)
+    replacement = np.where(use_prev, run_codes[prev_safe], run_codes[next_safe])
+    
+    new_run_codes = np.where(short, replacement, run_codes)
+    return np.repeat(new_run_codes, run_ends - run_starts)
+
+
+def speaker_runs(codes, segment_ids):
+    """
+    Tramos consecutivos con el mismo hablante dentro del mismo segmento
+    
+    Yields:
+        tuple: (inicio, fin exclusivo, código de hablante)
+    """
+    num_words = len(codes)
+    if num_words == 0:
+        return
+    boundaries = np.flatnonzero((codes[1:] != codes[:-1]) | (segment_ids[1:] != segment_ids[:-1])) + 1
+    run_starts = np.concatenate(([0], boundaries))
+    run_ends = np.concatenate((boundaries, [num_words]))
+    for run_start, run_end in zip(run_starts.tolist(), run_ends.tolist()):
+        yield run_start, run_end, int(codes[run_start])
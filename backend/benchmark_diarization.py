@@ -0,0 +1,114 @@
+"""
+Benchmark de los presets de diarización (diarization_service.py) en CPU.
+
+Diariza cada grabación de un conjunto fijo con cada preset y compara el tiempo
+de reloj y la coincidencia de hablantes con el preset 'default' (fracción del
+tiempo con habla en la que ambos asignan el mismo hablante, tras emparejar
+etiquetas por solapamiento).
+
+Uso:
+    python benchmark_diarization.py grabacion1.wav [grabacion2.mp3 ...] [--presets default fast] [--threads 4]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+
+GRID_SECONDS = 0.1  # Resolución de la comparación entre presets
+
+
+def load_fixture(path):
+    """Decodifica una grabación a float32 mono 16 kHz (una sola vez para todos los presets)"""
+    from audio_processor import AudioProcessor, pcm_to_float
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pcm_path = AudioProcessor(None).decode_to_pcm(path, temp_dir)
+        return pcm_to_float(np.fromfile(pcm_path, dtype='<i2'))
+
+
+def label_grid(segments, duration):
+    """Hablante en cada celda de GRID_SECONDS (None = sin habla)"""
+    grid = [None] * int(np.ceil(duration / GRID_SECONDS))
+    for segment in segments:
+        for cell in range(int(segment['start'] / GRID_SECONDS), min(len(grid), int(np.ceil(segment['end'] / GRID_SECONDS)))):
+            grid[cell] = segment['speaker']
+    return grid
+
+
+def agreement(reference, candidate):
+    """Coincidencia de 'candidate' con 'reference' emparejando cada etiqueta con la que más se solapa"""
+    overlap = {}
+    for ref, cand in zip(reference, candidate):
+        if ref is not None and cand is not None:
+            overlap[(cand, ref)] = overlap.get((cand, ref), 0) + 1
+    mapping = {}
+    for (cand, ref), count in sorted(overlap.items(), key=lambda item: -item[1]):
+        if cand not in mapping and ref not in mapping.values():
+            mapping[cand] = ref
+    speech = sum(1 for ref, cand in zip(reference, candidate) if ref is not None or cand is not None)
+    same = sum(1 for ref, cand in zip(reference, candidate) if ref is not None and mapping.get(cand) == ref)
+    return same / speech if speech else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de presets de diarización")
+    parser.add_argument('fixtures', nargs='+', help="Grabaciones de prueba (cualquier formato que lea ffmpeg)")
+    parser.add_argument('--presets', nargs='+', default=['default', 'fast'], help="Presets a comparar (el primero es la referencia)")
+    parser.add_argument('--threads', type=int, default=None, help="Hilos de torch (por defecto 'torch_threads' de config.json)")
+    parser.add_argument('--speakers', type=int, default=None, help="Número de hablantes, si se conoce")
+    args = parser.parse_args()
+
+    from config import config_manager
+    from diarization_service import diarization_service
+
+    if args.threads:
+        config_manager._config['torch_threads'] = args.threads
+    if not diarization_service.load_pipeline():
+        print("No se pudo cargar el pipeline de diarización (¿token de Hugging Face en config.json?)")
+        return 1
+
+    fixtures = [(path, load_fixture(path)) for path in args.fixtures]
+    reference = args.presets[0]
+
+    rows = []
+    for path, audio in fixtures:
+        duration = len(audio) / 16000
+        grids = {}
+        for preset in args.presets:
+            diarization_service.configure(preset)
+            start = time.perf_counter()
+            segments, _ = diarization_service.diarize_with_embeddings(audio, num_speakers=args.speakers)
+            elapsed = time.perf_counter() - start
+            grids[preset] = label_grid(segments, duration)
+            rows.append({
+                'file': os.path.basename(path),
+                'preset': preset,
+                'audio_seconds': duration,
+                'seconds': elapsed,
+                'speakers': len({s['speaker'] for s in segments}),
+                'agreement': agreement(grids[reference], grids[preset])
+            })
+
+    print("=" * 70)
+    print(f"DIARIZATION BENCHMARK: {len(fixtures)} grabación(es), referencia '{reference}', "
+          f"hilos torch {diarization_service.settings.get('torch_threads') or 'por defecto'}")
+    print("=" * 70)
+    for row in rows:
+        print(f"{row['file']:30s} {row['preset']:8s} {row['seconds']:7.1f}s "
+              f"(RTF {row['seconds'] / row['audio_seconds']:.3f}) hablantes {row['speakers']} "
+              f"coincidencia {row['agreement'] * 100:5.1f}%")
+    print("-" * 70)
+    base_seconds = sum(r['seconds'] for r in rows if r['preset'] == reference)
+    for preset in args.presets:
+        selected = [r for r in rows if r['preset'] == preset]
+        seconds = sum(r['seconds'] for r in selected)
+        audio_seconds = sum(r['audio_seconds'] for r in selected) or 1.0
+        print(f"{preset:8s} total {seconds:.1f}s (RTF {seconds / audio_seconds:.3f}, "
+              f"{base_seconds / seconds if seconds else 0.0:.2f}x frente a '{reference}'), "
+              f"coincidencia media {np.mean([r['agreement'] for r in selected]) * 100:.1f}%")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+Benchmark offline de la transcripción en directo (live_service.py).
+
+Reproduce grabaciones como si llegaran del micrófono, en trozos PCM de --chunk-ms,
+y mide la latencia de cada envío, el retraso con que cada segmento pasa a
+definitivo y el rendimiento (segundos de audio por segundo de reloj).
+
+Uso:
+    python benchmark_live.py grabacion1.wav [grabacion2.mp3 ...] [--model small] [--chunk-ms 100] [--realtime]
+"""
+import sys
+import time
+import argparse
+import numpy as np
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def run_fixture(path, whisper_service, chunk_ms, realtime):
+    """Envía un archivo a una LiveSession y devuelve sus métricas"""
+    from live_service import LiveSession, SAMPLE_RATE
+
+    audio = whisper_service.load_audio(path)
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype('<i2').tobytes()
+    chunk_bytes = int(SAMPLE_RATE * chunk_ms / 1000) * 2
+
+    session = LiveSession(lambda window: whisper_service.transcribe_batch([window], include_timestamps=True)[0])
+    feed_ms = []
+    audio_lag = []  # Audio recibido tras el fin del segmento cuando se confirma (s)
+    wall_lag = []   # En --realtime: reloj transcurrido tras el fin del segmento (s)
+
+    start = time.perf_counter()
+    for offset in range(0, len(pcm), chunk_bytes):
+        if realtime:
+            # Esperar a que el trozo "exista" en tiempo real
+            due = start + offset / 2 / SAMPLE_RATE
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+        t0 = time.perf_counter()
+        result = session.feed(pcm[offset:offset + chunk_bytes])
+        now = time.perf_counter()
+        feed_ms.append((now - t0) * 1000)
+        for segment in result['final']:
+            audio_lag.append(session.received_seconds - segment['end'])
+            if realtime:
+                wall_lag.append((now - start) - segment['end'])
+
+    t0 = time.perf_counter()
+    session.finish()
+    feed_ms.append((time.perf_counter() - t0) * 1000)
+    elapsed = time.perf_counter() - start
+
+    duration = len(audio) / SAMPLE_RATE
+    return {
+        'file': path,
+        'audio_seconds': duration,
+        'wall_seconds': elapsed,
+        'throughput': duration / elapsed if elapsed else 0.0,
+        'segments': len(session.final_segments),
+        'decodes': session.stats['decodes'],
+        'feed_ms': feed_ms,
+        'audio_lag': audio_lag,
+        'wall_lag': wall_lag
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline de la transcripción en directo")
+    parser.add_argument('fixtures', nargs='+', help="Grabaciones de prueba (cualquier formato que lea ffmpeg)")
+    parser.add_argument('--model', default='small', help="Modelo de Whisper")
+    parser.add_argument('--language', default='es')
+    parser.add_argument('--chunk-ms', type=int, default=100, help="Tamaño de cada envío en ms")
+    parser.add_argument('--realtime', action='store_true', help="Enviar al ritmo real de la grabación")
+    args = parser.parse_args()
+
+    from whisper_service import WhisperService
+    whisper_service = WhisperService(model_name=args.model)
+    whisper_service.set_language(args.language)
+    whisper_service.load_model()
+
+    results = [run_fixture(path, whisper_service, args.chunk_ms, args.realtime) for path in args.fixtures]
+
+    print("=" * 70)
+    print(f"LIVE BENCHMARK: modelo {args.model}, trozos de {args.chunk_ms} ms{' (tiempo real)' if args.realtime else ''}")
+    print("=" * 70)
+    for r in results:
+        print(f"{r['file']}")
+        print(f"  audio {r['audio_seconds']:.1f}s en {r['wall_seconds']:.1f}s -> {r['throughput']:.2f}x tiempo real")
+        print(f"  segmentos {r['segments']}, decodificaciones {r['decodes']}")
+        print(f"  latencia por envío: p50 {percentile(r['feed_ms'], 50):.1f} ms, "
+              f"p95 {percentile(r['feed_ms'], 95):.1f} ms, máx {max(r['feed_ms']):.1f} ms")
+        if r['audio_lag']:
+            print(f"  retraso hasta definitivo (audio): p50 {percentile(r['audio_lag'], 50):.2f}s, "
+                  f"máx {max(r['audio_lag']):.2f}s")
+        if r['wall_lag']:
+            print(f"  retraso hasta definitivo (reloj): p50 {percentile(r['wall_lag'], 50):.2f}s, "
+                  f"máx {max(r['wall_lag']):.2f}s")
+
+    total_audio = sum(r['audio_seconds'] for r in results)
+    total_wall = sum(r['wall_seconds'] for r in results)
+    all_feeds = [ms for r in results for ms in r['feed_ms']]
+    print("-" * 70)
+    print(f"Total: {total_audio:.1f}s de audio en {total_wall:.1f}s ({total_audio / total_wall:.2f}x), "
+          f"latencia p95 {percentile(all_feeds, 95):.1f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""
+Benchmark del coste de los timestamps por palabra en WhisperService.transcribe.
+
+Transcribe cada grabación con tiempos por segmento (lo que necesita la salida
+con timestamps) y con tiempos por palabra (lo que necesita la diarización), y
+compara el tiempo de reloj y las marcas de inicio de los segmentos resultantes.
+
+Uso:
+    python benchmark_timestamps.py grabacion1.wav [grabacion2.mp3 ...] [--model small] [--repeat 2]
+"""
+import sys
+import time
+import argparse
+
+
+def timed_transcribe(whisper_service, audio, word_timestamps, repeat):
+    """Mejor tiempo de 'repeat' ejecuciones (el primero incluye cachés del modelo)"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = whisper_service.transcribe(audio, include_timestamps=True, word_timestamps=word_timestamps)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run_fixture(path, whisper_service, repeat):
+    audio = whisper_service.load_audio(path)
+    segment_seconds, segment_result = timed_transcribe(whisper_service, audio, False, repeat)
+    word_seconds, word_result = timed_transcribe(whisper_service, audio, True, repeat)
+
+    # Con palabras, whisper reajusta los límites de los segmentos: cuánto cambian las marcas [HH:MM:SS]
+    starts = [int(s['start']) for s in segment_result['segments']]
+    word_starts = [int(s['start']) for s in word_result['segments']]
+    return {
+        'file': path,
+        'audio_seconds': len(audio) / 16000,
+        'segment_seconds': segment_seconds,
+        'word_seconds': word_seconds,
+        'overhead': word_seconds / segment_seconds - 1 if segment_seconds else 0.0,
+        'segments': (len(starts), len(word_starts)),
+        'same_marks': starts == word_starts
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coste de word_timestamps en la transcripción")
+    parser.add_argument('fixtures', nargs='+', help="Grabaciones de prueba (cualquier formato que lea ffmpeg)")
+    parser.add_argument('--model', default='small', help="Modelo de Whisper")
+    parser.add_argument('--language', default='es')
+    parser.add_argument('--repeat', type=int, default=2, help="Ejecuciones por variante (se toma la mejor)")
+    args = parser.parse_args()
+
+    from whisper_service import WhisperService
+    whisper_service = WhisperService(model_name=args.model)
+    whisper_service.set_language(args.language)
+    whisper_service.load_model()
+
+    results = [run_fixture(path, whisper_service, max(1, args.repeat)) for path in args.fixtures]
+
+    print("=" * 70)
+    print(f"WORD TIMESTAMPS BENCHMARK: modelo {args.model}, mejor de {args.repeat}")
+    print("=" * 70)
+    for r in results:
+        print(f"{r['file']} ({r['audio_seconds']:.1f}s de audio)")
+        print(f"  por segmento {r['segment_seconds']:.2f}s ({r['audio_seconds'] / r['segment_seconds']:.2f}x), "
+              f"por palabra {r['word_seconds']:.2f}s ({r['audio_seconds'] / r['word_seconds']:.2f}x) "
+              f"-> sobrecoste {r['overhead'] * 100:+.1f}%")
+        print(f"  segmentos {r['segments'][0]} / {r['segments'][1]}, "
+              f"marcas [HH:MM:SS] {'idénticas' if r['same_marks'] else 'distintas'}")
+
+    total_segment = sum(r['segment_seconds'] for r in results)
+    total_word = sum(r['word_seconds'] for r in results)
+    print("-" * 70)
+    print(f"Total: por segmento {total_segment:.1f}s, por palabra {total_word:.1f}s "
+          f"(sobrecoste {(total_word / total_segment - 1) * 100 if total_segment else 0.0:+.1f}%)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,270 @@
+"""
+Transcripción masiva de un árbol de directorios, sin pasar por la API HTTP.
+
+Recorre el directorio de entrada, reparte los audios entre un pool de procesos
+(cada uno con su propio modelo) y escribe las salidas en el directorio de salida
+con la misma estructura de carpetas. Los archivos ya transcritos con los mismos
+parámetros (por SHA-256 del contenido, en el manifiesto) se saltan, así que una
+ejecución interrumpida se puede relanzar sin repetir trabajo. Las copias idénticas
+se transcriben una vez y reciben una copia de las salidas en su propia carpeta.
+Las salidas conservan la extensión del audio en el nombre (a.mp3 -> a_mp3_Transcrito.txt),
+así 'a.mp3' y 'a.wav' en la misma carpeta no se pisan.
+
+Uso:
+    python bulk_transcribe.py archivo/ salida/ [--workers 2] [--model small] [--language es]
+                              [--timestamps] [--diarization] [--speakers N] [--force]
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import multiprocessing
+
+MANIFEST_NAME = '.bulk_manifest.json'
+
+# Servicios del proceso del pool (se cargan una vez por proceso en _init_worker)
+_worker = {}
+
+
+def find_audio_files(root):
+    """Rutas relativas de los audios de 'root' (recursivo, en orden estable)"""
+    from audio_processor import AUDIO_EXTENSIONS
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if os.path.splitext(name)[1].lower() in AUDIO_EXTENSIONS:
+                found.append(os.path.relpath(os.path.join(dirpath, name), root))
+    return found
+
+
+def output_stem(relpath):
+    """Nombre base de las salidas de un audio, con su extensión: 'grabaciones/a.mp3' -> 'a_mp3'"""
+    stem, ext = os.path.splitext(os.path.basename(relpath))
+    return f"{stem}_{ext[1:]}" if ext else stem
+
+
+def copy_outputs(output_root, entry, relpath):
+    """
+    Copia las salidas de un archivo ya transcrito a la carpeta espejo de 'relpath'
+    (contenido idéntico), renombradas con su propio nombre base
+
+    Returns:
+        list: Rutas de las copias, relativas a output_root
+    """
+    from output_writer import atomic_copy
+    output_dir = os.path.join(output_root, os.path.dirname(relpath))
+    os.makedirs(output_dir, exist_ok=True)
+    copies = []
+    for output in entry['output_files']:
+        name = os.path.basename(output)
+        target = os.path.join(output_dir, output_stem(relpath) + name[name.rindex('_Transcrito'):])
+        atomic_copy(os.path.join(output_root, output), target)
+        copies.append(os.path.relpath(target, output_root))
+    return copies
+
+
+def manifest_key(digest, options):
+    from dedup import job_key
+    key = job_key(digest, options['model'], options['timestamps'], options['diarization'],
+                  options['speakers'], options['language'])
+    return '|'.join(str(part) for part in key)
+
+
+def load_manifest(path):
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logging.getLogger(__name__).error(f"Manifiesto ilegible ({e}), se empieza de cero")
+    return {}
+
+
+def _init_worker(options):
+    """Inicializa un proceso del pool: carga el modelo una sola vez"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - [bulk %(process)d] %(message)s',
+        force=True
+    )
+    from whisper_service import whisper_service
+    from audio_processor import AudioProcessor
+
+    search_index = None
+    if options['search_index']:
+        from search_index import SearchIndex
+        search_index = SearchIndex(options['search_index'])
+
+    whisper_service.model_name = options['model']
+    whisper_service.set_language(options['language'])
+    whisper_service.load_model()
+
+    _worker['processor'] = AudioProcessor(
+        whisper_service,
+        max_duration_minutes=options['max_minutes'],
+        search_index=search_index
+    )
+    _worker['options'] = options
+
+
+def _transcribe_one(task):
+    """Transcribe un archivo en el proceso del pool y devuelve su resultado (sin lanzar)"""
+    relpath, source, output_dir = task
+    options = _worker['options']
+    started = time.perf_counter()
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+        # El nombre base de las salidas sale de original_filename: se le da el que conserva la extensión
+        result = _worker['processor'].process_audio(
+            source, output_dir,
+            original_filename=output_stem(relpath) + os.path.splitext(relpath)[1],
+            include_timestamps=options['timestamps'],
+            perform_diarization=options['diarization'],
+            num_speakers=options['speakers']
+        )
+        return {
+            'file': relpath,
+            'success': True,
+            'duration': result.get('duration') or 0.0,
+            'seconds': time.perf_counter() - started,
+            'output_files': result['output_files']
+        }
+    except Exception as e:
+        logging.getLogger(__name__).error(f"BULK ERROR {relpath}: {e}", exc_info=True)
+        return {'file': relpath, 'success': False, 'error': str(e), 'seconds': time.perf_counter() - started}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcripción masiva de un directorio de audios")
+    parser.add_argument('input_dir', help="Directorio con los audios (se recorre recursivamente)")
+    parser.add_argument('output_dir', help="Directorio de salida (misma estructura de carpetas)")
+    parser.add_argument('--workers', type=int, default=1, help="Procesos de inferencia (cada uno carga su modelo)")
+    parser.add_argument('--model', default='small', help="Modelo de Whisper")
+    parser.add_argument('--language', default='es', help="Idioma ('auto' para detectarlo)")
+    parser.add_argument('--timestamps', action='store_true', help="Incluir marcas de tiempo")
+    parser.add_argument('--diarization', action='store_true', help="Identificar hablantes (requiere token de Hugging Face)")
+    parser.add_argument('--speakers', type=int, default=None, help="Número de hablantes, si se conoce")
+    parser.add_argument('--max-minutes', type=int, default=20, help="Duración máxima de cada parte")
+    parser.add_argument('--search-index', default=None, help="Índice de búsqueda a actualizar (opcional)")
+    parser.add_argument('--manifest', default=None, help=f"Manifiesto de archivos hechos (por defecto <salida>/{MANIFEST_NAME})")
+    parser.add_argument('--force', action='store_true', help="Transcribir también los archivos que ya están en el manifiesto")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger = logging.getLogger(__name__)
+
+    from dedup import content_hash
+    from output_writer import atomic_write
+
+    options = {
+        'model': args.model,
+        'language': args.language,
+        'timestamps': args.timestamps,
+        'diarization': args.diarization,
+        'speakers': args.speakers,
+        'max_minutes': args.max_minutes,
+        'search_index': os.path.abspath(args.search_index) if args.search_index else None
+    }
+    input_dir = os.path.abspath(args.input_dir)
+    output_root = os.path.abspath(args.output_dir)
+    os.makedirs(output_root, exist_ok=True)
+    manifest_path = args.manifest or os.path.join(output_root, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+
+    def outputs_exist(paths):
+        return all(os.path.exists(os.path.join(output_root, f)) for f in paths)
+
+    def save_manifest():
+        atomic_write(manifest_path, json.dumps(manifest, indent=2, ensure_ascii=False))
+
+    search_index = None
+    if options['search_index']:
+        from search_index import SearchIndex
+        search_index = SearchIndex(options['search_index'])
+
+    def publish_copies(key, relpaths):
+        """Salidas de las copias idénticas, registradas en el manifiesto con sus propias rutas"""
+        entry = manifest[key]
+        for relpath in relpaths:
+            try:
+                entry.setdefault('copies', {})[relpath] = copy_outputs(output_root, entry, relpath)
+            except OSError as e:
+                logger.error(f"COPY ERROR {relpath}: {e}")
+                continue
+            logger.info(f"COPY: {relpath} es idéntico a {entry['source']}, se copian sus salidas")
+            if search_index:
+                search_index.sync_directory(os.path.join(output_root, os.path.dirname(relpath)), options['max_minutes'] * 60)
+        save_manifest()
+
+    # Saltar lo ya transcrito con los mismos parámetros (y cuyas salidas siguen ahí)
+    pending = []
+    keys = {}        # clave -> archivo pendiente
+    duplicates = {}  # clave -> copias idénticas de un archivo pendiente (reciben sus salidas al terminar)
+    skipped = 0
+    files = find_audio_files(input_dir)
+    for relpath in files:
+        source = os.path.join(input_dir, relpath)
+        key = manifest_key(content_hash(source), options)
+        done = manifest.get(key)
+        if not args.force and done and outputs_exist(done['output_files']):
+            skipped += 1
+            copies = done.get('copies', {}).get(relpath)
+            if done['source'] != relpath and (copies is None or not outputs_exist(copies)):
+                publish_copies(key, [relpath])
+            continue
+        if key in keys:
+            # Copia idéntica dentro del mismo árbol: se transcribe una vez
+            duplicates.setdefault(key, []).append(relpath)
+            skipped += 1
+            continue
+        keys[key] = relpath
+        pending.append((relpath, source, os.path.join(output_root, os.path.dirname(relpath))))
+
+    logger.info(f"BULK: {len(files)} audios, {skipped} ya transcritos o idénticos a otro, {len(pending)} pendientes, "
+                f"{args.workers} proceso(s)")
+    if not pending:
+        return 0
+
+    results = []
+    start = time.perf_counter()
+    # 'spawn' igual que el pool de producción: sin heredar estado de torch entre procesos
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(processes=max(1, args.workers), initializer=_init_worker, initargs=(options,)) as pool:
+        key_of = {relpath: key for key, relpath in keys.items()}
+        for result in pool.imap_unordered(_transcribe_one, pending):
+            results.append(result)
+            if result['success']:
+                key = key_of[result['file']]
+                manifest[key] = {
+                    'source': result['file'],
+                    'output_files': [os.path.relpath(f, output_root) for f in result['output_files']],
+                    'duration': result['duration'],
+                    'seconds': round(result['seconds'], 2)
+                }
+                # Guardar tras cada archivo: una interrupción no pierde lo ya hecho
+                save_manifest()
+                if key in duplicates:
+                    publish_copies(key, duplicates[key])
+            elapsed = time.perf_counter() - start
+            logger.info(f"[{len(results)}/{len(pending)}] {result['file']}: "
+                        f"{'ok' if result['success'] else 'ERROR ' + result['error']} ({result['seconds']:.1f}s, "
+                        f"{sum(r.get('duration', 0.0) for r in results) / elapsed:.2f}x tiempo real acumulado)")
+    elapsed = time.perf_counter() - start
+
+    ok = [r for r in results if r['success']]
+    failed = [r for r in results if not r['success']]
+    total_audio = sum(r['duration'] for r in ok)
+    print("=" * 70)
+    print(f"BULK: {len(ok)} transcritos, {len(failed)} con error, {skipped} saltados en {elapsed:.1f}s")
+    print(f"  audio {total_audio / 3600:.2f} h -> {total_audio / elapsed if elapsed else 0.0:.2f}x tiempo real, "
+          f"{len(ok) / elapsed * 60 if elapsed else 0.0:.1f} archivos/min con {args.workers} proceso(s)")
+    for r in failed:
+        print(f"  ERROR {r['file']}: {r['error']}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
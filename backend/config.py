@@ -40,6 +40,10 @@ class ConfigManager:
         except Exception as e:
             logger.error(f"Error guardando config: {e}")
 
+    def get(self, key, default=None):
+        """Devuelve un valor de configuración genérico (o el valor por defecto)"""
+        return self._config.get(key, default)
+
     def get_hf_token(self):
         return self._config.get('hf_token')
 
@@ -0,0 +1,55 @@
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def content_hash(path):
+    """SHA-256 del contenido de un archivo (leído por bloques)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def job_key(digest, model, timestamps, diarization, num_speakers, language):
+    """Clave de deduplicación: mismo audio con los mismos parámetros da la misma salida"""
+    return (digest, model, bool(timestamps), bool(diarization), num_speakers, language)
+
+
+class InflightRegistry:
+    """
+    Trabajos en curso (en cola o procesándose) por clave de deduplicación.
+    Una subida idéntica a un trabajo en curso se engancha a él en vez de encolarse.
+    'lock' se expone para que /upload clasifique, admita y cree las tareas de forma atómica.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self._primary = {}  # clave -> task_id del trabajo que hace la inferencia
+        self._keys = {}     # task_id -> clave
+
+    def find(self, key):
+        """task_id del trabajo en curso con esa clave, o None"""
+        with self.lock:
+            return self._primary.get(key)
+
+    def register(self, key, task_id):
+        with self.lock:
+            self._primary[key] = task_id
+            self._keys[task_id] = key
+
+    def release(self, task_id):
+        """El trabajo terminó: las siguientes subidas idénticas vuelven a procesarse"""
+        with self.lock:
+            key = self._keys.pop(task_id, None)
+            if key is not None and self._primary.get(key) == task_id:
+                del self._primary[key]
+
+    def __len__(self):
+        with self.lock:
+            return len(self._primary)
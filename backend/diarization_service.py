@@ -1,18 +1,34 @@
 
 import logging
-import torch
-import torchaudio
 import os
 import subprocess
-from pyannote.audio import Pipeline
 from config import config_manager
+from speaker_store import speaker_store
 
 logger = logging.getLogger(__name__)
 
+# Ajustes del pipeline por preset (None = valor por defecto de pyannote).
+# segmentation_step es el avance de la ventana deslizante en fracción de su duración (10 s):
+# pyannote usa 0.1 (90 % de solape); 0.25 hace ~2.5 veces menos inferencias de segmentación.
+DIARIZATION_PRESETS = {
+    'default': {
+        'segmentation_batch_size': None,
+        'embedding_batch_size': None,
+        'segmentation_step': None
+    },
+    'fast': {
+        'segmentation_batch_size': 32,
+        'embedding_batch_size': 32,
+        'segmentation_step': 0.25
+    }
+}
+
 class DiarizationService:
     def __init__(self):
         self.pipeline = None
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self.device = None  # Se decide al cargar el pipeline (torch se importa de forma diferida)
+        self.settings = {}
+        self._defaults = None  # Valores de pyannote al cargar (para volver al preset 'default')
 
     def load_pipeline(self):
         """Carga el pipeline de diarización si no está cargado"""
@@ -24,11 +40,17 @@ class DiarizationService:
 
         if self.pipeline is None:
             try:
+                # Importación diferida: torch y pyannote tardan varios segundos en cargar
+                import torch
+                from pyannote.audio import Pipeline
+                
+                self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
                 logger.info(f"Cargando Pyannote Pipeline en {self.device}...")
                 self.pipeline = Pipeline.from_pretrained(
                     "pyannote/speaker-diarization-3.1", 
                     token=token
                 ).to(self.device)
+                self.configure()
                 logger.info("✅ Pipeline de diarización cargado correctamente")
             except Exception as e:
                 logger.error(f"Error cargando Pyannote: {e}")
@@ -36,6 +58,63 @@ class DiarizationService:
         
         return True
 
+    def resolve_settings(self, preset=None):
+        """
+        Ajustes efectivos: los del preset ('diarization_preset' en config.json)
+        con los valores sueltos de config.json por encima.
+        """
+        preset = preset or config_manager.get('diarization_preset', 'default')
+        if preset not in DIARIZATION_PRESETS:
+            logger.warning(f"Preset de diarización desconocido: {preset}. Se usa 'default'")
+            preset = 'default'
+        settings = dict(DIARIZATION_PRESETS[preset], preset=preset)
+        for key in ('segmentation_batch_size', 'embedding_batch_size', 'segmentation_step'):
+            value = config_manager.get(f'diarization_{key}')
+            if value is not None:
+                settings[key] = value
+        settings['torch_threads'] = int(config_manager.get('torch_threads', 0))
+        return settings
+
+    def configure(self, preset=None):
+        """
+        Aplica tamaños de lote, paso de la ventana deslizante e hilos de torch
+        al pipeline ya cargado (se puede llamar de nuevo para cambiar de preset).
+        """
+        import torch
+
+        settings = self.resolve_settings(preset)
+        if settings['torch_threads'] > 0:
+            torch.set_num_threads(settings['torch_threads'])
+
+        segmentation = getattr(self.pipeline, '_segmentation', None)
+        if self._defaults is None:
+            self._defaults = {
+                'segmentation_batch_size': getattr(self.pipeline, 'segmentation_batch_size', None),
+                'embedding_batch_size': getattr(self.pipeline, 'embedding_batch_size', None),
+                'step': segmentation.step if segmentation is not None else None
+            }
+
+        for key in ('segmentation_batch_size', 'embedding_batch_size'):
+            value = settings[key] or self._defaults[key]
+            if value:
+                setattr(self.pipeline, key, int(value))
+
+        if segmentation is not None:
+            if settings['segmentation_step']:
+                segmentation.step = float(settings['segmentation_step']) * segmentation.duration
+            else:
+                segmentation.step = self._defaults['step']
+
+        self.settings = settings
+        logger.info(
+            f"Diarización: preset {settings['preset']}, "
+            f"lotes segmentación/embeddings {getattr(self.pipeline, 'segmentation_batch_size', '?')}/"
+            f"{getattr(self.pipeline, 'embedding_batch_size', '?')}, "
+            f"paso {segmentation.step if segmentation is not None else '?'}s, "
+            f"hilos torch {torch.get_num_threads()}"
+        )
+        return settings
+
     def diarize(self, audio_path, num_speakers=None):
         """
         Ejecuta la diarización en el archivo de audio
@@ -44,27 +123,50 @@ class DiarizationService:
             audio_path: Ruta al archivo de audio
             num_speakers: (Opcional) Número exacto de hablantes si se conoce
         """
+        segments, _ = self.diarize_with_embeddings(audio_path, num_speakers=num_speakers)
+        return segments
+
+    def diarize_with_embeddings(self, audio_path, num_speakers=None):
+        """
+        Ejecuta la diarización y devuelve también el embedding de cada hablante.
+        Las etiquetas que coinciden con un hablante inscrito se sustituyen por su nombre.
+        
+        Args:
+            audio_path: Ruta al archivo de audio, o array float32 mono a 16 kHz ya decodificado
+            num_speakers: (Opcional) Número exacto de hablantes si se conoce
+            
+        Returns:
+            tuple: (lista de segmentos, dict {etiqueta: embedding})
+        """
         if not self.load_pipeline():
             raise Exception("No se pudo cargar el modelo de diarización (¿Token inválido?)")
 
-        logger.info(f"🎤 Ejecutando diarización en: {audio_path} (Hablantes esperados: {num_speakers if num_speakers else 'Auto'})")
+        in_memory = not isinstance(audio_path, str)
+        source = f"{len(audio_path) / 16000:.1f}s de audio en memoria" if in_memory else audio_path
+        logger.info(f"🎤 Ejecutando diarización en: {source} (Hablantes esperados: {num_speakers if num_speakers else 'Auto'})")
         temp_wav = None
         try:
-            # FIX: Usar FFmpeg para convertir a WAV estándar (16kHz mono)
-            # Esto evita problemas de codecs corruptos o no soportados por torchaudio/torchcodec
-            temp_wav = f"{audio_path}_temp_16k.wav"
-            logger.info(f"Convirtiendo a WAV temporal: {temp_wav}")
-            
-            # Ejecutar ffmpeg (asumiendo que está en PATH, igual que Whisper)
-            subprocess.run([
-                "ffmpeg", "-i", audio_path, 
-                "-ar", "16000", "-ac", "1", "-c:a", "pcm_s16le", 
-                temp_wav, "-y"
-            ], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            
-            # Cargar el WAV limpio
-            waveform, sample_rate = torchaudio.load(temp_wav)
-            
+            if in_memory:
+                # Audio ya decodificado (parte del memmap): sin ffmpeg ni WAV temporal
+                import torch
+                waveform, sample_rate = torch.from_numpy(audio_path).unsqueeze(0), 16000
+            else:
+                # FIX: Usar FFmpeg para convertir a WAV estándar (16kHz mono)
+                # Esto evita problemas de codecs corruptos o no soportados por torchaudio/torchcodec
+                temp_wav = f"{audio_path}_temp_16k.wav"
+                logger.info(f"Convirtiendo a WAV temporal: {temp_wav}")
+
+                # Ejecutar ffmpeg (asumiendo que está en PATH, igual que Whisper)
+                subprocess.run([
+                    "ffmpeg", "-i", audio_path,
+                    "-ar", "16000", "-ac", "1", "-c:a", "pcm_s16le",
+                    temp_wav, "-y"
+                ], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+                # Cargar el WAV limpio
+                import torchaudio
+                waveform, sample_rate = torchaudio.load(temp_wav)
+
             # Pasar diccionario al pipeline
             # Si se especificó número de hablantes, lo pasamos
             run_opts = {"waveform": waveform, "sample_rate": sample_rate}
@@ -74,8 +176,20 @@ class DiarizationService:
                     kwargs["num_speakers"] = int(num_speakers)
                 except:
                     logger.warning(f"Número de hablantes inválido: {num_speakers}")
+            
+            # Sin número de hablantes: acotar el clustering con los hablantes conocidos
+            # (los inscritos más un margen para invitados ocasionales)
+            speaker_store.refresh()
+            if "num_speakers" not in kwargs and len(speaker_store) > 0:
+                extra = int(config_manager.get('max_unknown_speakers', 2))
+                kwargs["max_speakers"] = len(speaker_store) + extra
+                logger.info(f"Clustering acotado por hablantes conocidos: max_speakers={kwargs['max_speakers']}")
 
-            diarization_result = self.pipeline(run_opts, **kwargs)
+            try:
+                diarization_result = self.pipeline(run_opts, return_embeddings=True, **kwargs)
+            except TypeError:
+                # Versiones de pyannote sin 'return_embeddings'
+                diarization_result = self.pipeline(run_opts, **kwargs)
             
             # LOG DEBUG: Inspeccionar el tipo de resultado
             logger.info(f"Tipo de resultado de diarización: {type(diarization_result)}")
@@ -95,6 +209,21 @@ class DiarizationService:
 
             logger.info(f"Objeto a iterar (Annotation): {type(diarization)}")
             
+            # Embeddings por hablante (filas en el mismo orden que labels())
+            embeddings = None
+            if hasattr(diarization_result, 'speaker_embeddings'):
+                embeddings = diarization_result.speaker_embeddings
+            elif isinstance(diarization_result, tuple) and len(diarization_result) > 1:
+                embeddings = diarization_result[1]
+            
+            label_embeddings = {}
+            if embeddings is not None and hasattr(diarization, 'labels'):
+                for label, vector in zip(diarization.labels(), embeddings):
+                    label_embeddings[label] = vector
+            
+            # Traducir etiquetas anónimas a hablantes inscritos
+            label_names = speaker_store.map_labels(label_embeddings)
+            
             # Convertir a lista de segmentos simple
             segments = []
             if hasattr(diarization, 'itertracks'):
@@ -102,14 +231,17 @@ class DiarizationService:
                     segments.append({
                         "start": turn.start,
                         "end": turn.end,
-                        "speaker": speaker
+                        "speaker": label_names.get(speaker, speaker)
                     })
             else:
                  logger.error(f"El objeto resultante no tiene itertracks. Atributos: {dir(diarization_result)}")
                  raise Exception(f"Formato de diarización inesperado: {type(diarization_result)}")
             
             logger.info(f"Diarización completada: {len(segments)} segmentos de hablantes detectados")
-            return segments
+            
+            # Devolver los embeddings con la etiqueta final (para inscribir hablantes después)
+            named_embeddings = {label_names.get(label, label): vector for label, vector in label_embeddings.items()}
+            return segments, named_embeddings
             
         except Exception as e:
             logger.error(f"Error durante diarización: {e}")
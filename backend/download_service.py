@@ -0,0 +1,192 @@
+import os
+import zlib
+import zipfile
+import logging
+from urllib.parse import quote
+
+# Brotli es opcional: si no está instalado solo se ofrece gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Tamaño de bloque para leer archivos del disco (64 KB)
+CHUNK_SIZE = 64 * 1024
+
+# Extensiones que merece la pena comprimir (texto)
+COMPRESSIBLE_EXTENSIONS = {'.txt', '.json', '.srt', '.vtt'}
+
+
+class _ZipStreamBuffer:
+    """
+    Destino de escritura no posicionable para zipfile.
+    zipfile detecta que no tiene seek() y usa descriptores de datos,
+    así el ZIP se genera por trozos sin construirlo entero en memoria.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        """Devuelve (y vacía) lo escrito desde la última llamada"""
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_zip_stream(files):
+    """
+    Genera un archivo ZIP por trozos a partir de una lista de archivos
+
+    Args:
+        files: Lista de tuplas (ruta_en_disco, nombre_dentro_del_zip)
+
+    Yields:
+        bytes: Trozos consecutivos del ZIP
+    """
+    buffer = _ZipStreamBuffer()
+
+    with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for path, arcname in files:
+            try:
+                zinfo = zipfile.ZipInfo.from_file(path, arcname)
+                zinfo.compress_type = zipfile.ZIP_DEFLATED
+                force_zip64 = zinfo.file_size > zipfile.ZIP64_LIMIT
+
+                with open(path, 'rb') as src, zf.open(zinfo, mode='w', force_zip64=force_zip64) as dest:
+                    while True:
+                        chunk = src.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        dest.write(chunk)
+                        data = buffer.pop()
+                        if data:
+                            yield data
+            except OSError as e:
+                logger.error(f"ZIP: No se pudo añadir {path}: {e}")
+                continue
+
+            data = buffer.pop()
+            if data:
+                yield data
+
+    # Directorio central del ZIP (se escribe al cerrar)
+    data = buffer.pop()
+    if data:
+        yield data
+
+
+def unique_arcnames(paths):
+    """
+    Asigna nombres únicos dentro del ZIP (dos tareas del mismo lote
+    pueden producir archivos con el mismo nombre)
+
+    Returns:
+        list: Lista de tuplas (ruta, nombre_en_zip)
+    """
+    used = set()
+    entries = []
+    for path in paths:
+        name = os.path.basename(path)
+        stem, ext = os.path.splitext(name)
+        candidate = name
+        counter = 2
+        while candidate in used:
+            candidate = f"{stem}_{counter}{ext}"
+            counter += 1
+        used.add(candidate)
+        entries.append((path, candidate))
+    return entries
+
+
+def negotiate_encoding(accept_encoding):
+    """
+    Elige la codificación de contenido a partir de la cabecera Accept-Encoding
+
+    Returns:
+        str o None: 'br', 'gzip' o None si no se debe comprimir
+    """
+    if not accept_encoding:
+        return None
+
+    accepted = {}
+    for part in accept_encoding.split(','):
+        pieces = part.strip().split(';')
+        name = pieces[0].strip().lower()
+        quality = 1.0
+        for param in pieces[1:]:
+            param = param.strip()
+            if param.startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if name:
+            accepted[name] = quality
+
+    if brotli is not None and accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', 0) > 0:
+        return 'gzip'
+    return None
+
+
+def is_compressible(filename):
+    """Indica si el archivo es de texto y se beneficia de compresión"""
+    return os.path.splitext(filename)[1].lower() in COMPRESSIBLE_EXTENSIONS
+
+
+def iter_compressed(path, encoding):
+    """
+    Lee un archivo y lo devuelve comprimido por trozos (gzip o brotli)
+
+    Args:
+        path: Ruta al archivo
+        encoding: 'gzip' o 'br'
+    """
+    if encoding == 'br':
+        compressor = brotli.Compressor()
+        compress = compressor.process
+        finish = compressor.finish
+    else:
+        # wbits=31 -> formato gzip con cabecera y CRC
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        compress = compressor.compress
+        finish = compressor.flush
+
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            data = compress(chunk)
+            if data:
+                yield data
+
+    data = finish()
+    if data:
+        yield data
+
+
+def content_disposition(filename):
+    """Cabecera Content-Disposition compatible con nombres no ASCII (RFC 5987)"""
+    try:
+        filename.encode('ascii')
+        return f'attachment; filename="{filename}"'
+    except UnicodeEncodeError:
+        fallback = filename.encode('ascii', 'ignore').decode('ascii') or 'descarga'
+        return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename)}"
@@ -0,0 +1,670 @@
+import os
+import time
+import queue
+import logging
+import threading
+import multiprocessing
+from pathlib import Path
+from contextlib import nullcontext
+from config import config_manager
+from job_profiler import JobProfiler, profile_mode
+
+logger = logging.getLogger(__name__)
+
+# Frecuencia de muestreo de Whisper (muestras por segundo)
+SAMPLE_RATE = 16000
+
+
+def _prepare_model(job, whisper_service):
+    """
+    Cambia de modelo si el trabajo lo requiere y lo carga.
+    El idioma no se toca aquí: viaja en cada llamada (job['language']) para no
+    cambiar el del servicio compartido con la transcripción en directo.
+    """
+    # Cambiar modelo de Whisper si es necesario
+    old_model = whisper_service.model_name
+    if old_model != job['model']:
+        whisper_service.model_name = job['model']
+        whisper_service.model = None  # Forzar recarga del modelo
+        logger.info(f"MODEL CHANGE: {old_model} -> {job['model']}")
+
+    # Cargar modelo de Whisper si no está cargado
+    whisper_service.load_model()
+    logger.info(f"MODEL READY: {whisper_service.model_name}")
+
+    # Y el pipeline de diarización: su carga tampoco debe contar como tiempo del trabajo
+    if job.get('diarization'):
+        from diarization_service import diarization_service
+        diarization_service.load_pipeline()
+
+
+def _report_completed(job, result, report, processing_seconds=None):
+    report(
+        job['task_id'],
+        status='completed',
+        progress=100,
+        result=result,
+        output_files=[os.path.basename(f) for f in result['output_files']],
+        original_file=job['filename'],
+        processing_seconds=processing_seconds,
+        profile_files=[os.path.basename(f) for f in result.get('profile_files', [])]
+    )
+    logger.info(f"TASK COMPLETED: {job['filename']}")
+
+
+def _remove_upload(job):
+    """Limpiar archivo de audio temporal"""
+    try:
+        if os.path.exists(job['audio_path']):
+            os.remove(job['audio_path'])
+    except:
+        pass
+
+
+def is_batchable(job):
+    """
+    Un trabajo puede ir en lote si no necesita diarización y su duración (ffprobe al
+    subirlo) cabe en batch_max_seconds. Sin duración conocida va por el camino normal.
+    """
+    # Un trabajo perfilado va solo: el perfil de un lote no diría nada de ese archivo
+    if not config_manager.get('batch_inference', True) or job['diarization'] or job.get('profile'):
+        return False
+    duration = job.get('duration')
+    return duration is not None and duration <= float(config_manager.get('batch_max_seconds', 30))
+
+
+def collect_batch(job_queue, job):
+    """
+    Etapa de lotes: junto al trabajo recién sacado, toma de la cola los trabajos cortos
+    pendientes que usen el mismo modelo, idioma y formato de salida.
+
+    Returns:
+        list: Trabajos a procesar juntos (al menos 'job')
+    """
+    if not is_batchable(job):
+        return [job]
+
+    key = (job['model'], job.get('language'), job['timestamps'])
+    limit = int(config_manager.get('batch_size', 8)) - 1
+    others = job_queue.take_matching(
+        lambda other: is_batchable(other) and (other['model'], other.get('language'), other['timestamps']) == key,
+        limit
+    )
+    if others:
+        logger.info(f"BATCH: {len(others) + 1} trabajos cortos agrupados ({job['model']}, {job.get('language')})")
+    return [job] + others
+
+
+def run_jobs(jobs, whisper_service, audio_processor, transcription_dir, report, owns=None):
+    """Ejecuta un trabajo suelto o un lote de trabajos cortos ('owns' solo aplica a un trabajo suelto)"""
+    if len(jobs) == 1:
+        execute_job(jobs[0], whisper_service, audio_processor, transcription_dir, report, owns=owns)
+    else:
+        execute_batch(jobs, whisper_service, audio_processor, transcription_dir, report)
+
+
+def execute_job(job, whisper_service, audio_processor, transcription_dir, report, owns=None):
+    """
+    Ejecuta un trabajo de transcripción completo y publica su estado
+
+    Args:
+        job: dict con task_id, audio_path, filename, model, timestamps, diarization, num_speakers, language
+        whisper_service: Servicio de Whisper a usar
+        audio_processor: Procesador de audio a usar
+        transcription_dir: Directorio de salida
+        report: Función report(task_id, **campos) para actualizar la tarea
+        owns: (Opcional) Función sin argumentos: si el trabajo sigue siendo de este worker.
+            Se consulta antes de publicar cada salida, el resultado y de borrar la subida
+            (nodos con concesión: si caducó, otro nodo tiene el trabajo)
+    """
+    task_id = job['task_id']
+    filename = job['filename']
+    audio_path = job['audio_path']
+    try:
+        logger.info(f"JOB START: Iniciando procesamiento real de {filename}")
+        started = time.time()
+        report(task_id, status='processing', progress=10, started_at=started)
+
+        report(task_id, progress=20)
+        _prepare_model(job, whisper_service)
+        # El real-time factor se mide sin la carga de modelos (un arranque en frío lo falsearía)
+        ready = time.time()
+
+        # Procesar audio (dividir y transcribir)
+        report(task_id, progress=30)
+        logger.info(f"PROCESSING START: Timestamps={job['timestamps']}, Diarization={job['diarization']}")
+
+        # Perfil bajo demanda (parámetro 'profile' o config.json) o por muestreo de trabajos
+        mode = profile_mode(job.get('profile'))
+        profiler = JobProfiler(mode) if mode else None
+        with profiler or nullcontext():
+            result = audio_processor.process_audio(
+                audio_path, transcription_dir,
+                original_filename=filename,
+                include_timestamps=job['timestamps'],
+                perform_diarization=job['diarization'],
+                num_speakers=job['num_speakers'],
+                duration=job.get('duration'),
+                on_progress=lambda **fields: report(task_id, **fields),
+                language=job.get('language'),
+                task_id=task_id,
+                can_publish=owns
+            )
+        if profiler:
+            try:
+                result['profile_files'] = profiler.save(transcription_dir, Path(filename).stem, result.get('memory'), task_id=task_id)
+            except Exception as e:
+                logger.error(f"PROFILE ERROR en {filename}: {e}")
+
+        if owns is not None and not owns():
+            logger.warning(f"STALE RESULT: {filename} ya no es de este worker, resultado descartado")
+            return
+
+        # Tiempo real de proceso: alimenta el real-time factor del planificador
+        _report_completed(job, result, report, processing_seconds=time.time() - ready)
+
+    except Exception as e:
+        if owns is not None and not owns():
+            logger.warning(f"STALE RESULT: {filename} ya no es de este worker ({e}), error descartado")
+            return
+        logger.error(f"TASK ERROR in {filename}: {e}", exc_info=True)
+        report(task_id, status='error', error=str(e))
+    finally:
+        # El nuevo titular de una concesión perdida necesita la subida
+        if owns is None or owns():
+            _remove_upload(job)
+
+
+def execute_batch(jobs, whisper_service, audio_processor, transcription_dir, report):
+    """
+    Ejecuta un lote de trabajos cortos compatibles: los que caben en una ventana
+    de 30 s según su duración (ffprobe) se decodifican y transcriben en una sola
+    pasada; los demás van por el camino normal sin decodificarse aquí.
+    """
+    max_seconds = min(float(config_manager.get('batch_max_seconds', 30)), 30.0)
+    short = []
+    candidates = [job for job in jobs if job.get('duration') is not None and job['duration'] <= max_seconds]
+    long_jobs = [job for job in jobs if not any(job is c for c in candidates)]
+    finished = set()
+    started = time.time()
+    try:
+        for job in jobs:
+            report(job['task_id'], status='processing', progress=10, started_at=started)
+
+        _prepare_model(jobs[0], whisper_service)
+        ready = time.time()
+
+        for job in candidates:
+            report(job['task_id'], progress=20)
+            try:
+                audio = whisper_service.load_audio(job['audio_path'])
+            except Exception as e:
+                logger.error(f"TASK ERROR in {job['filename']}: {e}")
+                report(job['task_id'], status='error', error=str(e))
+                finished.add(job['task_id'])
+                continue
+
+            # ffprobe puede quedarse corto: si el audio no cabe en la ventana, no se recorta
+            if len(audio) / SAMPLE_RATE <= max_seconds:
+                short.append((job, audio))
+            else:
+                del audio
+                long_jobs.append(job)
+
+        if short:
+            logger.info(f"BATCH START: {len(short)} audios cortos en una pasada")
+            for job, _ in short:
+                report(job['task_id'], progress=30)
+
+            results = audio_processor.process_short_batch(
+                [(audio, job['filename']) for job, audio in short],
+                transcription_dir,
+                include_timestamps=jobs[0]['timestamps'],
+                language=jobs[0].get('language')
+            )
+            # El tiempo del lote se reparte entre sus trabajos en proporción a su duración
+            elapsed = time.time() - ready
+            total_samples = sum(len(audio) for _, audio in short) or 1
+            for (job, audio), result in zip(short, results):
+                _report_completed(job, result, report, processing_seconds=elapsed * len(audio) / total_samples)
+                finished.add(job['task_id'])
+
+    except Exception as e:
+        logger.error(f"BATCH ERROR: {e}", exc_info=True)
+        for job in jobs:
+            if job['task_id'] not in finished:
+                report(job['task_id'], status='error', error=str(e))
+                finished.add(job['task_id'])
+    finally:
+        for job in jobs:
+            if job['task_id'] in finished:
+                _remove_upload(job)
+
+    # Los que no caben en una ventana siguen el camino normal (dividir y transcribir)
+    for job in long_jobs:
+        if job['task_id'] not in finished:
+            execute_job(job, whisper_service, audio_processor, transcription_dir, report)
+
+
+class LocalWorker:
+    """
+    Consumidor de la cola en un hilo del propio proceso Flask (modo desarrollo).
+    Procesa los trabajos de uno en uno (o en lotes de audios cortos) con los servicios globales.
+    """
+
+    def __init__(self, job_queue, whisper_service, audio_processor, transcription_dir, report, lock):
+        self.job_queue = job_queue
+        self.whisper_service = whisper_service
+        self.audio_processor = audio_processor
+        self.transcription_dir = transcription_dir
+        self.report = report
+        self.lock = lock
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='inference-local', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            job = self.job_queue.get()
+            if job is None:
+                continue
+            jobs = collect_batch(self.job_queue, job)
+            # El lock evita competir con el precalentamiento del modelo
+            with self.lock:
+                run_jobs(jobs, self.whisper_service, self.audio_processor, self.transcription_dir, self.report)
+
+    def status(self):
+        return [{'id': 0, 'mode': 'thread', 'alive': bool(self._thread and self._thread.is_alive())}]
+
+
+def worker_process_main(worker_id, inbox, events, settings):
+    """
+    Bucle principal de un proceso de inferencia (modo producción).
+    Carga sus propios servicios y procesa los trabajos que recibe por 'inbox'.
+
+    Args:
+        worker_id: Número del worker
+        inbox: Cola multiprocessing de lotes de trabajos (listas) para este worker
+        events: Cola multiprocessing compartida para enviar eventos al front end
+        settings: dict con transcription_dir, search_index_db y warmup
+    """
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f'%(asctime)s - %(levelname)s - [worker {worker_id}] %(message)s',
+        force=True
+    )
+
+    from whisper_service import whisper_service
+    from audio_processor import AudioProcessor
+    from search_index import SearchIndex
+
+    audio_processor = AudioProcessor(whisper_service, search_index=SearchIndex(settings['search_index_db']))
+
+    def report(task_id, **fields):
+        events.put(('update', worker_id, task_id, fields))
+
+    if settings.get('warmup'):
+        try:
+            whisper_service.load_model()
+        except Exception as e:
+            logger.error(f"WARMUP ERROR: {e}")
+
+    events.put(('ready', worker_id, os.getpid(), None))
+    logger.info(f"WORKER READY: pid={os.getpid()}")
+
+    while True:
+        jobs = inbox.get()
+        if jobs is None:
+            break
+        run_jobs(jobs, whisper_service, audio_processor, settings['transcription_dir'], report)
+        events.put(('done', worker_id, [job['task_id'] for job in jobs], None))
+
+
+class ProcessWorkerPool:
+    """
+    Pool de procesos de inferencia de larga duración (modo producción).
+    Un hilo despachador por worker le entrega un trabajo solo cuando está libre,
+    así el orden de la cola se respeta y un worker lento no acapara trabajos.
+    """
+
+    def __init__(self, job_queue, num_workers, settings, report):
+        """
+        Args:
+            job_queue: JobQueue de la que se sacan los trabajos
+            num_workers: Número de procesos de inferencia
+            settings: dict pasado a worker_process_main
+            report: Función report(task_id, **campos) del front end
+        """
+        self.job_queue = job_queue
+        self.num_workers = num_workers
+        self.settings = settings
+        self.report = report
+        # 'spawn' en todas las plataformas: igual que Windows y sin heredar hilos/locks de Flask
+        self._ctx = multiprocessing.get_context('spawn')
+        self._events = self._ctx.Queue()
+        self._workers = {}
+
+    def start(self):
+        for worker_id in range(self.num_workers):
+            self._workers[worker_id] = {
+                'process': None,
+                'inbox': None,
+                'idle': threading.Event(),
+                'task_ids': [],
+                'pid': None
+            }
+            self._spawn(worker_id)
+            threading.Thread(target=self._dispatch, args=(worker_id,), name=f'dispatch-{worker_id}', daemon=True).start()
+
+        threading.Thread(target=self._listen, name='worker-events', daemon=True).start()
+        logger.info(f"WORKER POOL: {self.num_workers} proceso(s) de inferencia")
+
+    def _spawn(self, worker_id):
+        worker = self._workers[worker_id]
+        worker['inbox'] = self._ctx.Queue()
+        worker['process'] = self._ctx.Process(
+            target=worker_process_main,
+            args=(worker_id, worker['inbox'], self._events, self.settings),
+            name=f'inference-{worker_id}',
+            daemon=True
+        )
+        worker['process'].start()
+        worker['pid'] = worker['process'].pid
+
+    def _dispatch(self, worker_id):
+        """Entrega trabajos a un worker de uno en uno y vigila que siga vivo"""
+        worker = self._workers[worker_id]
+        while True:
+            job = self.job_queue.get()
+            if job is None:
+                continue
+            jobs = collect_batch(self.job_queue, job)
+
+            worker['idle'].clear()
+            worker['task_ids'] = [j['task_id'] for j in jobs]
+            worker['inbox'].put(jobs)
+
+            # Esperar a que termine; si el proceso muere, marcar error y relanzarlo
+            while not worker['idle'].wait(timeout=2):
+                if not worker['process'].is_alive():
+                    logger.error(f"WORKER {worker_id} CAÍDO (exit={worker['process'].exitcode}) procesando {', '.join(j['filename'] for j in jobs)}")
+                    for j in jobs:
+                        self.report(j['task_id'], status='error', error='El proceso de inferencia terminó inesperadamente')
+                        _remove_upload(j)
+                    self._spawn(worker_id)
+                    break
+
+            worker['task_ids'] = []
+
+    def _listen(self):
+        """Recibe los eventos de todos los workers y los aplica a las tareas"""
+        while True:
+            try:
+                kind, worker_id, key, fields = self._events.get()
+            except (EOFError, OSError):
+                break
+            except queue.Empty:
+                continue
+
+            if kind == 'update':
+                self.report(key, **fields)
+            elif kind == 'done':
+                self._workers[worker_id]['idle'].set()
+            elif kind == 'ready':
+                logger.info(f"WORKER {worker_id} LISTO (pid={key})")
+
+    def status(self):
+        return [
+            {
+                'id': worker_id,
+                'mode': 'process',
+                'pid': worker['pid'],
+                'alive': worker['process'].is_alive(),
+                'task_ids': worker['task_ids']
+            }
+            for worker_id, worker in self._workers.items()
+        ]
+
+    def stop(self, timeout=5):
+        for worker in self._workers.values():
+            worker['inbox'].put(None)
+        deadline = time.time() + timeout
+        for worker in self._workers.values():
+            worker['process'].join(max(0, deadline - time.time()))
+
+
+class SharedStoreDispatcher:
+    """
+    Reparto de trabajos a nodos de inferencia en otros procesos o máquinas
+    (worker_node.py) a través de un SQLiteJobStore compartido.
+    El planificador sigue decidiendo el orden: solo se publica un trabajo cuando
+    hay un nodo libre que lo pueda tomar. Los trabajos de nodos caídos (concesión
+    caducada) vuelven a la cola local con su antigüedad original.
+    """
+
+    def __init__(self, job_queue, store, report, poll_interval=None):
+        """
+        Args:
+            job_queue: JobQueue de la que se sacan los trabajos
+            store: SQLiteJobStore compartido con los nodos
+            report: Función report(task_id, **campos) del front end
+            poll_interval: Segundos entre lecturas del almacén (config 'store_poll_seconds')
+        """
+        self.job_queue = job_queue
+        self.store = store
+        self.report = report
+        self.poll_interval = float(poll_interval or config_manager.get('store_poll_seconds', 0.5))
+        self._stop = threading.Event()
+        self._workers = []
+
+    def start(self):
+        threading.Thread(target=self._run, name='store-dispatch', daemon=True).start()
+        logger.info(f"SHARED STORE: {self.store.db_path} (concesiones de {self.store.lease_seconds:.0f}s)")
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self._poll()
+            except Exception as e:
+                # Un bloqueo largo del volumen compartido no debe parar el despachador
+                logger.error(f"SHARED STORE ERROR: {e}")
+
+    def _poll(self):
+        # Progreso de los nodos
+        for task_id, fields in self.store.take_events():
+            self.report(task_id, **fields)
+
+        # Concesiones caducadas: reintentar o dar por fallido
+        for job, attempts, failed in self.store.reclaim_expired():
+            if failed:
+                logger.error(f"JOB FAILED: {job['filename']} tras {attempts} concesiones perdidas")
+                self.report(job['task_id'], status='error', error='Los nodos de inferencia dejaron de responder procesando este archivo')
+                _remove_upload(job)
+            else:
+                self.report(job['task_id'], status='queued', progress=0, started_at=None)
+                self.job_queue.put(job)
+
+        # Publicar tantos trabajos como nodos libres haya
+        self._workers = self.store.workers()
+        idle = sum(1 for worker in self._workers if worker['task_id'] is None)
+        for _ in range(idle - self.store.pending_count()):
+            job = self.job_queue.get(timeout=0)
+            if job is None:
+                break
+            self.store.put(job)
+
+    def status(self):
+        return [dict(worker, mode='node', alive=True) for worker in self._workers]
+
+    def stop(self, timeout=5):
+        self._stop.set()
+
+
+class LiveInference:
+    """
+    Carril de inferencia en directo en el propio proceso (modo desarrollo).
+    Usa una instancia de Whisper dedicada ('live_model'), distinta de la de los
+    trabajos: una ventana en directo no espera a que termine un archivo largo.
+    El coste es tener el modelo cargado dos veces mientras haya sesiones en directo.
+    """
+
+    def __init__(self, whisper_service):
+        """
+        Args:
+            whisper_service: WhisperService dedicado a las ventanas en directo
+        """
+        self.whisper_service = whisper_service
+        # El modelo de Whisper no admite decodificaciones simultáneas (entre sesiones en directo)
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Carga el modelo en segundo plano (al abrir la primera sesión)"""
+        threading.Thread(target=self._load, name='live-warmup', daemon=True).start()
+
+    def _load(self):
+        try:
+            with self._lock:
+                self.whisper_service.load_model()
+        except Exception as e:
+            logger.error(f"LIVE WARMUP ERROR: {e}")
+
+    def transcribe(self, audio, language=None):
+        """Decodifica una ventana (float32 16 kHz, <= 30 s) -> dict con 'segments'"""
+        with self._lock:
+            self.whisper_service.load_model()
+            return self.whisper_service.transcribe_batch([audio], include_timestamps=True, language=language)[0]
+
+    def status(self):
+        return {'mode': 'thread', 'model': self.whisper_service.model_name,
+                'loaded': self.whisper_service.model is not None}
+
+    def stop(self, timeout=5):
+        pass
+
+
+def live_process_main(model_name, requests, responses):
+    """
+    Bucle del proceso de inferencia en directo (modo producción): decodifica las
+    ventanas que llegan por 'requests' y devuelve (id, resultado, error) por 'responses'.
+    """
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - [live] %(message)s',
+        force=True
+    )
+
+    from whisper_service import WhisperService
+    whisper_service = WhisperService(model_name=model_name)
+    try:
+        whisper_service.load_model()
+    except Exception as e:
+        logger.error(f"LIVE WARMUP ERROR: {e}")
+    responses.put((None, os.getpid(), None))
+
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+        request_id, audio, language = request
+        try:
+            result = whisper_service.transcribe_batch([audio], include_timestamps=True, language=language)[0]
+            responses.put((request_id, result, None))
+        except Exception as e:
+            logger.error(f"LIVE ERROR: {e}", exc_info=True)
+            responses.put((request_id, None, str(e)))
+
+
+class LiveInferenceProcess:
+    """
+    Carril de inferencia en directo para los modos con inferencia fuera del proceso
+    web (pool de procesos o nodos externos): un proceso propio con su modelo
+    ('live_model'), que se lanza con la primera sesión en directo. Las ventanas no
+    pasan por la cola de trabajos, así que no esperan a los archivos largos.
+    """
+
+    def __init__(self, model_name, timeout=None):
+        """
+        Args:
+            model_name: Modelo de Whisper del proceso en directo
+            timeout: Segundos máximos de espera por ventana (config 'live_timeout_seconds')
+        """
+        self.model_name = model_name
+        self.timeout = float(timeout or config_manager.get('live_timeout_seconds', 120))
+        self._ctx = multiprocessing.get_context('spawn')
+        self._lock = threading.Lock()
+        self._process = None
+        self._requests = None
+        self._responses = None
+        self._waiting = {}  # id de petición -> [Event, resultado, error]
+        self._next_id = 0
+        self.pid = None
+
+    def start(self):
+        """Lanza el proceso si no está vivo"""
+        with self._lock:
+            if self._process is not None and self._process.is_alive():
+                return
+            # Las peticiones en vuelo del proceso anterior no tendrán respuesta
+            for waiter in self._waiting.values():
+                waiter[2] = 'El proceso de inferencia en directo terminó inesperadamente'
+                waiter[0].set()
+            self._waiting = {}
+            self._requests = self._ctx.Queue()
+            self._responses = self._ctx.Queue()
+            self._process = self._ctx.Process(
+                target=live_process_main,
+                args=(self.model_name, self._requests, self._responses),
+                name='inference-live',
+                daemon=True
+            )
+            self._process.start()
+            self.pid = self._process.pid
+            threading.Thread(target=self._listen, args=(self._responses,), name='live-events', daemon=True).start()
+        logger.info(f"LIVE WORKER: proceso {self.pid} (modelo {self.model_name})")
+
+    def _listen(self, responses):
+        while True:
+            try:
+                request_id, result, error = responses.get()
+            except (EOFError, OSError):
+                break
+            if request_id is None:
+                logger.info(f"LIVE WORKER LISTO (pid={result})")
+                continue
+            with self._lock:
+                waiter = self._waiting.pop(request_id, None)
+            if waiter is not None:
+                waiter[1], waiter[2] = result, error
+                waiter[0].set()
+
+    def transcribe(self, audio, language=None):
+        """Decodifica una ventana en el proceso en directo (bloquea hasta la respuesta)"""
+        self.start()
+        waiter = [threading.Event(), None, None]
+        with self._lock:
+            self._next_id += 1
+            request_id = self._next_id
+            self._waiting[request_id] = waiter
+            requests = self._requests
+        requests.put((request_id, audio, language))
+
+        deadline = time.time() + self.timeout
+        while not waiter[0].wait(timeout=1):
+            if not self._process.is_alive() or time.time() > deadline:
+                with self._lock:
+                    self._waiting.pop(request_id, None)
+                raise RuntimeError('El proceso de inferencia en directo no respondió')
+        if waiter[2]:
+            raise RuntimeError(waiter[2])
+        return waiter[1]
+
+    def status(self):
+        return {'mode': 'process', 'model': self.model_name, 'pid': self.pid,
+                'alive': bool(self._process and self._process.is_alive())}
+
+    def stop(self, timeout=5):
+        if self._process is not None and self._process.is_alive():
+            self._requests.put(None)
+            self._process.join(timeout)
@@ -0,0 +1,198 @@
+import io
+import os
+import sys
+import time
+import random
+import pstats
+import cProfile
+import logging
+import threading
+import subprocess
+from config import config_manager
+from output_writer import atomic_write, atomic_save
+
+logger = logging.getLogger(__name__)
+
+MODES = ('cprofile', 'sample')
+PROFILE_SUFFIX = '_perfil'
+TOP_ENTRIES = 60
+
+# Perfilador activo en cada hilo (para anotar los subprocesos que lanza ese trabajo)
+_active = threading.local()
+
+
+def profile_mode(requested=None):
+    """
+    Modo de perfilado para un trabajo, o None para no perfilarlo
+
+    Args:
+        requested: Modo pedido en la subida ('cprofile', 'sample' o None)
+
+    Prioridad: lo pedido en la subida, 'profile_mode' de config.json (todos los trabajos)
+    y, si no, un muestreo de 'profile_sample_rate' de los trabajos con el perfilador por muestreo.
+    """
+    mode = requested or config_manager.get('profile_mode') or None
+    if mode:
+        if mode not in MODES:
+            logger.warning(f"Modo de perfilado desconocido: {mode}. Se usa 'cprofile'")
+            mode = 'cprofile'
+        return mode
+    rate = float(config_manager.get('profile_sample_rate', 0.0))
+    if rate > 0 and random.random() < rate:
+        return 'sample'
+    return None
+
+
+def run_command(cmd, **kwargs):
+    """subprocess.run que anota su tiempo de reloj en el perfil del trabajo en curso (si lo hay)"""
+    start = time.perf_counter()
+    try:
+        return subprocess.run(cmd, **kwargs)
+    finally:
+        profiler = getattr(_active, 'profiler', None)
+        if profiler is not None:
+            profiler.record_command(cmd, time.perf_counter() - start)
+
+
+class StackSampler:
+    """
+    Perfilador por muestreo de bajo coste: cada 'interval' segundos anota la pila
+    del hilo perfilado (sys._current_frames) en formato "collapsed" (flame graph).
+    """
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = {}
+        self.samples = 0
+        self._done = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._done.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                key = ';'.join(reversed(stack))
+                self.counts[key] = self.counts.get(key, 0) + 1
+                self.samples += 1
+
+    def top_functions(self, limit):
+        """Funciones con más muestras en la cima de la pila (tiempo propio)"""
+        own = {}
+        for stack, count in self.counts.items():
+            leaf = stack.rsplit(';', 1)[-1]
+            own[leaf] = own.get(leaf, 0) + count
+        return sorted(own.items(), key=lambda item: -item[1])[:limit]
+
+
+class JobProfiler:
+    """
+    Perfil de un trabajo alrededor de process_audio: cProfile (detallado, más coste)
+    o muestreo de pilas (ligero, apto para muestrear todos los trabajos), más el
+    tiempo de reloj de cada subproceso (ffmpeg/ffprobe) lanzado con run_command.
+    """
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.commands = []
+        self.wall_seconds = None
+        self._profile = None
+        self._sampler = None
+        self._start = None
+
+    def __enter__(self):
+        if self.mode == 'cprofile':
+            self._profile = cProfile.Profile()
+            try:
+                self._profile.enable()
+            except ValueError as e:
+                # Otro perfilador activo en el proceso (p. ej. un depurador): se muestrea en su lugar
+                logger.warning(f"PROFILE: cProfile no disponible ({e}), se usa muestreo")
+                self._profile = None
+                self.mode = 'sample'
+        if self.mode == 'sample':
+            interval = float(config_manager.get('profile_sample_interval', 0.01))
+            self._sampler = StackSampler(threading.get_ident(), interval)
+            self._sampler.start()
+        _active.profiler = self
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.wall_seconds = time.perf_counter() - self._start
+        _active.profiler = None
+        if self._profile is not None:
+            self._profile.disable()
+        if self._sampler is not None:
+            self._sampler.stop()
+        return False
+
+    def record_command(self, cmd, seconds):
+        self.commands.append({'command': os.path.basename(str(cmd[0])), 'seconds': round(seconds, 3)})
+
+    def save(self, output_dir, stem, stages=None, task_id=None):
+        """
+        Guarda el perfil junto a las salidas
+
+        Args:
+            output_dir: Directorio de las transcripciones
+            stem: Nombre base del audio
+            stages: (Opcional) Etapas de MemoryMonitor (duración y RSS)
+            task_id: (Opcional) Tarea del trabajo: dos trabajos con el mismo nombre
+                de archivo no comparten perfil
+
+        Returns:
+            list: Rutas de los archivos escritos (informe .txt y .prof o .folded)
+        """
+        name = f"{stem}_{task_id}{PROFILE_SUFFIX}" if task_id else f"{stem}{PROFILE_SUFFIX}"
+        base = os.path.join(output_dir, name)
+        lines = [
+            f"Perfil ({self.mode}) de {stem}",
+            f"Tiempo total: {self.wall_seconds:.2f}s",
+            ""
+        ]
+        if stages:
+            lines.append("Etapas:")
+            lines.extend(f"  {s['stage']:24s} {s['seconds']:8.2f}s  pico RSS {s['rss_peak_mb']} MB" for s in stages)
+            lines.append("")
+        lines.append("Subprocesos:")
+        lines.extend(f"  {c['command']:24s} {c['seconds']:8.3f}s" for c in self.commands)
+        if not self.commands:
+            lines.append("  (ninguno)")
+        lines.append("")
+
+        paths = []
+        if self._profile is not None:
+            stream = io.StringIO()
+            stats = pstats.Stats(self._profile, stream=stream)
+            stats.sort_stats('cumulative').print_stats(TOP_ENTRIES)
+            lines.append(stream.getvalue())
+            # Binario para snakeviz / pstats
+            atomic_save(base + '.prof', stats.dump_stats)
+            paths.append(base + '.prof')
+        elif self._sampler is not None:
+            interval = self._sampler.interval
+            lines.append(f"Muestras: {self._sampler.samples} (cada {interval * 1000:.0f} ms)")
+            lines.append("Tiempo propio por función:")
+            lines.extend(f"  {count * interval:8.2f}s  {name}" for name, count in self._sampler.top_functions(TOP_ENTRIES))
+            # Pilas "collapsed" para flamegraph.pl / speedscope
+            atomic_write(base + '.folded', ''.join(f"{stack} {count}\n" for stack, count in self._sampler.counts.items()))
+            paths.append(base + '.folded')
+
+        atomic_write(base + '.txt', '\n'.join(lines) + '\n')
+        paths.insert(0, base + '.txt')
+        logger.info(f"PROFILE: {stem} ({self.mode}, {self.wall_seconds:.1f}s) -> {os.path.basename(base)}.txt")
+        return paths
@@ -0,0 +1,86 @@
+import time
+import threading
+
+
+class JobQueue:
+    """
+    Cola de trabajos de transcripción pendientes.
+    La rellena /upload y la consumen los workers de inferencia
+    (un hilo local en modo desarrollo o procesos separados en producción).
+    El orden de salida lo decide el planificador (fifo, sjf o fair).
+    """
+
+    def __init__(self, scheduler=None, on_change=None):
+        """
+        Args:
+            scheduler: (Opcional) JobScheduler que decide el orden de salida
+            on_change: (Opcional) Callback sin argumentos tras encolar o sacar trabajos
+        """
+        self._jobs = []
+        self._cond = threading.Condition()
+        self.scheduler = scheduler
+        self.on_change = on_change
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change()
+
+    def put(self, job):
+        """Añade un trabajo a la cola"""
+        with self._cond:
+            job.setdefault('enqueued_at', time.time())
+            self._jobs.append(job)
+            self._cond.notify()
+        self._changed()
+
+    def get(self, timeout=None):
+        """
+        Saca el siguiente trabajo, esperando si la cola está vacía
+
+        Args:
+            timeout: Segundos máximos de espera (None = sin límite)
+
+        Returns:
+            dict o None: El trabajo, o None si se agotó la espera
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: len(self._jobs) > 0, timeout=timeout):
+                return None
+            if self.scheduler is None:
+                job = self._jobs.pop(0)
+            else:
+                job = self._jobs.pop(self.scheduler.select(self._jobs))
+                self.scheduler.on_dispatch(job)
+        self._changed()
+        return job
+
+    def take_matching(self, predicate, limit):
+        """
+        Saca (sin esperar) hasta 'limit' trabajos pendientes que cumplan 'predicate',
+        conservando el orden del resto. Se usa para agrupar trabajos en lote.
+        """
+        taken = []
+        with self._cond:
+            if limit <= 0:
+                return taken
+            remaining = []
+            for job in self._jobs:
+                if len(taken) < limit and predicate(job):
+                    taken.append(job)
+                    if self.scheduler is not None:
+                        self.scheduler.on_dispatch(job)
+                else:
+                    remaining.append(job)
+            self._jobs = remaining
+        if taken:
+            self._changed()
+        return taken
+
+    def snapshot(self):
+        """Copia de los trabajos pendientes (en orden)"""
+        with self._cond:
+            return list(self._jobs)
+
+    def __len__(self):
+        with self._cond:
+            return len(self._jobs)
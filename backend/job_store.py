@@ -0,0 +1,253 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+import logging
+import threading
+from config import config_manager
+
+logger = logging.getLogger(__name__)
+
+# Sin WAL: el archivo puede estar en un volumen compartido (NFS/SMB) donde WAL no funciona
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    task_id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'queued',
+    worker_id TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, created_at);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_id TEXT NOT NULL,
+    fields TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS workers (
+    worker_id TEXT PRIMARY KEY,
+    host TEXT,
+    pid INTEGER,
+    task_id TEXT,
+    last_seen REAL NOT NULL
+);
+"""
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class SQLiteJobStore:
+    """
+    Almacén de trabajos compartido entre el front end y los nodos de inferencia
+    (un archivo SQLite en un volumen común). Un nodo toma un trabajo con una
+    concesión de 'lease_seconds' que renueva con latidos; si el nodo desaparece,
+    la concesión caduca y el trabajo vuelve a la cola.
+    El progreso de los nodos llega al front end como eventos en la tabla 'events'.
+    """
+
+    def __init__(self, db_path, lease_seconds=None, max_attempts=None):
+        """
+        Args:
+            db_path: Ruta al archivo SQLite (en el volumen compartido)
+            lease_seconds: Validez de una concesión sin latido (config 'lease_seconds')
+            max_attempts: Concesiones perdidas antes de dar el trabajo por fallido (config 'max_job_attempts')
+        """
+        self.db_path = db_path
+        self.lease_seconds = float(lease_seconds or config_manager.get('lease_seconds', 60))
+        self.max_attempts = int(max_attempts or config_manager.get('max_job_attempts', 3))
+        self._local = threading.local()
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        """Una conexión por hilo (los nodos usan un hilo aparte para los latidos)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self):
+        return _Transaction(self._connection())
+
+    # --- Front end ---
+
+    def put(self, job):
+        """Publica un trabajo para que lo tome cualquier nodo"""
+        with self._transaction() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO jobs (task_id, payload, state, attempts, created_at) VALUES (?, ?, ?, ?, ?)',
+                (job['task_id'], json.dumps(job), 'queued', job.get('lease_attempts', 0), time.time())
+            )
+
+    def pending_count(self):
+        """Trabajos publicados que ningún nodo ha tomado todavía"""
+        with self._transaction() as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE state = 'queued'").fetchone()[0]
+
+    def reclaim_expired(self):
+        """
+        Retira los trabajos cuya concesión caducó (nodo caído o colgado)
+
+        Returns:
+            list: (job, attempts, failed) por trabajo retirado; 'failed' si agotó los intentos
+        """
+        now = time.time()
+        reclaimed = []
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT task_id, payload, attempts, worker_id FROM jobs WHERE state = 'leased' AND lease_expires < ?",
+                (now,)
+            ).fetchall()
+            for task_id, payload, attempts, worker_id in rows:
+                logger.warning(f"LEASE EXPIRED: {task_id} (worker {worker_id}, intento {attempts})")
+                conn.execute('DELETE FROM jobs WHERE task_id = ?', (task_id,))
+                job = json.loads(payload)
+                job['lease_attempts'] = attempts  # Se conserva si el trabajo se vuelve a publicar
+                reclaimed.append((job, attempts, attempts >= self.max_attempts))
+        return reclaimed
+
+    def take_events(self, limit=500):
+        """Saca los eventos de progreso pendientes, en orden: [(task_id, fields)]"""
+        with self._transaction() as conn:
+            rows = conn.execute('SELECT id, task_id, fields FROM events ORDER BY id LIMIT ?', (limit,)).fetchall()
+            if rows:
+                conn.execute('DELETE FROM events WHERE id <= ?', (rows[-1][0],))
+        return [(task_id, json.loads(fields)) for _, task_id, fields in rows]
+
+    def workers(self):
+        """Nodos con latido reciente (dentro de la validez de una concesión)"""
+        with self._transaction() as conn:
+            rows = conn.execute(
+                'SELECT worker_id, host, pid, task_id, last_seen FROM workers WHERE last_seen >= ? ORDER BY worker_id',
+                (time.time() - self.lease_seconds,)
+            ).fetchall()
+        return [
+            {'id': worker_id, 'host': host, 'pid': pid, 'task_id': task_id, 'last_seen': last_seen}
+            for worker_id, host, pid, task_id, last_seen in rows
+        ]
+
+    # --- Nodos de inferencia ---
+
+    def lease(self, worker_id):
+        """
+        Toma el trabajo publicado más antiguo con una concesión a nombre de 'worker_id'
+
+        Returns:
+            dict o None: El trabajo (con 'lease_attempt', el testigo de esta concesión
+                para holds/complete), o None si no hay ninguno
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT task_id, payload, attempts FROM jobs WHERE state = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                self._touch(conn, worker_id, None, now)
+                return None
+            task_id, payload, attempts = row
+            conn.execute(
+                "UPDATE jobs SET state = 'leased', worker_id = ?, lease_expires = ?, attempts = attempts + 1 WHERE task_id = ?",
+                (worker_id, now + self.lease_seconds, task_id)
+            )
+            self._touch(conn, worker_id, task_id, now)
+        job = json.loads(payload)
+        job['lease_attempt'] = attempts + 1
+        return job
+
+    def holds(self, worker_id, task_id, attempt):
+        """
+        Comprueba (y renueva) que la concesión 'attempt' de 'task_id' sigue siendo del nodo.
+        Se consulta antes de publicar salidas o borrar la subida: si la concesión caducó
+        y el trabajo se volvió a publicar, el nuevo titular necesita la subida y sus salidas
+        son las que valen.
+
+        Returns:
+            bool: True si la concesión sigue vigente a nombre de este nodo
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE task_id = ? AND worker_id = ? AND attempts = ? "
+                "AND state = 'leased' AND lease_expires >= ?",
+                (now + self.lease_seconds, task_id, worker_id, attempt, now)
+            )
+            return cur.rowcount > 0
+
+    def heartbeat(self, worker_id, task_id=None, attempt=None):
+        """
+        Latido del nodo: renueva su concesión sobre 'task_id' (si lo hay)
+
+        Args:
+            attempt: (Opcional) Testigo de la concesión ('lease_attempt' del trabajo)
+
+        Returns:
+            bool: False si la concesión ya no es suya (caducó y el trabajo se reasignó)
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            self._touch(conn, worker_id, task_id, now)
+            if task_id is None:
+                return True
+            if attempt is None:
+                cur = conn.execute(
+                    "UPDATE jobs SET lease_expires = ? WHERE task_id = ? AND worker_id = ? AND state = 'leased'",
+                    (now + self.lease_seconds, task_id, worker_id)
+                )
+            else:
+                cur = conn.execute(
+                    "UPDATE jobs SET lease_expires = ? WHERE task_id = ? AND worker_id = ? AND attempts = ? AND state = 'leased'",
+                    (now + self.lease_seconds, task_id, worker_id, attempt)
+                )
+            return cur.rowcount > 0
+
+    def report(self, task_id, **fields):
+        """Publica un cambio de estado de una tarea para el front end"""
+        with self._transaction() as conn:
+            conn.execute('INSERT INTO events (task_id, fields) VALUES (?, ?)', (task_id, json.dumps(fields)))
+
+    def complete(self, worker_id, task_id, attempt=None):
+        """
+        El nodo terminó el trabajo (con éxito o error ya informado): se borra de la cola.
+        Con 'attempt', una finalización de una concesión ya perdida no borra la del nuevo titular.
+
+        Returns:
+            bool: False si la concesión ya no era suya (finalización descartada)
+        """
+        with self._transaction() as conn:
+            if attempt is None:
+                cur = conn.execute('DELETE FROM jobs WHERE task_id = ? AND worker_id = ?', (task_id, worker_id))
+            else:
+                cur = conn.execute('DELETE FROM jobs WHERE task_id = ? AND worker_id = ? AND attempts = ?',
+                                   (task_id, worker_id, attempt))
+            self._touch(conn, worker_id, None, time.time())
+            return cur.rowcount > 0
+
+    def unregister(self, worker_id):
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM workers WHERE worker_id = ?', (worker_id,))
+
+    @staticmethod
+    def _touch(conn, worker_id, task_id, now):
+        conn.execute(
+            'INSERT OR REPLACE INTO workers (worker_id, host, pid, task_id, last_seen) VALUES (?, ?, ?, ?, ?)',
+            (worker_id, socket.gethostname(), os.getpid(), task_id, now)
+        )
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT: toma el bloqueo de escritura desde el principio (sin carreras al tomar trabajos)"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        return False
@@ -0,0 +1,227 @@
+import time
+import uuid
+import logging
+import threading
+import numpy as np
+from config import config_manager
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+FRAME_SAMPLES = 480            # 30 ms por trama del VAD
+MAX_WINDOW_SECONDS = 30.0      # Ventana máxima de Whisper
+
+
+def pcm16_to_float(data):
+    """PCM s16le mono -> float32 en [-1, 1]"""
+    if len(data) % 2:
+        data = data[:-1]
+    return np.frombuffer(data, dtype='<i2').astype(np.float32) / 32768.0
+
+
+def speech_frames(audio, threshold):
+    """
+    VAD por energía: True por cada trama de 30 ms cuyo RMS supera el umbral
+    """
+    n = len(audio) // FRAME_SAMPLES
+    if n == 0:
+        return np.zeros(0, dtype=bool)
+    frames = audio[:n * FRAME_SAMPLES].reshape(n, FRAME_SAMPLES)
+    return np.sqrt(np.mean(frames ** 2, axis=1)) > threshold
+
+
+class LiveSession:
+    """
+    Sesión de transcripción en directo sobre una ventana deslizante.
+
+    El audio llega en trozos PCM. Las tramas de silencio se descartan (VAD) hasta que
+    empieza a hablarse; a partir de ahí se acumula la ventana sin confirmar y:
+      - cada 'step' segundos de audio nuevo se decodifica la ventana -> segmento parcial
+      - tras 'silence' segundos de silencio se decodifica y todo pasa a definitivo
+      - si la ventana llega a 'max_window' segundos se confirman todos los segmentos
+        menos el último, que sigue en la ventana (puede estar cortado)
+    Así la latencia queda acotada por la ventana máxima más el tiempo de una decodificación.
+    """
+
+    def __init__(self, transcribe_window):
+        """
+        Args:
+            transcribe_window: Función audio float32 -> dict con 'segments' (start, end, text)
+        """
+        self.id = str(uuid.uuid4())
+        self.transcribe_window = transcribe_window
+        self.lock = threading.Lock()
+        self.created_at = self.last_seen = time.time()
+
+        self.threshold = float(config_manager.get('live_vad_rms', 0.01))
+        self.step = float(config_manager.get('live_step_seconds', 2.0))
+        self.silence = float(config_manager.get('live_silence_seconds', 0.8))
+        self.max_window = min(float(config_manager.get('live_max_window_seconds', 20.0)), MAX_WINDOW_SECONDS)
+        self.padding = int(0.3 * SAMPLE_RATE)  # Audio previo a la voz que se conserva
+
+        self._pending = np.zeros(0, dtype=np.float32)  # Trozo sin tramas completas todavía
+        self._frames = []                              # Audio sin confirmar (tramas)
+        self._window_samples = 0
+        self._window_start = 0.0                       # Posición (s) del inicio de la ventana
+        self._received = 0                             # Muestras recibidas en total
+        self._in_speech = False
+        self._silent_samples = 0
+        self._since_decode = 0
+
+        self.final_segments = []
+        self.stats = {'decodes': 0, 'decode_seconds': 0.0, 'max_decode_seconds': 0.0}
+
+    @property
+    def received_seconds(self):
+        return self._received / SAMPLE_RATE
+
+    def feed(self, pcm):
+        """
+        Añade audio PCM s16le 16 kHz mono
+
+        Returns:
+            dict: {'final': [segmentos nuevos definitivos], 'partial': texto provisional o None}
+        """
+        self.last_seen = time.time()
+        audio = np.concatenate([self._pending, pcm16_to_float(pcm)])
+        usable = len(audio) - len(audio) % FRAME_SAMPLES
+        self._pending = audio[usable:]
+        audio = audio[:usable]
+
+        final = []
+        partial = None
+        voiced = speech_frames(audio, self.threshold)
+        for index, is_speech in enumerate(voiced):
+            frame = audio[index * FRAME_SAMPLES:(index + 1) * FRAME_SAMPLES]
+            self._received += FRAME_SAMPLES
+
+            if not self._in_speech:
+                if not is_speech:
+                    # Compuerta cerrada: solo se guarda un poco de audio previo
+                    self._append(frame)
+                    while self._window_samples > self.padding:
+                        self._window_samples -= len(self._frames.pop(0))
+                    self._window_start = self._received / SAMPLE_RATE - self._window_samples / SAMPLE_RATE
+                    continue
+                self._in_speech = True
+                self._silent_samples = 0
+                self._since_decode = 0
+
+            self._append(frame)
+            self._since_decode += FRAME_SAMPLES
+            self._silent_samples = 0 if is_speech else self._silent_samples + FRAME_SAMPLES
+
+            if self._silent_samples >= self.silence * SAMPLE_RATE:
+                final.extend(self._commit(keep_last=False))
+                partial = None
+            elif self._window_samples >= self.max_window * SAMPLE_RATE:
+                final.extend(self._commit(keep_last=True))
+                partial = None
+            elif self._since_decode >= self.step * SAMPLE_RATE:
+                partial = self._partial()
+
+        return {'final': final, 'partial': partial}
+
+    def finish(self):
+        """Confirma el audio restante (fin de la sesión)"""
+        if self._in_speech and self._window_samples:
+            return self._commit(keep_last=False)
+        return []
+
+    def _append(self, frame):
+        self._frames.append(frame)
+        self._window_samples += len(frame)
+
+    def _window_audio(self):
+        return np.concatenate(self._frames) if self._frames else np.zeros(0, dtype=np.float32)
+
+    def _decode(self):
+        start = time.perf_counter()
+        result = self.transcribe_window(self._window_audio())
+        elapsed = time.perf_counter() - start
+        self.stats['decodes'] += 1
+        self.stats['decode_seconds'] += elapsed
+        self.stats['max_decode_seconds'] = max(self.stats['max_decode_seconds'], elapsed)
+        self._since_decode = 0
+        return [s for s in result.get('segments', []) if s.get('text', '').strip()]
+
+    def _partial(self):
+        segments = self._decode()
+        return ' '.join(s['text'].strip() for s in segments) or None
+
+    def _commit(self, keep_last):
+        segments = self._decode()
+        window_seconds = self._window_samples / SAMPLE_RATE
+
+        cut = window_seconds
+        if keep_last and len(segments) > 1:
+            cut = segments[-1]['start']
+            segments = segments[:-1]
+
+        committed = [
+            {
+                'start': round(float(self._window_start + s['start']), 2),
+                'end': round(float(self._window_start + min(s['end'], window_seconds)), 2),
+                'text': s['text'].strip()
+            }
+            for s in segments
+        ]
+        self.final_segments.extend(committed)
+
+        # Lo que queda tras el corte sigue en la ventana
+        if keep_last:
+            cut_samples = min(int(cut * SAMPLE_RATE), self._window_samples)
+            rest = self._window_audio()[cut_samples:]
+            self._frames = [rest] if len(rest) else []
+            self._window_samples = len(rest)
+            self._window_start += cut_samples / SAMPLE_RATE
+        else:
+            self._in_speech = False
+            self._frames = []
+            self._window_samples = 0
+            self._window_start = self.received_seconds
+        return committed
+
+    def transcript(self):
+        return '\n'.join(s['text'] for s in self.final_segments)
+
+
+class LiveSessionManager:
+    """Registro de sesiones en directo con caducidad por inactividad"""
+
+    def __init__(self, transcribe_window):
+        self.transcribe_window = transcribe_window
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        self.expire()
+        max_sessions = int(config_manager.get('live_max_sessions', 4))
+        with self._lock:
+            if len(self._sessions) >= max_sessions:
+                return None
+            session = LiveSession(self.transcribe_window)
+            self._sessions[session.id] = session
+        logger.info(f"LIVE START: {session.id}")
+        return session
+
+    def get(self, session_id):
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def stop(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None)
+
+    def expire(self):
+        """Elimina las sesiones sin audio desde hace 'live_session_timeout' segundos"""
+        timeout = float(config_manager.get('live_session_timeout', 300))
+        now = time.time()
+        with self._lock:
+            for session_id in [sid for sid, s in self._sessions.items() if now - s.last_seen > timeout]:
+                del self._sessions[session_id]
+                logger.info(f"LIVE EXPIRED: {session_id}")
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
@@ -0,0 +1,472 @@
+"""
+Prueba de carga de la capa HTTP (/upload, /status, /download) y de la cola.
+
+Arranca app.py en un proceso aparte con servicios de inferencia simulados:
+Whisper y la diarización solo esperan duración del audio × real-time factor (los
+de scheduler.py, escalados con --time-scale). Desde este proceso lanza --clients
+clientes concurrentes que suben audios WAV generados, consultan /status hasta
+que terminan y descargan las salidas. Informa de los percentiles de latencia por
+endpoint, la espera en cola, los 429 de la admisión y el crecimiento de memoria
+del servidor. Los clientes no comparten proceso (ni GIL) con el servidor, así
+que no cuentan en sus latencias ni en su RSS.
+
+Por defecto la inferencia corre en hilos LocalWorker (modo desarrollo); con
+--production, en el ProcessWorkerPool del modo producción (procesos 'spawn' que
+instalan también los servicios simulados), y se informa aparte del RSS de los
+procesos de inferencia.
+
+Todo corre en un directorio temporal (uploads, transcripciones, índice, log y
+rtf_stats.json) que se borra al terminar (--keep para conservarlo), sin tocar
+los datos reales. Sin ffmpeg, los WAV se leen con el módulo 'wave' (--ffmpeg
+para usar el camino real).
+
+Uso:
+    python load_test.py [--clients 200] [--files-per-client 1] [--audio-seconds 30,120]
+                        [--workers 2] [--production] [--time-scale 0.05] [--diarization] [--policy sjf]
+"""
+import io
+import os
+import sys
+import json
+import time
+import queue
+import uuid
+import wave
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+import multiprocessing
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+# --- Servicios simulados ---
+
+def make_mock_services(time_scale, load_seconds):
+    """Crea los sustitutos de WhisperService y DiarizationService (tras importar sus módulos)"""
+    from whisper_service import WhisperService
+    from scheduler import DEFAULT_RTF, DIARIZATION_RTF
+
+    def rtf_of(model):
+        return DEFAULT_RTF.get(model, DEFAULT_RTF['small'])
+
+    class MockWhisperService(WhisperService):
+        """WhisperService que espera duración × RTF del modelo en vez de transcribir"""
+
+        def load_model(self):
+            if self.model is None:
+                time.sleep(load_seconds * time_scale)
+                self.model = 'mock'
+
+        def load_audio(self, audio_path):
+            return read_wav(audio_path).astype(np.float32) / 32768.0
+
+        def transcribe(self, audio_path, include_timestamps=False, initial_prompt=None, word_timestamps=False, language=None):
+            audio = self.load_audio(audio_path) if isinstance(audio_path, str) else audio_path
+            duration = len(audio) / SAMPLE_RATE
+            # Segmentos de 5 s, al ritmo de la "decodificación"
+            segments = []
+            for start in np.arange(0.0, duration, 5.0):
+                end = min(duration, start + 5.0)
+                time.sleep((end - start) * rtf_of(self.model_name) * time_scale)
+                segment = {'start': float(start), 'end': float(end), 'text': f' Segmento simulado {len(segments) + 1}.'}
+                if word_timestamps:
+                    segment['words'] = [{'start': float(start), 'end': float(end), 'word': segment['text']}]
+                segments.append(segment)
+            text = ''.join(s['text'] for s in segments).strip()
+            return {'text': text, 'segments': segments} if include_timestamps else text
+
+        def transcribe_batch(self, audios, include_timestamps=False, language=None):
+            # Una pasada sobre ventanas de 30 s apiladas: cuesta como la más larga (relleno a 30 s)
+            time.sleep(30.0 * rtf_of(self.model_name) * time_scale)
+            results = []
+            for audio in audios:
+                duration = len(audio) / SAMPLE_RATE
+                segments = [{'start': 0.0, 'end': duration, 'text': ' Nota de voz simulada.'}]
+                results.append({'text': segments[0]['text'], 'segments': segments} if include_timestamps else segments[0]['text'].strip())
+            return results
+
+        def no_speech_probs(self, audios, language=None):
+            time.sleep(0.05 * len(audios) * time_scale)
+            return [0.05] * len(audios)
+
+    class MockDiarizationService:
+        """DiarizationService que espera duración × DIARIZATION_RTF y alterna dos hablantes"""
+
+        settings = {'preset': 'mock'}
+
+        def load_pipeline(self):
+            return True
+
+        def diarize_with_embeddings(self, audio, num_speakers=None):
+            duration = len(audio) / SAMPLE_RATE
+            time.sleep(duration * DIARIZATION_RTF * time_scale)
+            segments = [
+                {'start': float(start), 'end': float(min(duration, start + 10.0)), 'speaker': f'SPEAKER_0{int(start // 10) % 2}'}
+                for start in np.arange(0.0, duration, 10.0)
+            ]
+            return segments, {}
+
+        def diarize(self, audio, num_speakers=None):
+            return self.diarize_with_embeddings(audio, num_speakers)[0]
+
+    return MockWhisperService(), MockDiarizationService()
+
+
+def read_wav(path):
+    """PCM int16 mono de un WAV de 16 kHz (los que genera este script)"""
+    with wave.open(path, 'rb') as f:
+        return np.frombuffer(f.readframes(f.getnframes()), dtype='<i2')
+
+
+def make_wav(seconds, seed):
+    """WAV de 16 kHz con ruido (con energía suficiente para pasar la criba de voz)"""
+    rng = np.random.default_rng(seed)
+    samples = np.clip(rng.normal(0, 3000, int(seconds * SAMPLE_RATE)), -32768, 32767).astype('<i2')
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+def patch_wav_decoding(audio_processor_class):
+    """Sustituye ffmpeg/ffprobe por el módulo 'wave' (solo para los WAV generados)"""
+
+    def get_audio_duration(self, audio_path):
+        with wave.open(audio_path, 'rb') as f:
+            return f.getnframes() / f.getframerate()
+
+    def decode_to_pcm(self, audio_path, output_dir):
+        pcm_path = os.path.join(output_dir, f"{os.path.splitext(os.path.basename(audio_path))[0]}.pcm")
+        read_wav(audio_path).tofile(pcm_path)
+        return pcm_path
+
+    audio_processor_class.get_audio_duration = get_audio_duration
+    audio_processor_class.decode_to_pcm = decode_to_pcm
+
+
+class ThreadWorkers:
+    """Varios LocalWorker en hilos (los servicios simulados no comparten estado de modelo)"""
+
+    def __init__(self, workers):
+        self.workers = workers
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+
+    def status(self):
+        return [dict(worker.status()[0], id=i) for i, worker in enumerate(self.workers)]
+
+
+def install_mocks(options):
+    """
+    Sustituye los servicios de inferencia (y ffmpeg, salvo --ffmpeg) en este proceso.
+    Debe llamarse antes de importar app o de arrancar un worker de inferencia.
+    """
+    import whisper_service as whisper_module
+    import diarization_service as diarization_module
+    mock_whisper, mock_diarization = make_mock_services(options.time_scale, options.load_seconds)
+    mock_whisper.model_name = options.model
+    whisper_module.whisper_service = mock_whisper
+    diarization_module.diarization_service = mock_diarization
+
+    from config import config_manager
+    if options.policy:
+        config_manager._config['scheduling_policy'] = options.policy
+    if not options.ffmpeg:
+        import audio_processor as audio_processor_module
+        patch_wav_decoding(audio_processor_module.AudioProcessor)
+    return mock_whisper
+
+
+def mock_worker_process_main(worker_id, inbox, events, settings):
+    """worker_process_main con los servicios simulados (proceso de inferencia de --production)"""
+    import inference_worker
+    options = settings['load_test']
+    install_mocks(options)
+    if not options.verbose:
+        # worker_process_main reconfigura el logging a INFO: silenciarlo aquí como el del servidor
+        logging.disable(logging.INFO)
+    inference_worker.worker_process_main(worker_id, inbox, events, settings)
+
+
+def process_rss_mb(pid):
+    """RSS en MB de otro proceso (/proc en Linux, psutil si no); 0 si no se puede leer"""
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss / (1024 * 1024)
+    except Exception:
+        return 0.0
+
+
+def serve_main(options, work_dir, control, results):
+    """
+    Proceso servidor: app.py con inferencia simulada y servidor werkzeug multihilo.
+    Avisa por 'results' cuando escucha; al recibir 'stop' por 'control' devuelve
+    los started_at de las tareas y las medidas de memoria, y termina.
+    """
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(work_dir)
+    mock_whisper = install_mocks(options)
+
+    import app as server
+    import inference_worker
+    from memory_monitor import current_rss_mb
+    from inference_worker import LocalWorker, ProcessWorkerPool
+    for name in ('', 'werkzeug'):
+        logging.getLogger(name).setLevel(logging.INFO if options.verbose else logging.WARNING)
+    server.rtf_estimator.path = os.path.join(work_dir, 'rtf_stats.json')
+
+    if options.production:
+        # El ProcessWorkerPool real (mismos settings que start_background_tasks), con workers
+        # que instalan los simulados al arrancar: con 'spawn' no heredan los parches de este proceso
+        inference_worker.worker_process_main = mock_worker_process_main
+        settings = {
+            'transcription_dir': os.path.abspath(server.TRANSCRIPTION_DIR),
+            'search_index_db': os.path.abspath(server.SEARCH_INDEX_DB),
+            'warmup': server.config_manager.get('warmup_on_start', True),
+            'load_test': options
+        }
+        server.inference_backend = ProcessWorkerPool(server.job_queue, max(1, options.workers), settings, server.update_task)
+        server.inference_backend.start()
+    else:
+        workers = [
+            LocalWorker(server.job_queue, mock_whisper, server.audio_processor, server.TRANSCRIPTION_DIR, server.update_task, threading.Lock())
+            for _ in range(max(1, options.workers))
+        ]
+        server.inference_backend = ThreadWorkers(workers)
+        server.inference_backend.start()
+
+    from werkzeug.serving import make_server
+    http_server = make_server('127.0.0.1', options.port, server.app, threaded=True)
+    threading.Thread(target=http_server.serve_forever, name='load-test-http', daemon=True).start()
+
+    def workers_rss():
+        if not options.production:
+            return 0.0
+        return sum(process_rss_mb(worker['pid']) for worker in server.inference_backend.status() if worker['pid'])
+
+    # RSS del proceso web (y de los procesos de inferencia en --production), muestreado durante la prueba
+    rss = {'start': current_rss_mb(), 'workers_start': workers_rss()}
+    rss['peak'], rss['workers_peak'] = rss['start'], rss['workers_start']
+    done = threading.Event()
+
+    def sample_rss():
+        while not done.wait(0.2):
+            rss['peak'] = max(rss['peak'], current_rss_mb())
+            rss['workers_peak'] = max(rss['workers_peak'], workers_rss())
+
+    threading.Thread(target=sample_rss, daemon=True).start()
+    results.put(('ready', os.getpid()))
+
+    control.get()
+    done.set()
+    rss['end'], rss['workers_end'] = current_rss_mb(), workers_rss()
+    started_at = {task_id: task.get('started_at') for task_id, task in server.tasks.items()}
+    results.put(('report', {'started_at': started_at, 'tasks': len(server.tasks), 'rss': rss}))
+    http_server.shutdown()
+    if options.production:
+        server.inference_backend.stop()
+
+
+# --- Cliente ---
+
+def encode_multipart(fields, files):
+    """Cuerpo multipart/form-data: fields {nombre: valor}, files [(campo, nombre_archivo, bytes)]"""
+    boundary = uuid.uuid4().hex
+    body = io.BytesIO()
+    for name, value in fields.items():
+        body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode('utf-8'))
+    for field, filename, data in files:
+        body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+                   f'Content-Type: audio/wav\r\n\r\n'.encode('utf-8'))
+        body.write(data)
+        body.write(b'\r\n')
+    body.write(f'--{boundary}--\r\n'.encode('utf-8'))
+    return body.getvalue(), f'multipart/form-data; boundary={boundary}'
+
+
+class LoadClient:
+    """Cliente HTTP que anota la latencia y el código de cada petición por endpoint"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.lock = threading.Lock()
+        self.latencies = {}  # endpoint -> [ms]
+        self.codes = {}      # endpoint -> {código: n}
+
+    def request(self, endpoint, path, data=None, headers=None):
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers or {})
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=120) as response:
+                status, body, response_headers = response.status, response.read(), response.headers
+        except urllib.error.HTTPError as e:
+            status, body, response_headers = e.code, e.read(), e.headers
+        elapsed = (time.perf_counter() - start) * 1000
+        with self.lock:
+            self.latencies.setdefault(endpoint, []).append(elapsed)
+            codes = self.codes.setdefault(endpoint, {})
+            codes[status] = codes.get(status, 0) + 1
+        return status, body, response_headers
+
+
+def run_client(client, index, args, durations, tasks_seen):
+    """Un usuario: sube sus archivos, consulta el estado hasta el final y descarga las salidas"""
+    # Contenido distinto por archivo: si no, la deduplicación de /upload los juntaría en un solo trabajo
+    files = [
+        ('files', f'carga_{index}_{n}.wav', make_wav(durations[(index + n) % len(durations)], seed=index * args.files_per_client + n))
+        for n in range(args.files_per_client)
+    ]
+    fields = {'model': args.model, 'timestamps': 'true', 'diarization': 'true' if args.diarization else 'false'}
+    body, content_type = encode_multipart(fields, files)
+    headers = {'Content-Type': content_type, 'X-Client-Id': f'cliente-{index}'}
+
+    for attempt in range(args.retries + 1):
+        status, payload, response_headers = client.request('upload', '/upload', data=body, headers=headers)
+        if status != 429 or attempt == args.retries:
+            break
+        time.sleep(min(float(response_headers.get('Retry-After', 1)), args.max_retry_wait))
+    if status != 200:
+        return {'client': index, 'uploaded': False, 'status': status}
+    uploaded_at = time.time()
+    task_ids = json.loads(payload)['task_ids']
+
+    pending = set(task_ids)
+    finished = {}
+    while pending:
+        time.sleep(args.poll)
+        for task_id in list(pending):
+            status, payload, _ = client.request('status', f'/status/{task_id}')
+            if status != 200:
+                continue
+            data = json.loads(payload)
+            if data['status'] in ('completed', 'error'):
+                pending.discard(task_id)
+                finished[task_id] = data
+
+    for task_id, data in finished.items():
+        for name in data.get('output_files', []):
+            client.request('download', f'/download/{name}', headers={'Accept-Encoding': 'gzip'})
+        tasks_seen[task_id] = {'uploaded_at': uploaded_at, 'finished_at': time.time(), 'status': data['status']}
+    return {'client': index, 'uploaded': True, 'tasks': len(task_ids)}
+
+
+# --- Informe ---
+
+def percentiles(values):
+    if not values:
+        return 'sin datos'
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return f"p50 {p50:8.1f}  p95 {p95:8.1f}  p99 {p99:8.1f}  máx {max(values):8.1f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga HTTP con servicios de inferencia simulados")
+    parser.add_argument('--clients', type=int, default=100, help="Clientes concurrentes")
+    parser.add_argument('--files-per-client', type=int, default=1)
+    parser.add_argument('--audio-seconds', default='30,120', help="Duraciones de los audios generados (lista separada por comas)")
+    parser.add_argument('--model', default='small', help="Modelo simulado (fija el RTF)")
+    parser.add_argument('--diarization', action='store_true', help="Simular también la diarización")
+    parser.add_argument('--workers', type=int, default=1, help="Workers de inferencia simulada (hilos, o procesos con --production)")
+    parser.add_argument('--production', action='store_true', help="Inferencia en el ProcessWorkerPool del modo producción")
+    parser.add_argument('--time-scale', type=float, default=0.05, help="Factor sobre los tiempos simulados (1 = tiempo real)")
+    parser.add_argument('--load-seconds', type=float, default=5.0, help="Carga simulada del modelo (s, antes de escalar)")
+    parser.add_argument('--policy', default=None, help="Política de la cola (fifo, sjf, fair)")
+    parser.add_argument('--poll', type=float, default=0.5, help="Intervalo de consulta de /status (s)")
+    parser.add_argument('--retries', type=int, default=3, help="Reintentos tras un 429")
+    parser.add_argument('--max-retry-wait', type=float, default=10.0, help="Espera máxima por Retry-After (s)")
+    parser.add_argument('--port', type=int, default=5077)
+    parser.add_argument('--ffmpeg', action='store_true', help="Usar ffmpeg/ffprobe reales en vez del módulo 'wave'")
+    parser.add_argument('--verbose', action='store_true', help="Mostrar el log del servidor")
+    parser.add_argument('--keep', action='store_true', help="Conservar el directorio temporal al terminar")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='carga_')
+    # Servidor en su propio proceso ('spawn', como los workers de producción): los clientes
+    # de este proceso no añaden su CPU, su GIL ni su memoria a las medidas del servidor
+    ctx = multiprocessing.get_context('spawn')
+    control, results = ctx.Queue(), ctx.Queue()
+    server_process = ctx.Process(target=serve_main, args=(args, work_dir, control, results), name='load-test-server')
+    server_process.start()
+    try:
+        while True:
+            try:
+                results.get(timeout=1)
+                break
+            except queue.Empty:
+                if not server_process.is_alive():
+                    print(f"El servidor no arrancó (exit={server_process.exitcode})")
+                    return 1
+
+        durations = [float(s) for s in args.audio_seconds.split(',')]
+        client = LoadClient(f'http://127.0.0.1:{args.port}')
+        tasks_seen = {}
+
+        backend = f"{args.workers} proceso(s) de inferencia" if args.production else f"{args.workers} worker(s) en hilos"
+        print(f"Prueba de carga: {args.clients} clientes × {args.files_per_client} archivo(s) de {args.audio_seconds}s, "
+              f"{backend}, modelo {args.model}{' + diarización' if args.diarization else ''}, "
+              f"escala de tiempo {args.time_scale} (directorio {work_dir}, servidor pid {server_process.pid})")
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.clients) as pool:
+            outcomes = list(pool.map(lambda i: run_client(client, i, args, durations, tasks_seen), range(args.clients)))
+        elapsed = time.perf_counter() - start
+
+        control.put('stop')
+        _, report = results.get()
+        server_process.join(10)
+    finally:
+        if server_process.is_alive():
+            server_process.terminate()
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    # Espera en cola: de la respuesta de /upload a que un worker toma el trabajo (started_at del servidor)
+    queue_wait = []
+    turnaround = []
+    for task_id, seen in tasks_seen.items():
+        started_at = report['started_at'].get(task_id)
+        if started_at:
+            queue_wait.append(max(started_at - seen['uploaded_at'], 0.0))
+        turnaround.append(seen['finished_at'] - seen['uploaded_at'])
+    completed = sum(1 for seen in tasks_seen.values() if seen['status'] == 'completed')
+    rejected = sum(1 for outcome in outcomes if not outcome['uploaded'])
+
+    print("=" * 78)
+    print(f"LOAD TEST: {elapsed:.1f}s, {completed} trabajos completados, "
+          f"{len(tasks_seen) - completed} con error, {rejected} cliente(s) sin admitir")
+    print("=" * 78)
+    print("Latencia por endpoint (ms):")
+    for endpoint in ('upload', 'status', 'download'):
+        values = client.latencies.get(endpoint, [])
+        codes = ', '.join(f"{code}×{n}" for code, n in sorted(client.codes.get(endpoint, {}).items()))
+        print(f"  {endpoint:9s} n={len(values):6d}  {percentiles(values)}  [{codes}]")
+    print("Cola (s):")
+    print(f"  espera    n={len(queue_wait):6d}  {percentiles(queue_wait)}")
+    print(f"  total     n={len(turnaround):6d}  {percentiles(turnaround)}")
+    rss = report['rss']
+    print(f"Memoria del servidor (MB): inicio {rss['start']:.1f}, pico {rss['peak']:.1f}, fin {rss['end']:.1f} "
+          f"(crecimiento {rss['end'] - rss['start']:+.1f}, {report['tasks']} tareas retenidas en memoria)")
+    if args.production:
+        print(f"Memoria de los procesos de inferencia (MB, suma): inicio {rss['workers_start']:.1f}, "
+              f"pico {rss['workers_peak']:.1f}, fin {rss['workers_end']:.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,91 @@
+import os
+import sys
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+try:
+    import psutil
+    _process = psutil.Process()
+except ImportError:
+    psutil = None
+    _process = None
+
+SAMPLE_INTERVAL = 0.05  # Segundos entre muestras de RSS durante una etapa
+
+
+def current_rss_mb():
+    """
+    Memoria residente (RSS) actual del proceso en MB.
+    psutil si está instalado; si no, /proc (Linux) o el pico de getrusage como aproximación.
+    """
+    if _process is not None:
+        return _process.memory_info().rss / (1024 * 1024)
+
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux lo da en KB y macOS en bytes
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        return 0.0
+
+
+class MemoryMonitor:
+    """
+    Mide el pico de RSS de cada etapa del procesamiento (muestreo en un hilo)
+    para poder ajustar memory_budget_mb.
+    """
+
+    def __init__(self, budget_mb=None):
+        """
+        Args:
+            budget_mb: Presupuesto de memoria del worker (solo para avisar si se supera)
+        """
+        self.budget_mb = budget_mb
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name):
+        """Registra duración y RSS (inicio, pico y fin) de la etapa 'name'"""
+        start_rss = current_rss_mb()
+        peak = [start_rss]
+        done = threading.Event()
+
+        def sample():
+            while not done.wait(SAMPLE_INTERVAL):
+                peak[0] = max(peak[0], current_rss_mb())
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            done.set()
+            sampler.join()
+            end_rss = current_rss_mb()
+            record = {
+                'stage': name,
+                'seconds': round(time.perf_counter() - start, 2),
+                'rss_start_mb': round(start_rss, 1),
+                'rss_peak_mb': round(max(peak[0], end_rss), 1),
+                'rss_end_mb': round(end_rss, 1)
+            }
+            self.stages.append(record)
+            logger.info(f"MEMORY {name}: pico {record['rss_peak_mb']} MB ({record['seconds']}s)")
+            if self.budget_mb and record['rss_peak_mb'] > self.budget_mb:
+                logger.warning(f"MEMORY {name}: pico {record['rss_peak_mb']} MB supera el presupuesto de {self.budget_mb} MB")
+
+    def peak_mb(self):
+        return max((s['rss_peak_mb'] for s in self.stages), default=0.0)
@@ -0,0 +1,144 @@
+import os
+import shutil
+import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from config import config_manager
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+
+class PublishCancelled(Exception):
+    """La salida ya no debe publicarse (p. ej. el nodo perdió la concesión del trabajo)"""
+
+# umask del proceso (solo se puede leer cambiándola; se hace una vez al importar)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _temp_path(path):
+    """Archivo temporal oculto en el mismo directorio (os.replace debe ser en el mismo disco)"""
+    directory, name = os.path.split(path)
+    fd, temp_path = tempfile.mkstemp(prefix=f'.{name}.', suffix='.tmp', dir=directory or '.')
+    try:
+        # mkstemp crea el archivo con 0600 y os.replace conserva el modo: se deja el de
+        # un archivo creado con open() (0666 menos la umask) o el del que se sustituye
+        try:
+            mode = os.stat(path).st_mode & 0o777
+        except OSError:
+            mode = 0o666 & ~_UMASK
+        if hasattr(os, 'fchmod'):
+            os.fchmod(fd, mode)
+        else:
+            os.chmod(temp_path, mode)
+    finally:
+        os.close(fd)
+    return temp_path
+
+
+def _publish(temp_path, path):
+    """Renombra el temporal al nombre final de forma atómica (o lo borra si falla)"""
+    try:
+        os.replace(temp_path, path)
+    except OSError:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write(path, text):
+    """
+    Escribe un archivo de texto de forma atómica: quien lo descargue verá
+    la versión anterior completa o la nueva completa, nunca una a medias.
+    """
+    temp_path = _temp_path(path)
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+    except Exception:
+        os.remove(temp_path)
+        raise
+    _publish(temp_path, path)
+    return path
+
+
+def atomic_save(path, save):
+    """
+    Publica de forma atómica un archivo que escribe otra función: save(ruta_temporal)
+    (p. ej. pstats.Stats.dump_stats, que solo acepta una ruta)
+    """
+    temp_path = _temp_path(path)
+    try:
+        save(temp_path)
+    except Exception:
+        os.remove(temp_path)
+        raise
+    _publish(temp_path, path)
+    return path
+
+
+def atomic_copy(source_path, path):
+    """Copia un archivo por bloques y publica la copia de forma atómica"""
+    temp_path = _temp_path(path)
+    try:
+        with open(temp_path, 'wb') as out, open(source_path, 'rb') as source:
+            shutil.copyfileobj(source, out, CHUNK_SIZE)
+            out.flush()
+            os.fsync(out.fileno())
+    except Exception:
+        os.remove(temp_path)
+        raise
+    _publish(temp_path, path)
+    return path
+
+
+def concatenate_parts(part_paths, path):
+    """
+    Construye el consolidado copiando por bloques los archivos de cada parte
+    (sin cargar su texto en memoria) y lo publica de forma atómica.
+    """
+    temp_path = _temp_path(path)
+    try:
+        with open(temp_path, 'wb') as out:
+            for i, part_path in enumerate(part_paths):
+                if i > 0:
+                    out.write("\n\n".encode('utf-8'))  # Separador entre segmentos
+                out.write(f"--- Parte {i+1} ---\n\n".encode('utf-8'))
+                with open(part_path, 'rb') as part:
+                    shutil.copyfileobj(part, out, CHUNK_SIZE)
+            out.flush()
+            os.fsync(out.fileno())
+    except Exception:
+        os.remove(temp_path)
+        raise
+    _publish(temp_path, path)
+    return path
+
+
+class OutputWriter:
+    """
+    Etapa de escritura de salidas fuera del hilo de inferencia: mientras se
+    escribe e indexa una parte, Whisper ya está transcribiendo la siguiente.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or int(config_manager.get('output_writer_threads', 2))
+        self._executor = None
+
+    def submit(self, fn, *args, **kwargs):
+        """Encola una escritura y devuelve su Future"""
+        if self._executor is None:
+            # Los hilos se crean con la primera escritura, no al importar
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='output-writer')
+        return self._executor.submit(fn, *args, **kwargs)
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
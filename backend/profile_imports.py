@@ -0,0 +1,86 @@
+"""
+Perfil del tiempo de importación del backend (objetivo de arranque rápido).
+
+Importa app.py en un proceso limpio con `python -X importtime` y muestra
+los módulos más lentos. Sale con código 1 si se supera el objetivo.
+
+Uso:
+    python profile_imports.py [--target-ms 1000] [--top 15]
+"""
+import os
+import sys
+import argparse
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Módulos de ML que NO deben cargarse al importar app.py
+HEAVY_MODULES = ('whisper', 'torch', 'torchaudio', 'pyannote')
+
+
+def profile_import(module='app'):
+    """
+    Importa el módulo en un subproceso y devuelve (ms_totales, filas_importtime, módulos_pesados)
+    """
+    code = (
+        "import sys, time\n"
+        "t0 = time.perf_counter()\n"
+        f"import {module}\n"
+        "elapsed = (time.perf_counter() - t0) * 1000\n"
+        f"heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+        "print(f'{elapsed:.1f}|' + ','.join(heavy))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Error importando {module}:\n{result.stderr[-2000:]}")
+
+    last_line = result.stdout.strip().splitlines()[-1]
+    elapsed_ms, heavy = last_line.split('|')
+
+    rows = []
+    for line in result.stderr.splitlines():
+        # Formato: "import time: self [us] | cumulative | imported package"
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3:
+            continue
+        try:
+            rows.append((int(parts[1].strip()), int(parts[0].strip()), parts[2].rstrip()))
+        except ValueError:
+            continue
+
+    return float(elapsed_ms), rows, [m for m in heavy.split(',') if m]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perfil del tiempo de importación de app.py")
+    parser.add_argument('--module', default='app', help="Módulo a importar (por defecto: app)")
+    parser.add_argument('--target-ms', type=float, default=1000, help="Objetivo máximo en ms")
+    parser.add_argument('--top', type=int, default=15, help="Número de módulos a mostrar")
+    args = parser.parse_args()
+
+    elapsed_ms, rows, heavy = profile_import(args.module)
+
+    print("=" * 70)
+    print(f"IMPORT PROFILE: {args.module}")
+    print("=" * 70)
+    print(f"{'acumulado (ms)':>15} {'propio (ms)':>12}  módulo")
+    for cumulative, own, name in sorted(rows, reverse=True)[:args.top]:
+        print(f"{cumulative / 1000:>15.1f} {own / 1000:>12.1f}  {name}")
+    print("-" * 70)
+    print(f"Tiempo total de importación: {elapsed_ms:.1f} ms (objetivo: {args.target_ms:.0f} ms)")
+
+    ok = elapsed_ms <= args.target_ms
+    if heavy:
+        print(f"[FALLO] Módulos pesados importados al arrancar: {', '.join(heavy)}")
+        ok = False
+    print("[OK] Objetivo cumplido" if ok else "[FALLO] Objetivo no cumplido")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,302 @@
+import os
+import json
+import time
+import logging
+import threading
+from config import config_manager
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RTF_STATS_FILE = os.path.join(BASE_DIR, 'rtf_stats.json')
+logger = logging.getLogger(__name__)
+
+# Real-time factor inicial por modelo en CPU (segundos de proceso por segundo de audio).
+# Se sustituye por la media móvil de lo medido en cuanto hay trabajos completados.
+DEFAULT_RTF = {
+    'tiny': 0.1,
+    'base': 0.15,
+    'small': 0.35,
+    'medium': 0.9,
+    'large': 1.8
+}
+DIARIZATION_RTF = 0.3     # Coste adicional de la diarización (CPU)
+JOB_OVERHEAD_SECONDS = 3  # ffprobe, división, escritura...
+EWMA_ALPHA = 0.3
+MIN_SERVED_SECONDS = 1.0  # Por debajo, el servicio acumulado de un cliente (fair) se olvida
+
+POLICIES = ('fifo', 'sjf', 'fair')
+
+
+class RuntimeEstimator:
+    """
+    Predice la duración de cada trabajo a partir de la duración del audio (ffprobe)
+    y del real-time factor medido por modelo y por uso de diarización.
+    """
+
+    def __init__(self, path=RTF_STATS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stats = {}
+        self.load()
+
+    def load(self):
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    self._stats = json.load(f)
+            except Exception as e:
+                logger.error(f"Error cargando estadísticas RTF: {e}")
+                self._stats = {}
+
+    def save(self):
+        try:
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w') as f:
+                json.dump(self._stats, f, indent=4)
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            logger.error(f"Error guardando estadísticas RTF: {e}")
+
+    @staticmethod
+    def _key(model, diarization):
+        return f"{model}|{'diar' if diarization else 'plain'}"
+
+    def rtf(self, model, diarization):
+        """Real-time factor actual (medido o por defecto)"""
+        stats = self._stats.get(self._key(model, diarization))
+        if stats:
+            return stats['rtf']
+        base = DEFAULT_RTF.get(model, DEFAULT_RTF['small'])
+        return base + (DIARIZATION_RTF if diarization else 0.0)
+
+    def predict(self, job):
+        """
+        Segundos estimados de proceso de un trabajo
+
+        Args:
+            job: dict con model, diarization y duration (segundos de audio, puede ser None)
+        """
+        duration = job.get('duration')
+        if not duration:
+            return None
+        return JOB_OVERHEAD_SECONDS + duration * self.rtf(job['model'], job['diarization'])
+
+    def record(self, model, diarization, duration, elapsed):
+        """Actualiza la media móvil del RTF con un trabajo completado"""
+        if not duration or duration <= 0 or elapsed is None:
+            return
+        observed = max(elapsed - JOB_OVERHEAD_SECONDS, 0.0) / duration
+        key = self._key(model, diarization)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats:
+                stats['rtf'] = (1 - EWMA_ALPHA) * stats['rtf'] + EWMA_ALPHA * observed
+                stats['samples'] += 1
+            else:
+                self._stats[key] = {'rtf': observed, 'samples': 1}
+            self.save()
+        logger.info(f"RTF {key}: observado {observed:.3f}, media {self._stats[key]['rtf']:.3f}")
+
+    def snapshot(self):
+        with self._lock:
+            return {key: dict(value) for key, value in self._stats.items()}
+
+
+class JobScheduler:
+    """
+    Decide qué trabajo pendiente se procesa a continuación.
+
+    Políticas:
+        fifo: orden de llegada
+        sjf:  el trabajo más corto primero (con envejecimiento para no dejar morir de hambre a los largos)
+        fair: reparto justo entre clientes (el que menos tiempo de proceso ha consumido va primero).
+              El servicio acumulado decae a la mitad cada 'fair_half_life_seconds', y los
+              clientes inactivos se olvidan cuando su servicio ya es despreciable
+    """
+
+    def __init__(self, estimator, policy=None):
+        self.estimator = estimator
+        self.policy = policy or config_manager.get('scheduling_policy', 'fifo')
+        if self.policy not in POLICIES:
+            logger.warning(f"Política de planificación desconocida '{self.policy}', usando fifo")
+            self.policy = 'fifo'
+        # Segundos de espera que compensan un segundo de trabajo más largo (sjf)
+        self.aging = float(config_manager.get('sjf_aging', 0.5))
+        self.half_life = float(config_manager.get('fair_half_life_seconds', 3600))
+        # Cliente -> (segundos de proceso estimados ya servidos, instante de la anotación) (fair).
+        # on_dispatch lo cambia desde los workers y select/order lo leen desde las peticiones
+        self._served = {}
+        self._lock = threading.Lock()
+
+    def _cost(self, job):
+        predicted = self.estimator.predict(job)
+        return predicted if predicted is not None else JOB_OVERHEAD_SECONDS
+
+    def _decayed(self, seconds, elapsed):
+        if self.half_life <= 0:
+            return seconds
+        return seconds * 0.5 ** (max(elapsed, 0.0) / self.half_life)
+
+    def served(self, now=None):
+        """
+        Servicio acumulado por cliente en 'now' (con decaimiento); retira de paso
+        los clientes cuyo servicio ya es despreciable
+
+        Returns:
+            dict: {cliente: segundos}
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            current = {}
+            for client, (seconds, at) in list(self._served.items()):
+                value = self._decayed(seconds, now - at)
+                if value < MIN_SERVED_SECONDS:
+                    del self._served[client]
+                else:
+                    current[client] = value
+            return current
+
+    def select(self, pending, now=None, served=None):
+        """
+        Índice del siguiente trabajo a procesar
+
+        Args:
+            pending: Lista de trabajos pendientes (en orden de llegada)
+            now: Instante de referencia (para simulaciones de ETA)
+            served: Contabilidad por cliente a usar (para simulaciones de ETA)
+        """
+        if not pending or self.policy == 'fifo':
+            return 0
+
+        now = time.time() if now is None else now
+        if self.policy == 'sjf':
+            def score(item):
+                idx, job = item
+                waited = now - job.get('enqueued_at', now)
+                return (self._cost(job) - self.aging * waited, idx)
+            return min(enumerate(pending), key=score)[0]
+
+        # fair: cliente con menos servicio acumulado; dentro del cliente, orden de llegada
+        served = self.served(now) if served is None else served
+        return min(enumerate(pending), key=lambda item: (served.get(item[1].get('client'), 0.0), item[0]))[0]
+
+    def on_dispatch(self, job):
+        """Contabiliza el trabajo despachado (reparto justo)"""
+        client = job.get('client')
+        cost = self._cost(job)
+        now = time.time()
+        with self._lock:
+            seconds, at = self._served.get(client, (0.0, now))
+            self._served[client] = (self._decayed(seconds, now - at) + cost, now)
+
+    def order(self, pending, now=None):
+        """Orden en que se despacharían los trabajos pendientes (simulación, sin efectos)"""
+        remaining = list(pending)
+        served = self.served(now)
+        ordered = []
+        while remaining:
+            job = remaining.pop(self.select(remaining, now=now, served=served))
+            served[job.get('client')] = served.get(job.get('client'), 0.0) + self._cost(job)
+            ordered.append(job)
+        return ordered
+
+    def estimate_etas(self, pending, running, num_workers, now=None):
+        """
+        Estima cuándo terminará cada trabajo
+
+        Args:
+            pending: Trabajos en cola
+            running: Lista de (job, started_at) en proceso
+            num_workers: Trabajos que se procesan a la vez
+
+        Returns:
+            dict: {task_id: {'eta_seconds', 'predicted_seconds', 'queue_position'}}
+        """
+        now = time.time() if now is None else now
+        etas = {}
+
+        # Cuándo queda libre cada worker
+        free_at = []
+        for job, started_at in running:
+            predicted = self._cost(job)
+            remaining = max(predicted - (now - started_at), 1.0)
+            free_at.append(remaining)
+            etas[job['task_id']] = {'eta_seconds': remaining, 'predicted_seconds': predicted, 'queue_position': 0}
+        # Un lote ocupa un solo worker: quedarse con los que terminan más tarde
+        num_workers = max(num_workers, 1)
+        free_at = sorted(free_at)[-num_workers:] if free_at else []
+        while len(free_at) < num_workers:
+            free_at.append(0.0)
+
+        for position, job in enumerate(self.order(pending, now=now), start=1):
+            predicted = self._cost(job)
+            free_at.sort()
+            start = free_at[0]
+            free_at[0] = start + predicted
+            etas[job['task_id']] = {
+                'eta_seconds': start + predicted,
+                'predicted_seconds': predicted,
+                'queue_position': position
+            }
+        return etas
+
+
+class EtaCache:
+    """
+    ETAs de la cola calculadas una sola vez por cambio (trabajo encolado, despachado,
+    iniciado o terminado) en lugar de en cada consulta de /status: order() simula
+    toda la cola y con sjf o fair cuesta O(n²).
+    Se guarda el instante absoluto de fin de cada trabajo, de modo que la ETA leída
+    sigue descontando el tiempo transcurrido entre recálculos.
+    """
+
+    def __init__(self, compute):
+        """
+        Args:
+            compute: Función compute(now) que devuelve {task_id: eta} como JobScheduler.estimate_etas
+        """
+        self._compute = compute
+        self._lock = threading.Lock()
+        self._version = 0
+        self._cached_version = -1
+        self._etas = {}
+
+    def invalidate(self):
+        """Marca las ETAs como obsoletas (se recalculan en la siguiente lectura)"""
+        with self._lock:
+            self._version += 1
+
+    def _refresh(self):
+        with self._lock:
+            if self._cached_version == self._version:
+                return self._etas
+            version = self._version
+        # Fuera del lock: compute lee la cola y las tareas, que pueden invalidar a su vez
+        now = time.time()
+        etas = {
+            task_id: dict(eta, finish_at=now + eta['eta_seconds'])
+            for task_id, eta in self._compute(now).items()
+        }
+        with self._lock:
+            # Si hubo cambios durante el cálculo, la siguiente lectura recalcula
+            if version >= self._cached_version:
+                self._etas = etas
+                self._cached_version = version
+            return self._etas
+
+    @staticmethod
+    def _view(eta, now):
+        return {
+            'eta_seconds': max(eta['finish_at'] - now, 1.0),
+            'predicted_seconds': eta['predicted_seconds'],
+            'queue_position': eta['queue_position']
+        }
+
+    def get(self, task_id):
+        """ETA de una tarea (o None si no está en cola ni en proceso)"""
+        eta = self._refresh().get(task_id)
+        return self._view(eta, time.time()) if eta else None
+
+    def all(self):
+        """ETAs de todas las tareas pendientes y en proceso"""
+        now = time.time()
+        return {task_id: self._view(eta, now) for task_id, eta in self._refresh().items()}
@@ -0,0 +1,344 @@
+import os
+import re
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Líneas generadas por AudioProcessor:
+#   [HH:MM:SS] Texto
+#   [HH:MM:SS] [SPEAKER_01]: Texto
+LINE_PATTERN = re.compile(r'^\[(\d{2}):(\d{2}):(\d{2})\]\s*(?:\[([^\]]+)\]:\s*)?(.*)$')
+
+# Nombre de las partes: <stem>_Transcrito_parteN.txt
+PART_PATTERN = re.compile(r'_Transcrito_parte(\d+)\.txt$')
+
+# Un documento por archivo: la misma transcripción puede existir en varios directorios
+# (árbol espejo de bulk_transcribe.py, otros volúmenes)
+DOCUMENTS_TABLE = """
+CREATE TABLE IF NOT EXISTS {name} (
+    id INTEGER PRIMARY KEY,
+    filename TEXT NOT NULL,
+    mtime REAL NOT NULL,
+    part_offset REAL NOT NULL DEFAULT 0,
+    directory TEXT,
+    first_rowid INTEGER,
+    row_count INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (directory, filename)
+);
+"""
+
+SCHEMA = DOCUMENTS_TABLE.format(name='documents') + """
+CREATE VIRTUAL TABLE IF NOT EXISTS lines USING fts5(
+    text,
+    speaker UNINDEXED,
+    document_id UNINDEXED,
+    line_no UNINDEXED,
+    audio_offset UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+# Columnas añadidas a 'documents' después de la primera versión del índice
+MIGRATIONS = {
+    'directory': 'ALTER TABLE documents ADD COLUMN directory TEXT',
+    'first_rowid': 'ALTER TABLE documents ADD COLUMN first_rowid INTEGER',
+    'row_count': 'ALTER TABLE documents ADD COLUMN row_count INTEGER NOT NULL DEFAULT 0'
+}
+
+
+def parse_line(line):
+    """
+    Separa una línea de transcripción en (offset_segundos, hablante, texto)
+
+    Returns:
+        tuple: (float o None, str o None, str)
+    """
+    match = LINE_PATTERN.match(line)
+    if not match:
+        return None, None, line.strip()
+    hours, minutes, seconds, speaker, text = match.groups()
+    offset = int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+    return float(offset), speaker, text.strip()
+
+
+def format_offset(seconds_float):
+    """Convierte segundos a HH:MM:SS"""
+    hours = int(seconds_float // 3600)
+    minutes = int((seconds_float % 3600) // 60)
+    seconds = int(seconds_float % 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+def build_match_query(query):
+    """
+    Convierte el texto del usuario en una consulta FTS5 segura:
+    cada palabra entre comillas (AND implícito) y la última con prefijo.
+    """
+    terms = [t.replace('"', '""') for t in query.split() if t.strip()]
+    if not terms:
+        return None
+    quoted = [f'"{t}"' for t in terms]
+    quoted[-1] = quoted[-1] + '*'
+    return ' '.join(quoted)
+
+
+class SearchIndex:
+    """Índice de texto completo (SQLite FTS5) sobre las transcripciones generadas"""
+
+    def __init__(self, db_path, root=None):
+        """
+        Args:
+            db_path: Ruta al archivo SQLite del índice
+            root: (Opcional) Directorio respecto al que se dan las rutas de los resultados
+                (por defecto, el del archivo del índice)
+        """
+        self.db_path = db_path
+        self.root = os.path.abspath(root or os.path.dirname(os.path.abspath(db_path)))
+        self.enabled = True
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        """Abre la conexión (perezosa) y crea o migra el esquema si hace falta"""
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            try:
+                conn.executescript(SCHEMA)
+                self._migrate(conn)
+            except sqlite3.OperationalError as e:
+                conn.close()
+                self.enabled = False
+                logger.error(f"SEARCH: SQLite sin soporte FTS5, índice desactivado ({e})")
+                raise
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _migrate(conn):
+        """
+        Actualiza un índice de una versión anterior: añade las columnas nuevas y, si
+        'documents' era única por nombre de archivo, la reconstruye con la clave
+        (directory, filename). BEGIN IMMEDIATE: los workers abren el mismo índice a la vez.
+        """
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(documents)')}
+            for column, statement in MIGRATIONS.items():
+                if column not in columns:
+                    conn.execute(statement)
+            table_sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'documents'").fetchone()[0]
+            if 'UNIQUE (directory, filename)' not in table_sql:
+                conn.execute(DOCUMENTS_TABLE.format(name='documents_new'))
+                conn.execute('INSERT INTO documents_new (id, filename, mtime, part_offset, directory, first_rowid, row_count) '
+                             'SELECT id, filename, mtime, part_offset, directory, first_rowid, row_count FROM documents')
+                conn.execute('DROP TABLE documents')
+                conn.execute('ALTER TABLE documents_new RENAME TO documents')
+                logger.info("SEARCH: índice migrado a documentos por (directorio, archivo)")
+
+    @staticmethod
+    def _delete_lines(conn, document_id, first_rowid, row_count):
+        """
+        Borra las líneas de un documento por su rango de rowid (búsqueda por clave).
+        Los documentos de índices antiguos, sin rango, se borran por document_id
+        (recorre la tabla: document_id es UNINDEXED).
+        """
+        if first_rowid is not None:
+            if row_count:
+                conn.execute('DELETE FROM lines WHERE rowid BETWEEN ? AND ?',
+                             (first_rowid, first_rowid + row_count - 1))
+        else:
+            conn.execute('DELETE FROM lines WHERE document_id = ?', (document_id,))
+
+    @staticmethod
+    def _next_rowid(conn):
+        # ORDER BY rowid DESC LIMIT 1 lo resuelve FTS5 sin recorrer la tabla
+        last = conn.execute('SELECT rowid FROM lines ORDER BY rowid DESC LIMIT 1').fetchone()
+        return (last[0] if last else 0) + 1
+
+    def index_file(self, path, part_offset=0.0):
+        """
+        Indexa (o reindexa) un archivo de transcripción
+
+        Args:
+            path: Ruta al archivo .txt
+            part_offset: Segundos del audio original donde empieza esta parte
+        """
+        if not self.enabled:
+            return 0
+
+        filename = os.path.basename(path)
+        directory = os.path.dirname(os.path.abspath(path))
+        mtime = os.path.getmtime(path)
+
+        rows = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, start=1):
+                offset, speaker, text = parse_line(line.rstrip('\n'))
+                if not text:
+                    continue
+                audio_offset = part_offset + offset if offset is not None else None
+                rows.append((text, speaker, line_no, audio_offset))
+
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                # Cada worker de producción abre su propio SearchIndex sobre el mismo archivo:
+                # el bloqueo de escritura se toma antes de leer el documento y el último rowid
+                conn.execute('BEGIN IMMEDIATE')
+                # Los documentos de índices antiguos, sin directorio, se adoptan
+                cur = conn.execute('SELECT id, first_rowid, row_count FROM documents '
+                                   'WHERE filename = ? AND (directory = ? OR directory IS NULL) '
+                                   'ORDER BY directory IS NULL LIMIT 1', (filename, directory))
+                existing = cur.fetchone()
+                if existing:
+                    document_id = existing[0]
+                    self._delete_lines(conn, *existing)
+                else:
+                    cur = conn.execute('INSERT INTO documents (filename, mtime, part_offset, directory) VALUES (?, ?, ?, ?)',
+                                       (filename, mtime, part_offset, directory))
+                    document_id = cur.lastrowid
+
+                # Las líneas de cada documento ocupan un rango contiguo de rowid (explícito,
+                # dentro de la transacción), de modo que reindexar o podar borra por rango
+                first_rowid = self._next_rowid(conn)
+                conn.executemany(
+                    'INSERT INTO lines (rowid, text, speaker, document_id, line_no, audio_offset) VALUES (?, ?, ?, ?, ?, ?)',
+                    [(first_rowid + i, text, speaker, document_id, line_no, audio_offset)
+                     for i, (text, speaker, line_no, audio_offset) in enumerate(rows)]
+                )
+                conn.execute('UPDATE documents SET mtime = ?, part_offset = ?, directory = ?, first_rowid = ?, row_count = ? '
+                             'WHERE id = ?', (mtime, part_offset, directory, first_rowid, len(rows), document_id))
+
+        logger.info(f"SEARCH INDEXED: {filename} ({len(rows)} líneas)")
+        return len(rows)
+
+    def sync_directory(self, directory, part_duration):
+        """
+        Indexa los archivos del directorio que no estén en el índice o hayan cambiado,
+        y retira los documentos de ese directorio cuyo archivo ya no existe.
+        Los consolidados (_completo) se omiten porque duplican las partes,
+        y las transcripciones parciales (_parcial) porque aún se están escribiendo.
+
+        Args:
+            directory: Directorio de transcripciones
+            part_duration: Duración (segundos) de cada parte, para calcular offsets
+        """
+        if not self.enabled or not os.path.isdir(directory):
+            return 0
+
+        directory = os.path.abspath(directory)
+        with self._lock:
+            # Los de este directorio ganan a los antiguos sin directorio (van después)
+            known = dict(self._connection().execute(
+                'SELECT filename, mtime FROM documents WHERE directory = ? OR directory IS NULL '
+                'ORDER BY directory IS NOT NULL', (directory,)).fetchall())
+
+        self._prune(directory)
+
+        indexed = 0
+        for entry in os.scandir(directory):
+            name = entry.name
+            if not self._indexable(entry):
+                continue
+            if known.get(name) == entry.stat().st_mtime:
+                continue
+
+            part_match = PART_PATTERN.search(name)
+            part_offset = (int(part_match.group(1)) - 1) * part_duration if part_match else 0.0
+            try:
+                self.index_file(entry.path, part_offset=part_offset)
+                indexed += 1
+            except (OSError, UnicodeDecodeError, sqlite3.Error) as e:
+                logger.error(f"SEARCH: No se pudo indexar {name}: {e}")
+
+        logger.info(f"SEARCH SYNC: {indexed} archivo(s) nuevos o modificados")
+        return indexed
+
+    @staticmethod
+    def _indexable(entry):
+        name = entry.name
+        if not entry.is_file() or '_Transcrito' not in name or not name.endswith('.txt'):
+            return False
+        return not (name.endswith('_completo.txt') or name.endswith('_parcial.txt'))
+
+    def _prune(self, directory):
+        """
+        Retira del índice los documentos del directorio cuyo archivo ya no existe
+        (los de índices antiguos, sin directorio registrado, se atribuyen a este)
+        """
+        directory = os.path.abspath(directory)
+        present = {entry.name for entry in os.scandir(directory) if self._indexable(entry)}
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                rows = conn.execute('SELECT id, filename, first_rowid, row_count FROM documents '
+                                    'WHERE directory = ? OR directory IS NULL', (directory,)).fetchall()
+                stale = [row for row in rows if row[1] not in present]
+                for document_id, _, first_rowid, row_count in stale:
+                    self._delete_lines(conn, document_id, first_rowid, row_count)
+                    conn.execute('DELETE FROM documents WHERE id = ?', (document_id,))
+        if not stale:
+            return 0
+        logger.info(f"SEARCH PRUNE: {len(stale)} documento(s) sin archivo")
+        return len(stale)
+
+    def search(self, query, limit=50, speaker=None):
+        """
+        Busca en el índice
+
+        Args:
+            query: Texto a buscar
+            limit: Número máximo de resultados
+            speaker: (Opcional) Filtrar por hablante
+
+        Returns:
+            list: Resultados ordenados por relevancia ('path' distingue archivos
+                con el mismo nombre en distintos directorios)
+        """
+        match_query = build_match_query(query)
+        if not match_query or not self.enabled:
+            return []
+
+        sql = (
+            "SELECT d.filename, d.directory, l.line_no, l.audio_offset, l.speaker, "
+            "snippet(lines, 0, '[', ']', '...', 16) "
+            "FROM lines l JOIN documents d ON d.id = l.document_id "
+            "WHERE lines MATCH ?"
+        )
+        params = [match_query]
+        if speaker:
+            sql += " AND l.speaker = ?"
+            params.append(speaker)
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(int(limit))
+
+        with self._lock:
+            rows = self._connection().execute(sql, params).fetchall()
+
+        results = []
+        for filename, directory, line_no, audio_offset, spk, snippet in rows:
+            results.append({
+                'filename': filename,
+                'path': self._relative_path(directory, filename),
+                'line': line_no,
+                'offset': audio_offset,
+                'timestamp': format_offset(audio_offset) if audio_offset is not None else None,
+                'speaker': spk,
+                'snippet': snippet
+            })
+        return results
+
+    def _relative_path(self, directory, filename):
+        """Ruta del documento respecto a root (el nombre solo, en índices antiguos sin directorio)"""
+        if not directory:
+            return filename
+        try:
+            return os.path.relpath(os.path.join(directory, filename), self.root)
+        except ValueError:
+            # Otra unidad en Windows: no hay ruta relativa
+            return os.path.join(directory, filename)
@@ -0,0 +1,214 @@
+import os
+import logging
+import threading
+import numpy as np
+from config import config_manager
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SPEAKERS_FILE = os.path.join(BASE_DIR, 'speakers.npz')
+logger = logging.getLogger(__name__)
+
+
+def _normalize(vectors):
+    """Normaliza filas a norma 1 (similitud coseno = producto escalar)"""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class SpeakerStore:
+    """
+    Almacén local de embeddings de hablantes conocidos.
+    Búsqueda exacta por vecino más cercano (coseno) con NumPy: a nuestra
+    escala (decenas de personas) es más rápido que cualquier índice.
+    """
+
+    def __init__(self, path=SPEAKERS_FILE):
+        """
+        Args:
+            path: Ruta al archivo .npz donde se guardan los embeddings
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._names = []
+        self._embeddings = None
+        self._mtime = None
+        self.load()
+
+    def _file_mtime(self):
+        try:
+            return os.path.getmtime(self.path)
+        except OSError:
+            return None
+
+    def load(self):
+        """Carga los hablantes inscritos desde disco"""
+        self._mtime = self._file_mtime()
+        if self._mtime is None:
+            self._names = []
+            self._embeddings = None
+            return
+        try:
+            data = np.load(self.path, allow_pickle=False)
+            self._names = [str(n) for n in data['names']]
+            self._embeddings = data['embeddings'].astype(np.float32)
+            logger.info(f"Hablantes conocidos cargados: {len(self.names())}")
+        except Exception as e:
+            logger.error(f"Error cargando hablantes conocidos: {e}")
+            self._names = []
+            self._embeddings = None
+
+    def refresh(self):
+        """
+        Recarga los hablantes si el archivo cambió desde la última lectura.
+        Los procesos de inferencia no ven las inscripciones hechas desde la web
+        (otro proceso) hasta que releen el archivo.
+        """
+        if self._file_mtime() == self._mtime:
+            return
+        with self._lock:
+            self.load()
+
+    def save(self):
+        """Guarda los hablantes inscritos en disco"""
+        try:
+            if self._embeddings is None:
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+                self._mtime = None
+                return
+            # Escribir a temporal y renombrar para no dejar el archivo a medias
+            temp_path = self.path + '.tmp.npz'
+            np.savez(temp_path, names=np.array(self._names), embeddings=self._embeddings)
+            os.replace(temp_path, self.path)
+            self._mtime = self._file_mtime()
+        except Exception as e:
+            logger.error(f"Error guardando hablantes conocidos: {e}")
+
+    def names(self):
+        """Lista de nombres inscritos (sin repetir)"""
+        return sorted(set(self._names))
+
+    def count(self, name):
+        """Número de muestras inscritas para un nombre"""
+        return self._names.count(name)
+
+    def enroll(self, name, embedding):
+        """
+        Inscribe una muestra de voz para un hablante (se admiten varias por nombre)
+
+        Args:
+            name: Nombre del hablante
+            embedding: Vector de embedding (lista o array)
+        """
+        vector = _normalize(embedding)
+        if not np.all(np.isfinite(vector)):
+            raise ValueError("Embedding inválido (contiene NaN)")
+
+        with self._lock:
+            if self._embeddings is None:
+                self._embeddings = vector
+            else:
+                if vector.shape[1] != self._embeddings.shape[1]:
+                    raise ValueError(f"Dimensión de embedding incompatible: {vector.shape[1]} != {self._embeddings.shape[1]}")
+                self._embeddings = np.vstack([self._embeddings, vector])
+            self._names.append(name)
+            self.save()
+        logger.info(f"Hablante inscrito: {name} ({self.count(name)} muestra(s))")
+
+    def remove(self, name):
+        """Elimina todas las muestras de un hablante"""
+        with self._lock:
+            keep = [i for i, n in enumerate(self._names) if n != name]
+            if len(keep) == len(self._names):
+                return False
+            self._names = [self._names[i] for i in keep]
+            self._embeddings = self._embeddings[keep] if keep else None
+            self.save()
+        logger.info(f"Hablante eliminado: {name}")
+        return True
+
+    def identify(self, embeddings, threshold):
+        """
+        Busca el hablante inscrito más parecido a cada embedding
+
+        Args:
+            embeddings: Array (k, d) de embeddings a identificar
+            threshold: Similitud coseno mínima para aceptar la coincidencia
+
+        Returns:
+            list: Tuplas (nombre o None, similitud) por cada embedding
+        """
+        queries = _normalize(embeddings)
+        with self._lock:
+            if self._embeddings is None or queries.shape[1] != self._embeddings.shape[1]:
+                return [(None, 0.0)] * len(queries)
+            similarities = queries @ self._embeddings.T
+            names = list(self._names)
+
+        # Los embeddings de hablantes con muy poca voz pueden venir como NaN
+        similarities = np.nan_to_num(similarities, nan=-1.0)
+        best = similarities.argmax(axis=1)
+        matches = []
+        for row, idx in enumerate(best):
+            score = float(similarities[row, idx])
+            matches.append((names[idx] if score >= threshold else None, score))
+        return matches
+
+    def map_labels(self, label_embeddings):
+        """
+        Traduce etiquetas anónimas (SPEAKER_XX) a nombres inscritos
+
+        La asignación es uno a uno: dos etiquetas del mismo archivo son personas
+        distintas y no pueden acabar con el mismo nombre. Se recorren los pares
+        (etiqueta, nombre) de mayor a menor similitud (la de un nombre es la de su
+        mejor muestra) y se acepta cada par cuyos dos extremos sigan libres, hasta
+        bajar del umbral.
+
+        Args:
+            label_embeddings: dict {etiqueta: embedding}
+
+        Returns:
+            dict: {etiqueta: nombre} solo para las etiquetas reconocidas
+        """
+        if not label_embeddings or self._embeddings is None:
+            return {}
+
+        threshold = float(config_manager.get('speaker_match_threshold', 0.6))
+        labels = list(label_embeddings.keys())
+        queries = _normalize(np.stack([label_embeddings[l] for l in labels]))
+        with self._lock:
+            if self._embeddings is None or queries.shape[1] != self._embeddings.shape[1]:
+                return {}
+            similarities = queries @ self._embeddings.T
+            sample_names = list(self._names)
+
+        # Similitud de cada etiqueta con cada nombre: la de su muestra más parecida
+        similarities = np.nan_to_num(similarities, nan=-1.0)
+        names = sorted(set(sample_names))
+        columns = np.array([names.index(n) for n in sample_names])
+        by_name = np.full((len(labels), len(names)), -1.0, dtype=np.float32)
+        for col in range(len(names)):
+            by_name[:, col] = similarities[:, columns == col].max(axis=1)
+
+        mapping = {}
+        taken = set()
+        order = np.argsort(by_name, axis=None)[::-1]
+        for row, col in zip(*np.unravel_index(order, by_name.shape)):
+            score = float(by_name[row, col])
+            if score < threshold:
+                break
+            label, name = labels[row], names[col]
+            if label in mapping or name in taken:
+                continue
+            mapping[label] = name
+            taken.add(name)
+            logger.info(f"Hablante reconocido: {label} -> {name} (similitud {score:.2f})")
+        return mapping
+
+    def __len__(self):
+        return len(self.names())
+
+# Instancia global
+speaker_store = SpeakerStore()
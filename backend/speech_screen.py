@@ -0,0 +1,126 @@
+import logging
+import numpy as np
+from config import config_manager
+from live_service import speech_frames, FRAME_SAMPLES
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+SCREEN_WINDOW_SECONDS = 30   # Ventana de Whisper para la probabilidad de "sin voz"
+BLOCK_SECONDS = 60           # El PCM se recorre por bloques (memoria acotada con el memmap)
+
+
+def voiced_mask(pcm, start, end, threshold):
+    """
+    VAD por energía sobre un tramo del PCM int16 (memmap), por bloques
+
+    Returns:
+        numpy.ndarray: bool por trama de 30 ms
+    """
+    block = BLOCK_SECONDS * SAMPLE_RATE  # Múltiplo de FRAME_SAMPLES: las tramas no se cortan
+    masks = []
+    for offset in range(start, end, block):
+        audio = np.asarray(pcm[offset:min(end, offset + block)], dtype=np.float32) / 32768.0
+        masks.append(speech_frames(audio, threshold))
+    return np.concatenate(masks) if masks else np.zeros(0, dtype=bool)
+
+
+class SpeechScreen:
+    """
+    Criba previa a la transcripción: descarta silencio, ruido o música antes de
+    gastar una pasada completa de Whisper (y la diarización) en ellos.
+
+    1. Energía: fracción de tramas de 30 ms por encima de 'screen_vad_rms'.
+       Por debajo de 'screen_min_speech_ratio' -> 'silence'.
+    2. Whisper: probabilidad de "sin voz" en ventanas de 30 s con energía, repartidas
+       por toda la parte (no las más fuertes: en una llamada con música de espera, lo
+       más fuerte es la música). Se prueban como mucho 'screen_max_batches' tandas de
+       'screen_windows' ventanas, cada tanda equiespaciada de principio a fin, y se para
+       en cuanto una tiene voz. Si todas las ventanas probadas superan
+       'screen_no_speech_prob' -> 'no_speech' (música, tono de espera, ruido).
+    """
+
+    def __init__(self, whisper_service):
+        self.whisper_service = whisper_service
+        self.enabled = bool(config_manager.get('speech_screen', True))
+        self.threshold = float(config_manager.get('screen_vad_rms', 0.01))
+        self.min_speech_ratio = float(config_manager.get('screen_min_speech_ratio', 0.01))
+        self.num_windows = int(config_manager.get('screen_windows', 3))
+        self.max_batches = int(config_manager.get('screen_max_batches', 3))
+        self.no_speech_threshold = float(config_manager.get('screen_no_speech_prob', 0.7))
+
+    @staticmethod
+    def probe_order(blocks, first, batches):
+        """
+        Bloques a probar, por tandas: hasta first × batches bloques equiespaciados
+        por toda la parte, repartidos de forma que cada tanda de 'first' también
+        cubra la parte de principio a fin
+
+        Args:
+            blocks: Índices de bloque con energía, en orden
+            first: Número de bloques por tanda
+            batches: Número máximo de tandas
+
+        Returns:
+            list: Bloques en orden de prueba (como mucho first × batches)
+        """
+        limit = max(1, first * batches)
+        spread = sorted({int(round(i)) for i in np.linspace(0, len(blocks) - 1, min(len(blocks), limit))}) if blocks else []
+        stride = max(1, int(np.ceil(len(spread) / max(1, first))))
+        return [blocks[spread[i]] for k in range(stride) for i in range(k, len(spread), stride)]
+
+    def screen(self, pcm, start, end, language=None):
+        """
+        Evalúa un tramo del PCM (muestras [start, end))
+
+        Args:
+            language: (Opcional) Idioma del trabajo para la pasada de Whisper
+
+        Returns:
+            dict: speech (bool), reason ('silence', 'no_speech' o None), speech_ratio,
+                  no_speech_probs de las ventanas probadas y voiced_windows (ventanas con energía)
+        """
+        report = {'speech': True, 'reason': None, 'speech_ratio': None, 'no_speech_probs': [], 'voiced_windows': None}
+        if not self.enabled or end <= start:
+            return report
+
+        mask = voiced_mask(pcm, start, end, self.threshold)
+        speech_ratio = float(mask.mean()) if len(mask) else 0.0
+        report['speech_ratio'] = round(speech_ratio, 4)
+        if speech_ratio < self.min_speech_ratio:
+            report.update(speech=False, reason='silence')
+            return report
+
+        if self.num_windows <= 0:
+            return report
+
+        # Ventanas de 30 s con alguna trama con energía, repartidas por toda la parte
+        frames_per_window = SCREEN_WINDOW_SECONDS * SAMPLE_RATE // FRAME_SAMPLES
+        num_blocks = max(1, int(np.ceil(len(mask) / frames_per_window)))
+        counts = np.bincount(np.flatnonzero(mask) // frames_per_window, minlength=num_blocks)
+        voiced = [int(block) for block in np.flatnonzero(counts)]
+        order = self.probe_order(voiced, self.num_windows, self.max_batches)
+        report['voiced_windows'] = len(voiced)
+
+        # Por tandas de screen_windows ventanas (memoria acotada), como mucho screen_max_batches;
+        # se para en cuanto hay voz
+        for batch_start in range(0, len(order), self.num_windows):
+            windows = []
+            for block in order[batch_start:batch_start + self.num_windows]:
+                window_start = start + block * frames_per_window * FRAME_SAMPLES
+                window_end = min(end, window_start + SCREEN_WINDOW_SECONDS * SAMPLE_RATE)
+                windows.append(np.asarray(pcm[window_start:window_end], dtype=np.float32) / 32768.0)
+
+            try:
+                probs = self.whisper_service.no_speech_probs(windows, language=language)
+            except Exception as e:
+                # Ante la duda se transcribe
+                logger.error(f"SCREEN: no se pudo evaluar la probabilidad de voz ({e})")
+                return report
+            report['no_speech_probs'].extend(round(p, 3) for p in probs)
+            if not probs or min(probs) <= self.no_speech_threshold:
+                return report
+
+        # Todas las ventanas probadas son confiadamente "sin voz"
+        report.update(speech=False, reason='no_speech')
+        return report
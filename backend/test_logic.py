@@ -55,3 +55,332 @@ except Exception as e:
     print(f"\n❌ ERROR DE EJECUCIÓN: {e}")
     import traceback
     traceback.print_exc()
+
+print("\n" + "="*50)
+print("TEST DE ALINEACIÓN POR PALABRAS (HABLANTES)")
+print("="*50)
+
+try:
+    word_result = {
+        "segments": [
+            {"start": 0.0, "end": 3.0, "text": " Hola a todos, bienvenidos", "words": [
+                {"word": " Hola", "start": 0.0, "end": 0.4},
+                {"word": " a", "start": 0.5, "end": 0.6},
+                {"word": " todos", "start": 0.7, "end": 1.1},   # Cae en SPEAKER_01 (palabra suelta)
+                {"word": ",", "start": 1.1, "end": 1.2},
+                {"word": " bienvenidos", "start": 1.3, "end": 2.0},
+            ]},
+            {"start": 3.0, "end": 5.0, "text": " Gracias", "words": [
+                {"word": " Gracias", "start": 3.2, "end": 3.8},  # Hueco de diarización (< 0.5s)
+            ]},
+        ]
+    }
+    speaker_segments = [
+        {"start": 0.0, "end": 0.8, "speaker": "SPEAKER_00"},
+        {"start": 0.8, "end": 1.0, "speaker": "SPEAKER_01"},
+        {"start": 1.0, "end": 2.2, "speaker": "SPEAKER_00"},
+        {"start": 3.6, "end": 5.0, "speaker": "SPEAKER_01"},
+    ]
+
+    formatted = processor._format_with_word_alignment(word_result, speaker_segments)
+
+    print("\n--- Resultado Generado ---")
+    print(formatted)
+    print("--------------------------")
+
+    expected = "[00:00:00] [SPEAKER_00]: Hola a todos, bienvenidos\n[00:00:03] [SPEAKER_01]: Gracias"
+    if formatted == expected:
+        print("\n✅ ÉXITO: Suavizado y tolerancia de bordes correctos.")
+    else:
+        print("\n❌ FALLO: Se esperaba:")
+        print(expected)
+
+except Exception as e:
+    print(f"\n❌ ERROR DE EJECUCIÓN: {e}")
+    import traceback
+    traceback.print_exc()
+
+print("\n" + "="*50)
+print("TEST DE IDENTIFICACIÓN UNO A UNO (HABLANTES CONOCIDOS)")
+print("="*50)
+
+try:
+    import tempfile
+    import numpy as np
+    from speaker_store import SpeakerStore
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        store = SpeakerStore(os.path.join(temp_dir, 'speakers.npz'))
+        store.enroll("Ana", [1.0, 0.0, 0.0])
+        store.enroll("Luis", [0.0, 1.0, 0.0])
+
+        # Las dos etiquetas se parecen más a Ana; SPEAKER_01 solo algo menos a Luis
+        mapping = store.map_labels({
+            "SPEAKER_00": np.array([0.95, 0.10, 0.0]),
+            "SPEAKER_01": np.array([0.80, 0.70, 0.0]),
+            "SPEAKER_02": np.array([0.90, 0.0, 0.40]),
+        })
+
+    print(f"\nAsignación: {mapping}")
+    expected = {"SPEAKER_00": "Ana", "SPEAKER_01": "Luis"}
+    if mapping == expected:
+        print("\n✅ ÉXITO: Cada hablante conocido se asigna a una sola etiqueta.")
+    else:
+        print(f"\n❌ FALLO: Se esperaba {expected}")
+
+except Exception as e:
+    print(f"\n❌ ERROR DE EJECUCIÓN: {e}")
+    import traceback
+    traceback.print_exc()
+
+print("\n" + "="*50)
+print("TEST DE SUAVIZADO DE HABLANTES (BORDES, TURNOS CORTOS Y EMPATES)")
+print("="*50)
+
+try:
+    import numpy as np
+    from audio_processor import smooth_word_speakers, majority_filter_speakers, merge_short_turns
+
+    def check(name, obtained, expected):
+        obtained = [int(c) for c in obtained]
+        if obtained == expected:
+            print(f"✅ {name}: {obtained}")
+            return True
+        print(f"❌ {name}: {obtained} (se esperaba {expected})")
+        return False
+
+    results = [
+        # Unknown al inicio del segmento hereda del siguiente; la isla interior se corrige,
+        # pero no la palabra en el borde de un segmento
+        check("smooth: Unknown inicial e isla interior",
+              smooth_word_speakers(np.array([-1, 0, 0, 1, 0, 1, 1]), np.array([0, 0, 0, 0, 0, 1, 1])),
+              [0, 0, 0, 0, 0, 1, 1]),
+        check("smooth: isla en el borde del segmento",
+              smooth_word_speakers(np.array([0, 1, 0]), np.array([0, 0, 1])),
+              [0, 1, 0]),
+        # Ventana truncada en los extremos: en el borde izquierdo solo ve 2 palabras (empate)
+        check("mayoría: ventana 3 en el borde (empate conserva)",
+              majority_filter_speakers(np.array([1, 0, 0, 0, 0]), 3),
+              [1, 0, 0, 0, 0]),
+        check("mayoría: ventana 5 en el borde",
+              majority_filter_speakers(np.array([1, 0, 0, 0, 0]), 5),
+              [0, 0, 0, 0, 0]),
+        check("mayoría: empate a tres conserva el hablante",
+              majority_filter_speakers(np.array([0, 1, 2]), 3),
+              [0, 1, 2]),
+        check("mayoría: Unknown no vota ni cambia",
+              majority_filter_speakers(np.array([0, -1, 0, 1, 0]), 3),
+              [0, -1, 0, 0, 0]),
+        check("turnos: corto al inicio",
+              merge_short_turns(np.array([1, 0, 0, 0]), np.array([0.0, 0.2, 1.0, 2.0]), np.array([0.2, 1.0, 2.0, 3.0]), 0.5),
+              [0, 0, 0, 0]),
+        check("turnos: corto al final",
+              merge_short_turns(np.array([0, 0, 0, 1]), np.array([0.0, 1.0, 2.0, 3.0]), np.array([1.0, 2.0, 3.0, 3.2]), 0.5),
+              [0, 0, 0, 0]),
+        check("turnos: corto entre dos distintos va al más largo",
+              merge_short_turns(np.array([0, 0, 1, 2]), np.array([0.0, 1.0, 2.0, 2.2]), np.array([1.0, 2.0, 2.2, 3.0]), 0.5),
+              [0, 0, 0, 2]),
+    ]
+
+    if all(results):
+        print("\n✅ ÉXITO: Suavizado, filtro de mayoría y turnos mínimos correctos.")
+    else:
+        print("\n❌ FALLO: Revisar los casos marcados.")
+
+except Exception as e:
+    print(f"\n❌ ERROR DE EJECUCIÓN: {e}")
+    import traceback
+    traceback.print_exc()
+
+print("\n" + "="*50)
+print("TEST DE CRIBA DE VOZ (VOZ JUNTO A MÚSICA MÁS FUERTE)")
+print("="*50)
+
+try:
+    import numpy as np
+    from speech_screen import SpeechScreen
+
+    class MockNoSpeech:
+        """La 'música' (tono fuerte) da no_speech alto; la 'voz' (ruido suave) bajo"""
+        def __init__(self):
+            self.probed = 0
+
+        def no_speech_probs(self, audios, language=None):
+            self.probed += len(audios)
+            return [0.95 if np.sqrt(np.mean(a ** 2)) > 0.2 else 0.05 for a in audios]
+
+    def build_pcm(kinds):
+        """Bloques de 30 s: 'M' música (tono a 0.5), 'V' voz (ruido a 0.05)"""
+        rng = np.random.default_rng(0)
+        t = np.arange(30 * 16000) / 16000
+        blocks = [0.5 * np.sin(2 * np.pi * 440 * t) if kind == 'M' else 0.05 * rng.standard_normal(len(t)) for kind in kinds]
+        return (np.concatenate(blocks) * 32767).astype('<i2')
+
+    whisper_mock = MockNoSpeech()
+    screen = SpeechScreen(whisper_mock)
+    screen.enabled, screen.num_windows, screen.max_batches = True, 2, 3
+
+    # La voz está en el bloque más flojo: no es de las dos ventanas más fuertes ni de las equiespaciadas
+    mixed = build_pcm('MVMM')
+    mixed_report = screen.screen(mixed, 0, len(mixed))
+    music = build_pcm('MMMM')
+    music_report = screen.screen(music, 0, len(music))
+
+    # Parte larga sin voz (10 min): como mucho screen_max_batches × screen_windows pasadas de Whisper
+    whisper_mock.probed = 0
+    long_music = build_pcm('M' * 20)
+    long_report = screen.screen(long_music, 0, len(long_music))
+
+    print(f"\nMúsica + voz: speech={mixed_report['speech']} probs={mixed_report['no_speech_probs']}")
+    print(f"Solo música:  speech={music_report['speech']} reason={music_report['reason']} probs={music_report['no_speech_probs']}")
+    print(f"Música 10 min: speech={long_report['speech']} ventanas con energía={long_report['voiced_windows']} probadas={whisper_mock.probed}")
+    if mixed_report['speech'] and not music_report['speech'] and music_report['reason'] == 'no_speech':
+        print("\n✅ ÉXITO: La voz junto a música más fuerte no se descarta.")
+    else:
+        print("\n❌ FALLO: La criba descartó voz o no detectó la música.")
+    if not long_report['speech'] and long_report['voiced_windows'] == 20 and whisper_mock.probed == 6:
+        print("✅ ÉXITO: Sin voz, la criba se limita a 3 tandas de 2 ventanas.")
+    else:
+        print(f"❌ FALLO: Se esperaban 6 ventanas probadas y hubo {whisper_mock.probed}.")
+
+except Exception as e:
+    print(f"\n❌ ERROR DE EJECUCIÓN: {e}")
+    import traceback
+    traceback.print_exc()
+
+print("\n" + "="*50)
+print("TEST DE CONCESIONES (INTENTO CADUCADO)")
+print("="*50)
+
+try:
+    import time
+    import tempfile
+    from job_store import SQLiteJobStore
+
+    store = SQLiteJobStore(os.path.join(tempfile.mkdtemp(), 'jobs.db'), lease_seconds=0.2)
+    store.put({'task_id': 'tarea-1', 'filename': 'a.wav'})
+
+    # El nodo A toma el trabajo, se queda colgado y su concesión caduca
+    job_a = store.lease('nodo-a')
+    time.sleep(0.3)
+    (reclaimed, _, _), = store.reclaim_expired()
+    store.put(reclaimed)
+
+    # El trabajo vuelve a la cola: primero lo retoma el propio A (intento 2) y luego, otra vez caducado, B
+    job_a2 = store.lease('nodo-a')
+    stale_same_node = (store.heartbeat('nodo-a', 'tarea-1', attempt=job_a['lease_attempt']),
+                       store.complete('nodo-a', 'tarea-1', attempt=job_a['lease_attempt']))
+    time.sleep(0.3)
+    (reclaimed, _, _), = store.reclaim_expired()
+    store.put(reclaimed)
+    job_b = store.lease('nodo-b')
+
+    stale = (store.heartbeat('nodo-a', 'tarea-1', attempt=job_a2['lease_attempt']),
+             store.holds('nodo-a', 'tarea-1', job_a2['lease_attempt']),
+             store.complete('nodo-a', 'tarea-1', attempt=job_a2['lease_attempt']))
+    current = (store.heartbeat('nodo-b', 'tarea-1', attempt=job_b['lease_attempt']),
+               store.holds('nodo-b', 'tarea-1', job_b['lease_attempt']),
+               store.complete('nodo-b', 'tarea-1', attempt=job_b['lease_attempt']))
+
+    print(f"\nIntentos: A={job_a['lease_attempt']}, A={job_a2['lease_attempt']}, B={job_b['lease_attempt']}")
+    print(f"A con el intento 1 tras retomarlo (latido, fin): {stale_same_node}")
+    print(f"A caducado (latido, holds, fin): {stale}")
+    print(f"B vigente (latido, holds, fin):  {current}")
+    if not any(stale_same_node) and not any(stale) and all(current) and store.pending_count() == 0:
+        print("\n✅ ÉXITO: Un intento caducado no renueva ni completa el trabajo reasignado.")
+    else:
+        print("\n❌ FALLO: Un intento caducado pudo renovar o completar el trabajo.")
+
+except Exception as e:
+    print(f"\n❌ ERROR DE EJECUCIÓN: {e}")
+    import traceback
+    traceback.print_exc()
+
+print("\n" + "="*50)
+print("TEST DE ADMISIÓN Y DEDUPLICACIÓN (/upload)")
+print("="*50)
+
+previous_dir = os.getcwd()
+try:
+    import io
+    import wave
+    import shutil
+    import tempfile
+    import numpy as np
+
+    # La app crea sus directorios en el directorio actual: se trabaja en uno temporal
+    work_dir = tempfile.mkdtemp(prefix='test_logic_')
+    os.chdir(work_dir)
+    import app as server
+    from admission import AdmissionController
+    server.UPLOAD_DIR = os.path.join(work_dir, 'uploads')
+    server.TRANSCRIPTION_DIR = os.path.join(work_dir, 'transcriptions')
+    server.rtf_estimator.path = os.path.join(work_dir, 'rtf_stats.json')
+    os.makedirs(server.UPLOAD_DIR, exist_ok=True)
+
+    class IdleBackend:
+        """Sin consumidor: los trabajos se quedan en cola y el test decide cómo terminan"""
+        def status(self):
+            return []
+
+    server.inference_backend = IdleBackend()
+    client = server.app.test_client()
+
+    def wav_bytes(seconds, seed):
+        samples = (np.random.default_rng(seed).normal(0, 3000, int(seconds * 16000))).astype('<i2')
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(16000)
+            f.writeframes(samples.tobytes())
+        return buffer.getvalue()
+
+    def upload(data, name, client_id='cliente-test'):
+        return client.post('/upload', data={'files': (io.BytesIO(data), name)},
+                           content_type='multipart/form-data', headers={'X-Client-Id': client_id})
+
+    # Admisión: un archivo por cliente y 200 KB como máximo
+    server.admission = AdmissionController(limits={
+        'max_client_jobs': 1, 'max_client_bytes': 200 * 1024, 'max_client_audio_seconds': 3600,
+        'max_queued_bytes': 10 * 1024 ** 2, 'max_queued_audio_seconds': 4 * 3600
+    })
+    accepted = upload(wav_bytes(2, seed=1), 'a.wav')
+    busy = upload(wav_bytes(2, seed=2), 'b.wav')
+    too_large = upload(wav_bytes(10, seed=3), 'c.wav', client_id='otro-cliente')
+    print(f"\nAdmisión: primera {accepted.status_code}, segunda del mismo cliente {busy.status_code} "
+          f"(Retry-After {busy.headers.get('Retry-After')}), mayor que el límite {too_large.status_code} "
+          f"(Retry-After {too_large.headers.get('Retry-After')})")
+    if accepted.status_code == 200 and busy.status_code == 429 and busy.headers.get('Retry-After') \
+            and too_large.status_code == 413 and too_large.headers.get('Retry-After') is None:
+        print("✅ ÉXITO: 429 con Retry-After al llenar la cuota y 413 sin él si no cabe ni con la cola vacía.")
+    else:
+        print("❌ FALLO: Códigos de admisión inesperados.")
+
+    # Deduplicación: la misma subida de otro cliente se engancha al trabajo en curso
+    leader_id = accepted.get_json()['task_ids'][0]
+    follower = upload(wav_bytes(2, seed=1), 'a_copia.wav', client_id='cliente-dup')
+    follower_id = follower.get_json()['task_ids'][0]
+    server.update_task(leader_id, status='processing', started_at=time.time(), progress=30)
+    server.update_task(leader_id, status='completed', progress=100, output_files=['a_Transcrito.txt'],
+                       result={'num_segments': 1, 'speakers': []})
+    leader_status = client.get(f'/status/{leader_id}').get_json()
+    follower_status = client.get(f'/status/{follower_id}').get_json()
+    print(f"\nDeduplicación: principal {leader_status['status']} {leader_status.get('output_files')}, "
+          f"duplicado {follower_status['status']} {follower_status.get('output_files')} "
+          f"(duplicate_of={follower_status.get('duplicate_of')})")
+    if follower.status_code == 200 and follower_status.get('duplicate_of') == leader_id \
+            and follower_status['status'] == 'completed' \
+            and follower_status.get('output_files') == leader_status.get('output_files') == ['a_Transcrito.txt']:
+        print("✅ ÉXITO: El duplicado recibe el resultado del trabajo principal.")
+    else:
+        print("❌ FALLO: El duplicado no recibió el resultado del principal.")
+
+except Exception as e:
+    print(f"\n❌ ERROR DE EJECUCIÓN: {e}")
+    import traceback
+    traceback.print_exc()
+finally:
+    os.chdir(previous_dir)
+    if 'work_dir' in globals():
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -1,4 +1,3 @@
-import whisper
 import os
 import logging
 
@@ -24,6 +23,8 @@ class WhisperService:
         if self.model is None:
             logger.info(f"Cargando modelo Whisper '{self.model_name}'...")
             try:
+                # Importación diferida: whisper arrastra torch y tarda varios segundos
+                import whisper
                 self.model = whisper.load_model(self.model_name)
                 logger.info(f"Modelo '{self.model_name}' cargado exitosamente")
             except Exception as e:
@@ -40,18 +41,28 @@ class WhisperService:
         self.current_language = language_code
         logger.info(f"Idioma configurado a: {language_code}")
     
-    def transcribe(self, audio_path, include_timestamps=False):
+    def _decode_language(self, language=None):
+        """Idioma para whisper: el de la llamada o, si no se indica, current_language ('auto' -> None)"""
+        language = self.current_language if language is None else language
+        return language if language != "auto" else None
+    
+    def transcribe(self, audio_path, include_timestamps=False, initial_prompt=None, word_timestamps=False, language=None):
         """
         Transcribe un archivo de audio
         
         Args:
-            audio_path: Ruta al archivo de audio
+            audio_path: Ruta al archivo de audio, o array float32 a 16 kHz ya decodificado
             include_timestamps: Si se deben devolver timestamps
+            initial_prompt: (Opcional) Texto previo para dar contexto (p. ej. la ventana anterior)
+            word_timestamps: Si cada segmento debe incluir 'words' con tiempos por palabra.
+                Cuesta una pasada DTW sobre la atención cruzada: solo para alinear hablantes
+            language: (Opcional) Idioma de esta llamada; por defecto current_language.
+                Los trabajos pasan el suyo sin cambiar el estado compartido del servicio
             
         Returns:
             str o dict: Texto transcrito o dict con texto y segments
         """
-        if not os.path.exists(audio_path):
+        if isinstance(audio_path, str) and not os.path.exists(audio_path):
             raise FileNotFoundError(f"Archivo de audio no encontrado: {audio_path}")
         
         # Asegurar que el modelo esté cargado
@@ -59,18 +70,19 @@ class WhisperService:
             self.load_model()
         
         try:
-            logger.info(f"Transcribiendo: {audio_path}")
+            logger.info(f"Transcribiendo: {audio_path if isinstance(audio_path, str) else f'{len(audio_path) / 16000:.1f}s de audio en memoria'}")
             
             # Realizar transcripción
-            logger.info(f"Running Whisper: timestamps={include_timestamps}, model={self.model_name}")
+            logger.info(f"Running Whisper: timestamps={include_timestamps}, words={word_timestamps}, model={self.model_name}")
             
             # NOTA CRÍTICA: Para que Whisper devuelva segmentos, 'verbose' no debe ser None a veces, 
             # pero lo más importante es que devolvamos el objeto completo
             result = self.model.transcribe(
                 audio_path, 
-                language=self.current_language if self.current_language != "auto" else None,
+                language=self._decode_language(language),
                 verbose=False, # Importante para evitar spam en consola pero obtener resultado estructurado
-                word_timestamps=include_timestamps # Precisión a nivel de palabra para mejorar diarización
+                word_timestamps=include_timestamps and word_timestamps, # Precisión a nivel de palabra solo para la diarización
+                initial_prompt=initial_prompt
             )
             
             logger.info(f"Whisper result obtained. Keys: {list(result.keys()) if isinstance(result, dict) else 'Not a dict'}")
@@ -90,5 +102,163 @@ class WhisperService:
             logger.error(f"Error durante la transcripción: {e}")
             raise
 
+    def load_audio(self, audio_path):
+        """
+        Decodifica un archivo de audio a PCM mono float32 a 16 kHz (vía ffmpeg)
+        
+        Returns:
+            numpy.ndarray: Muestras de audio
+        """
+        import whisper
+        return whisper.load_audio(audio_path)
+    
+    def transcribe_batch(self, audios, include_timestamps=False, language=None):
+        """
+        Transcribe varios audios cortos (<= 30 s) en una sola pasada del decodificador.
+        Cada audio se rellena a una ventana de 30 s y los mel se apilan en un lote.
+        Los resultados dudosos (compresión o logprob fuera de umbral) se repiten
+        individualmente con transcribe() para conservar el fallback de temperatura.
+        
+        Args:
+            audios: Lista de arrays float32 a 16 kHz
+            include_timestamps: Si se deben devolver segments con timestamps
+            language: (Opcional) Idioma del lote; por defecto current_language
+            
+        Returns:
+            list: Por cada audio, str o dict con texto y segments (como transcribe)
+        """
+        if self.model is None:
+            self.load_model()
+        
+        import torch
+        import whisper
+        from whisper.audio import SAMPLE_RATE, log_mel_spectrogram, pad_or_trim
+        from whisper.tokenizer import get_tokenizer
+        
+        fp16 = self.model.device.type == 'cuda'
+        language = self._decode_language(language)
+        
+        mels = torch.stack([
+            log_mel_spectrogram(pad_or_trim(audio), self.model.dims.n_mels) for audio in audios
+        ]).to(self.model.device)
+        if fp16:
+            mels = mels.half()
+        
+        logger.info(f"Running Whisper BATCH: {len(audios)} audios, timestamps={include_timestamps}, model={self.model_name}")
+        options = whisper.DecodingOptions(
+            task="transcribe",
+            language=language,
+            without_timestamps=not include_timestamps,
+            fp16=fp16
+        )
+        decoded = whisper.decode(self.model, mels, options)
+        
+        outputs = []
+        for audio, result in zip(audios, decoded):
+            # Silencio: misma regla que whisper.transcribe (no_speech alto y logprob bajo)
+            if result.no_speech_prob > 0.6 and result.avg_logprob < -1.0:
+                full_result = {'text': '', 'segments': [], 'language': result.language}
+            elif result.compression_ratio > 2.4 or result.avg_logprob < -1.0:
+                logger.info("Resultado de lote dudoso, repitiendo individualmente con fallback de temperatura")
+                full_result = self.model.transcribe(audio, language=language, verbose=False, fp16=fp16)
+            else:
+                duration = len(audio) / SAMPLE_RATE
+                segments = []
+                if include_timestamps:
+                    tokenizer = get_tokenizer(
+                        self.model.is_multilingual,
+                        num_languages=self.model.num_languages,
+                        language=result.language,
+                        task="transcribe"
+                    )
+                    segments = self._segments_from_tokens(result.tokens, tokenizer, duration)
+                full_result = {'text': result.text, 'segments': segments, 'language': result.language}
+            
+            if include_timestamps:
+                outputs.append(full_result)
+            else:
+                outputs.append(full_result['text'].strip())
+        
+        return outputs
+    
+    def no_speech_probs(self, audios, language=None):
+        """
+        Probabilidad de "sin voz" de Whisper para varias ventanas (<= 30 s) en una sola
+        pasada: solo se decodifica el primer token, que es donde Whisper la calcula.
+        
+        Args:
+            audios: Lista de arrays float32 a 16 kHz
+            language: (Opcional) Idioma; por defecto current_language
+            
+        Returns:
+            list: Un float por ventana
+        """
+        if self.model is None:
+            self.load_model()
+        
+        import torch
+        import whisper
+        from whisper.audio import log_mel_spectrogram, pad_or_trim
+        
+        fp16 = self.model.device.type == 'cuda'
+        mels = torch.stack([
+            log_mel_spectrogram(pad_or_trim(audio), self.model.dims.n_mels) for audio in audios
+        ]).to(self.model.device)
+        if fp16:
+            mels = mels.half()
+        
+        options = whisper.DecodingOptions(
+            task="transcribe",
+            language=self._decode_language(language),
+            without_timestamps=True,
+            sample_len=1,
+            fp16=fp16
+        )
+        return [float(result.no_speech_prob) for result in whisper.decode(self.model, mels, options)]
+    
+    @staticmethod
+    def _segments_from_tokens(tokens, tokenizer, duration):
+        """
+        Reconstruye los segments a partir de los tokens de timestamp de una ventana
+        (misma lógica que whisper.transcribe para una única ventana de 30 s)
+        """
+        time_precision = 0.02  # input_stride * HOP_LENGTH / SAMPLE_RATE
+        timestamp_begin = tokenizer.timestamp_begin
+        
+        segments = []
+        current_start = None
+        current_tokens = []
+        for token in tokens:
+            if token >= timestamp_begin:
+                position = (token - timestamp_begin) * time_precision
+                if current_start is None:
+                    current_start = position
+                elif current_tokens:
+                    segments.append({
+                        'start': current_start,
+                        'end': min(position, duration),
+                        'text': tokenizer.decode(current_tokens)
+                    })
+                    current_start = None
+                    current_tokens = []
+                else:
+                    current_start = position
+            else:
+                if current_start is None:
+                    current_start = 0.0
+                current_tokens.append(token)
+        
+        # Texto sin timestamp de cierre: hasta el final del audio
+        if current_tokens:
+            segments.append({
+                'start': current_start or 0.0,
+                'end': duration,
+                'text': tokenizer.decode(current_tokens)
+            })
+        
+        for i, segment in enumerate(segments):
+            segment['id'] = i
+        return segments
+
 # Instancia global del servicio
 whisper_service = WhisperService(model_name="small")
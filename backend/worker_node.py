@@ -0,0 +1,135 @@
+"""
+Nodo de inferencia independiente para escalar en varias máquinas.
+
+Toma trabajos de un almacén SQLite compartido (job_store.py) que publica el
+front end (python app.py --production --store /compartido/jobs.db), renueva su
+concesión con latidos mientras transcribe y escribe las salidas en el directorio
+de transcripciones compartido. Los audios subidos deben estar en el mismo volumen
+(upload_dir en config.json) y con la misma ruta en todas las máquinas.
+
+Uso:
+    python worker_node.py --store /compartido/jobs.db --transcriptions /compartido/transcriptions
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import threading
+
+
+def heartbeat_loop(store, worker_id, job, stop, lost):
+    """Renueva la concesión del trabajo en curso hasta que 'stop' se activa; 'lost' si la pierde"""
+    logger = logging.getLogger(__name__)
+    interval = max(store.lease_seconds / 3, 1.0)
+    while not stop.wait(interval):
+        try:
+            if not store.heartbeat(worker_id, job['task_id'], job.get('lease_attempt')):
+                logger.warning(f"LEASE LOST: {job['task_id']} ya no es de este nodo (se procesará otra vez)")
+                lost.set()
+                break
+        except Exception as e:
+            logger.error(f"HEARTBEAT ERROR: {e}")
+
+
+def lease_guard(store, worker_id, job, lost):
+    """
+    Funciones (owns, report) de un trabajo con concesión: 'owns' confirma la concesión
+    en el almacén antes de publicar salidas o borrar la subida, y 'report' descarta el
+    progreso en cuanto se sabe perdida (el nuevo titular es quien informa).
+    """
+    def owns():
+        if lost.is_set():
+            return False
+        try:
+            held = store.holds(worker_id, job['task_id'], job['lease_attempt'])
+        except Exception as e:
+            # Sin poder confirmarlo no se publica: si la concesión sigue viva, se reintentará
+            logging.getLogger(__name__).error(f"LEASE CHECK ERROR: {e}")
+            return False
+        if not held:
+            lost.set()
+        return held
+
+    def report(task_id, **fields):
+        if not lost.is_set():
+            store.report(task_id, **fields)
+
+    return owns, report
+
+
+def main():
+    from config import config_manager
+
+    parser = argparse.ArgumentParser(description="Nodo de inferencia con almacén de trabajos compartido")
+    parser.add_argument('--store', default=config_manager.get('job_store_db'), help="Archivo SQLite compartido con el front end")
+    parser.add_argument('--transcriptions', default=config_manager.get('transcription_dir', 'transcriptions'), help="Directorio de salidas compartido")
+    parser.add_argument('--search-index', default=config_manager.get('search_index_db'), help="Índice de búsqueda a actualizar (opcional)")
+    parser.add_argument('--worker-id', default=None, help="Identificador del nodo (por defecto host-pid)")
+    parser.add_argument('--poll', type=float, default=1.0, help="Segundos entre consultas con la cola vacía")
+    parser.add_argument('--no-warmup', action='store_true', help="No cargar el modelo antes del primer trabajo")
+    args = parser.parse_args()
+
+    if not args.store:
+        parser.error("falta --store (o 'job_store_db' en config.json)")
+
+    from job_store import SQLiteJobStore, default_worker_id
+    worker_id = args.worker_id or default_worker_id()
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f'%(asctime)s - %(levelname)s - [{worker_id}] %(message)s'
+    )
+    logger = logging.getLogger(__name__)
+
+    from whisper_service import whisper_service
+    from audio_processor import AudioProcessor
+    from inference_worker import run_jobs
+
+    search_index = None
+    if args.search_index:
+        from search_index import SearchIndex
+        search_index = SearchIndex(args.search_index)
+
+    os.makedirs(args.transcriptions, exist_ok=True)
+    audio_processor = AudioProcessor(whisper_service, search_index=search_index)
+    store = SQLiteJobStore(args.store)
+
+    if not args.no_warmup:
+        try:
+            whisper_service.load_model()
+        except Exception as e:
+            logger.error(f"WARMUP ERROR: {e}")
+
+    logger.info(f"WORKER NODE READY: {args.store} -> {os.path.abspath(args.transcriptions)}")
+    try:
+        while True:
+            job = store.lease(worker_id)
+            if job is None:
+                time.sleep(args.poll)
+                continue
+
+            logger.info(f"LEASED: {job['filename']} ({job['task_id']})")
+            stop = threading.Event()
+            lost = threading.Event()
+            owns, report = lease_guard(store, worker_id, job, lost)
+            beat = threading.Thread(target=heartbeat_loop, args=(store, worker_id, job, stop, lost), daemon=True)
+            beat.start()
+            try:
+                run_jobs([job], whisper_service, audio_processor, args.transcriptions, report, owns=owns)
+            finally:
+                stop.set()
+                beat.join()
+            # Si el nodo se interrumpe a medias no se completa: la concesión caduca y se reintenta.
+            # Una finalización de una concesión perdida se descarta (el trabajo es de otro nodo)
+            if not store.complete(worker_id, job['task_id'], job['lease_attempt']):
+                logger.warning(f"STALE COMPLETION: {job['task_id']} descartado (concesión perdida)")
+    except KeyboardInterrupt:
+        logger.info("WORKER NODE STOPPING")
+    finally:
+        audio_processor.writer.shutdown()
+        store.unregister(worker_id)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -337,6 +337,11 @@ async function handleFiles(files) {
         if (!response.ok) {
             console.error('❌ Respuesta no OK:', response.status);
             const errorData = await response.json().catch(() => ({ error: 'Error desconocido' }));
+            // 429: el servidor está lleno; indicar cuándo reintentar
+            if (response.status === 429) {
+                const retryAfter = parseInt(response.headers.get('Retry-After') || errorData.retry_after || '0', 10);
+                throw new Error(`${errorData.error}. Inténtalo de nuevo en ~${formatTime(retryAfter)}`);
+            }
             throw new Error(errorData.error || `Error del servidor: ${response.status}`);
         }
 
@@ -376,7 +381,7 @@ async function handleFiles(files) {
 
 function trackTask(taskId, filename) {
     // Add to active tasks
-    activeTasks.set(taskId, { filename, pollInterval: null });
+    activeTasks.set(taskId, { filename, pollInterval: null, partialSegments: 0, partialOffset: 0 });
 
     // Create UI element
     createFileItem(taskId, filename);
@@ -403,6 +408,7 @@ function createFileItem(taskId, filename) {
             </div>
             <div class="progress-text" id="progress-text-${taskId}">0%</div>
         </div>
+        <pre class="partial-text" id="partial-${taskId}" style="display: none"></pre>
     `;
 
     filesList.appendChild(fileItem);
@@ -484,7 +490,36 @@ function updateTaskUI(taskId, data) {
     const progress = data.progress || 0;
     if (progressFill && progressText) {
         progressFill.style.width = `${progress}%`;
-        progressText.textContent = `${progress}%`;
+        // ETA estimada por el servidor (duración del audio x real-time factor medido)
+        const eta = data.eta_seconds != null ? ` · ~${formatTime(data.eta_seconds)}` : '';
+        progressText.textContent = `${progress}%${eta}`;
+    }
+
+    // Texto en vivo: pedir solo lo nuevo cuando el servidor ha decodificado más segmentos
+    const task = activeTasks.get(taskId);
+    if (task && data.partial_segments && data.partial_segments > task.partialSegments) {
+        task.partialSegments = data.partial_segments;
+        fetchPartialText(taskId, task);
+    }
+}
+
+async function fetchPartialText(taskId, task) {
+    if (task.partialLoading) return;
+    task.partialLoading = true;
+    try {
+        const response = await fetch(`${API_BASE_URL}/partial/${taskId}?offset=${task.partialOffset}`);
+        if (!response.ok) return;
+        const data = await response.json();
+        const partialElement = document.getElementById(`partial-${taskId}`);
+        if (!partialElement || !data.text) return;
+        task.partialOffset = data.offset;
+        partialElement.textContent += data.text;
+        partialElement.style.display = 'block';
+        partialElement.scrollTop = partialElement.scrollHeight;
+    } catch (error) {
+        console.error('Partial text error:', error);
+    } finally {
+        task.partialLoading = false;
     }
 }
 
@@ -547,15 +582,30 @@ function createResultItem(data) {
         `;
     });
 
+    // Perfil del trabajo (si se pidió con 'profile' o salió en el muestreo)
+    (data.profile_files || []).forEach(file => {
+        const label = file.endsWith('.txt') ? 'Perfil' : `Perfil (${file.split('.').pop()})`;
+        downloadButtons += `
+            <button class="download-btn" onclick="downloadFile('${file}')">
+                ${label}
+            </button>
+        `;
+    });
+
     // Get original filename with fallbacks
     const originalFile = data.original_file || data.result?.original_file || data.filename || 'Archivo procesado';
     const numSegments = data.num_segments || data.result?.num_segments || 1;
+    const noSpeech = {
+        silence: 'Sin voz detectada: el audio es silencio',
+        no_speech: 'Sin voz detectada: el audio parece música o ruido'
+    }[data.no_speech];
 
     resultItem.innerHTML = `
         <div class="result-header">
             <div class="result-title">✅ ${originalFile}</div>
         </div>
         ${numSegments > 1 ? `<p style="color: var(--text-secondary); margin-bottom: 1rem;">Dividido en ${numSegments} partes</p>` : ''}
+        ${noSpeech ? `<p style="color: var(--text-secondary); margin-bottom: 1rem;">${noSpeech}</p>` : ''}
         <div class="download-section">
             ${downloadButtons}
         </div>